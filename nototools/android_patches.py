@@ -338,21 +338,18 @@ def subset_symbols(srcdir, dstdir):
   # http://www.unicode.org/L2/L2000/00098-n2195.pdf
   target_coverage -= set(range(0x23BE, 0x23CC+1))
 
-  for font_file in glob.glob(path.join(srcdir, 'NotoSansSymbols-*.ttf')):
-    print 'main subset', font_file
-    out_file = path.join(
-        dstdir, path.basename(font_file)[:-4] + '-Subsetted.ttf')
-    subset.subset_font(font_file, out_file, include=target_coverage)
-
   # The second subset will be a fallback after the color emoji, for
   # explicit text presentation sequences.
-  target_coverage = EMOJI | unicode_data.get_unicode_emoji_variants()
+  secondary_coverage = EMOJI | unicode_data.get_unicode_emoji_variants()
 
+  jobs = []
   for font_file in glob.glob(path.join(srcdir, 'NotoSansSymbols-*.ttf')):
-    print 'secondary subset', font_file
-    out_file = path.join(
-        dstdir, path.basename(font_file)[:-4] + '-Subsetted2.ttf')
-    subset.subset_font(font_file, out_file, include=target_coverage)
+    print 'main and secondary subset', font_file
+    out_base = path.join(dstdir, path.basename(font_file)[:-4])
+    jobs.append((font_file, [
+        (out_base + '-Subsetted.ttf', target_coverage, None),
+        (out_base + '-Subsetted2.ttf', secondary_coverage, None)], None))
+  subset.subset_fonts(jobs)
 
 
 def patch_post_table(srcdir, dstdir):
@@ -299,7 +299,7 @@ def fix_font(src_root, dst_root, file_path, is_hinted, save_unmodified):
     tables_to_drop = TABLES_TO_DROP
     if not is_hinted:
         modified |= drop_hints(font)
-        tables_to_drop += ['fpgm', 'prep', 'cvt']
+        tables_to_drop = tables_to_drop + ['fpgm', 'prep', 'cvt ']
 
     modified |= drop_tables(font, tables_to_drop)
 
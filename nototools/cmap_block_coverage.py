@@ -22,6 +22,8 @@ import collections
 from nototools import cmap_data
 from nototools import unicode_data
 from nototools import tool_utils
+from nototools.codepoint_set import CodepointBitmap
+from nototools.codepoint_set import CodepointSet
 
 _MISSING_SCRIPTS = frozenset(['<MISSING>'])
 _OMITTED_SCRIPTS = frozenset(['(omitted)'])
@@ -40,13 +42,6 @@ _OMITTED = tool_utils.parse_int_ranges("""
 _LGC_LIST = ['LGC', 'Latn', 'Grek', 'Cyrl']
 
 
-def _get_scripts(cp, cp_to_scripts):
-  scripts = cp_to_scripts.get(cp, None)
-  if not scripts:
-    scripts = _OMITTED_SCRIPTS if cp in _OMITTED else _MISSING_SCRIPTS
-  return scripts
-
-
 def _script_names(scripts):
     script_list = []
     # sort LGC first
@@ -57,8 +52,10 @@ def _script_names(scripts):
     return ', '.join(script_list)
 
 
-def _create_cp_to_scripts(data, only_scripts=None):
-  cp_to_scripts = collections.defaultdict(set)
+def _create_script_to_cps(data, only_scripts=None):
+  """Return a map from script to the CodepointSet of its cps, and the set of
+  all scripts.  CJK and LGC scripts are merged."""
+  script_to_cps = {}
   all_scripts = set()
   skip_set = frozenset(['Zinh', 'Zyyy', 'Zzzz'])
   cjk_set = frozenset('Bopo,Hang,Hani,Hans,Hant,Hira,Jpan,Kana,Kore'.split(','))
@@ -74,10 +71,77 @@ def _create_cp_to_scripts(data, only_scripts=None):
     if script in lgc_set:
       script = 'LGC'
     all_scripts.add(script)
-    chars = tool_utils.parse_int_ranges(row.ranges)
-    for cp in chars:
-      cp_to_scripts[cp].add(script)
-  return cp_to_scripts, all_scripts
+    chars = CodepointSet.from_range_string(row.ranges)
+    if script in script_to_cps:
+      chars |= script_to_cps[script]
+    script_to_cps[script] = chars
+  return script_to_cps, all_scripts
+
+
+def _block_segments(start, limit):
+  """Yield (block, segment start, segment limit) for the blocks and the gaps
+  between them ('No_Block') in order, clipped to [start, limit)."""
+  pos = 0
+  blocks = sorted(set(
+      (unicode_data.block_range(name), name)
+      for name in unicode_data.block_names()))
+  blocks.append(((0x110000, 0x110000), None))
+  for (first, last), name in blocks:
+    for block, seg_start, seg_limit in (
+        ('No_Block', pos, first), (name, first, last + 1)):
+      seg_start = max(seg_start, start)
+      seg_limit = min(seg_limit, limit)
+      if seg_start < seg_limit:
+        yield block, seg_start, seg_limit
+    pos = last + 1
+
+
+def _script_runs(start, limit, defined_cps, script_to_cps):
+  """Yield (run start, run limit, block, scripts) for the runs of cps in
+  [start, limit) that are in the same block, are all defined or all
+  undefined, and have the same scripts.  Scripts is None for undefined cps,
+  and _OMITTED_SCRIPTS or _MISSING_SCRIPTS for defined cps with no script.
+  The runs are found by sweeping the range boundaries, so this does not
+  visit each cp."""
+  defined = CodepointSet(defined_cps)
+  omitted = CodepointSet(_OMITTED)
+  boundaries = set([0, 0x110000])
+  for cps in (defined, omitted):
+    for first, last in cps.ranges():
+      boundaries.update((first, last + 1))
+  segments = list(_block_segments(0, 0x110000))
+  for _, seg_start, _ in segments:
+    boundaries.add(seg_start)
+  script_events = collections.defaultdict(list)
+  for script, cps in script_to_cps.iteritems():
+    for first, last in cps.ranges():
+      script_events[first].append((script, True))
+      script_events[last + 1].append((script, False))
+  boundaries.update(script_events)
+
+  positions = sorted(boundaries)
+  active = set()
+  seg_index = 0
+  for run_start, run_limit in zip(positions, positions[1:]):
+    for script, is_start in script_events.get(run_start, ()):
+      if is_start:
+        active.add(script)
+      else:
+        active.remove(script)
+    if run_limit <= start:
+      continue
+    if run_start >= limit:
+      break
+    while segments[seg_index][2] <= run_start:
+      seg_index += 1
+    if run_start not in defined:
+      scripts = None
+    elif active:
+      scripts = frozenset(active)
+    else:
+      scripts = _OMITTED_SCRIPTS if run_start in omitted else _MISSING_SCRIPTS
+    yield (max(run_start, start), min(run_limit, limit),
+           segments[seg_index][0], scripts)
 
 
 def _list_details(start_cp, limit_cp, defined_cps, defined_count, details):
@@ -145,7 +209,7 @@ def _list_range(
 
 
 def _list_blocks(
-    start, limit, defined_cps, cp_to_scripts, all_scripts, only_scripts,
+    start, limit, defined_cps, script_to_cps, all_scripts, only_scripts,
     details):
   start_cp = -1
   defined_count = 0
@@ -153,10 +217,9 @@ def _list_blocks(
   showed_block = False
   scripts = None
   skip_empty = bool(only_scripts)
-  for cp in range(start, limit):
-    is_defined = cp in defined_cps
-    cp_block = unicode_data.block(cp)
-    cp_scripts = _get_scripts(cp, cp_to_scripts) if is_defined else None
+  for cp, run_limit, cp_block, cp_scripts in _script_runs(
+      start, limit, defined_cps, script_to_cps):
+    is_defined = cp_scripts is not None
     if cp_block != block or (
         cp_scripts and scripts and cp_scripts != scripts):
       if block and block != 'No_Block':
@@ -175,7 +238,7 @@ def _list_blocks(
         scripts = None
     if is_defined:
       scripts = cp_scripts
-      defined_count += 1
+      defined_count += run_limit - cp
   if not (skip_empty and _is_empty_scripts(scripts)):
     if not showed_block:
       print '...' if block == 'No_Block' else block
@@ -226,47 +289,43 @@ def _summarize_block(block, block_count, defined_count, script_counts):
     print '%6s: %s' % (count, script_names)
 
 
-def _summarize_blocks(start, limit, defined_cps, cp_to_scripts, all_scripts):
-  block = None
-  block_count = 0
-  defined_count = 0
-  script_counts = None
-  for cp in range(start, limit):
-    cp_block = unicode_data.block(cp)
-    if cp_block != block:
-      if block:
-        _summarize_block(
-            block, block_count, defined_count, script_counts)
-      block = cp_block
-      block_count = 0
-      defined_count = 0
-      script_counts = collections.defaultdict(int)
-
-    block_count += 1
-    is_defined = cp in defined_cps and cp not in _OMITTED
-    if not is_defined:
-      continue
-
-    defined_count += 1
-    scripts = _get_scripts(cp, cp_to_scripts)
-    for script in scripts:
-      script_counts[script] += 1
-  _summarize_block(block, block_count, defined_count, script_counts)
+def _summarize_blocks(start, limit, defined_cps, script_to_cps, all_scripts):
+  segments = list(_block_segments(start, limit))
+  segment_limits = [(seg_start, seg_limit) for _, seg_start, seg_limit
+                    in segments]
+  defined = CodepointSet(defined_cps) - _OMITTED
+  script_cps_list = [
+      (script, cps & defined) for script, cps in script_to_cps.iteritems()]
+  missing = defined - CodepointSet.from_ranges(
+      r for _, cps in script_cps_list for r in cps.ranges())
+  script_cps_list.append((iter(_MISSING_SCRIPTS).next(), missing))
+  script_counts_list = [
+      (script, CodepointBitmap(cps).count_ranges(segment_limits))
+      for script, cps in script_cps_list]
+  defined_counts = CodepointBitmap(defined).count_ranges(segment_limits)
+
+  for i, (block, seg_start, seg_limit) in enumerate(segments):
+    script_counts = {}
+    for script, counts in script_counts_list:
+      if counts[i]:
+        script_counts[script] = counts[i]
+    _summarize_block(
+        block, seg_limit - seg_start, defined_counts[i], script_counts)
 
 
 def block_coverage(
     cmap_file, start=0, limit=0x20000, only_scripts=None, details=0,
     summary=False):
   data = cmap_data.read_cmap_data_file(cmap_file)
-  cp_to_scripts, all_scripts = _create_cp_to_scripts(data, only_scripts)
+  script_to_cps, all_scripts = _create_script_to_cps(data, only_scripts)
   defined_cps = unicode_data.defined_characters(version=9.0)
 
   if summary:
     _summarize_blocks(
-        start, limit, defined_cps, cp_to_scripts, all_scripts)
+        start, limit, defined_cps, script_to_cps, all_scripts)
   else:
     _list_blocks(
-        start, limit, defined_cps, cp_to_scripts, all_scripts, only_scripts,
+        start, limit, defined_cps, script_to_cps, all_scripts, only_scripts,
         details)
 
 
@@ -290,9 +349,9 @@ def main():
       metavar='script', nargs='+', default=None)
 
   args = parser.parse_args()
-  ranges = tool_utils.parse_int_ranges(args.range)
-  start = min(ranges)
-  end = max(ranges)
+  ranges = list(CodepointSet.from_range_string(args.range).ranges())
+  start = ranges[0][0]
+  end = ranges[-1][1]
   if end > 0x10ffff:
     end = 0x10ffff;
   limit = end + 1
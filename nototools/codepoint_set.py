@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A compact set of code points stored as sorted ranges.
+
+Cmaps and the code point sets we compute from them are mostly long runs of
+consecutive values, so storing them as ranges is much smaller than a set of
+ints, and set operations and range formatting are linear in the number of
+ranges instead of the number of values.
+
+A CodepointSet is immutable.  It supports len, iteration in sorted order,
+membership, comparison, and the operators |, &, -, and ^ with other
+CodepointSets or with iterables of ints.  The range string format is the
+one used by tool_utils.parse_int_ranges and write_int_ranges.
+
+A CodepointBitmap stores one bit for each Unicode code point.  It is meant
+for counting the members of a few sets over many ranges, such as the blocks
+in a coverage report: counts are a popcount over the bytes of the range."""
+
+import argparse
+import array
+import binascii
+import bisect
+import itertools
+import random
+import time
+
+
+class CodepointSet(object):
+  """An immutable set of non-negative ints stored as sorted, disjoint,
+  non-adjacent inclusive ranges."""
+
+  __slots__ = ('_starts', '_ends', '_len', '_hash')
+
+  def __init__(self, values=None):
+    """Construct from another CodepointSet or from an iterable of ints."""
+    if isinstance(values, CodepointSet):
+      self._init_from_arrays(values._starts, values._ends)
+      return
+    starts = array.array('i')
+    ends = array.array('i')
+    if values:
+      prev = None
+      for v in sorted(set(values)):
+        if prev is not None and v == prev + 1:
+          ends[-1] = v
+        else:
+          starts.append(v)
+          ends.append(v)
+        prev = v
+    self._init_from_arrays(starts, ends)
+
+  def _init_from_arrays(self, starts, ends):
+    self._starts = starts
+    self._ends = ends
+    self._len = sum(ends) - sum(starts) + len(starts)
+    self._hash = None
+
+  @classmethod
+  def _from_arrays(cls, starts, ends):
+    result = cls.__new__(cls)
+    result._init_from_arrays(starts, ends)
+    return result
+
+  @classmethod
+  def from_ranges(cls, ranges):
+    """Construct from an iterable of (start, end) inclusive ranges.  The
+    ranges can be in any order and can overlap."""
+    starts = array.array('i')
+    ends = array.array('i')
+    for start, end in sorted(ranges):
+      if start > end:
+        raise ValueError('range start %x > end %x' % (start, end))
+      if ends and start <= ends[-1] + 1:
+        if end > ends[-1]:
+          ends[-1] = end
+      else:
+        starts.append(start)
+        ends.append(end)
+    return cls._from_arrays(starts, ends)
+
+  @classmethod
+  def from_range_string(
+      cls, range_string, is_hex=True, sep=None, allow_overlaps=True):
+    """Construct from a string of numbers or hyphenated ranges separated by
+    sep, as written by to_range_string or tool_utils.write_int_ranges.
+    Ranges are not expanded, so this is linear in the length of the string.
+    Comments starting with '#' are ignored.  Overlapping ranges are merged
+    if allow_overlaps is true, else they raise ValueError."""
+    base = 16 if is_hex else 10
+    lines = []
+    for line in range_string.splitlines():
+      x = line.find('#')
+      if x >= 0:
+        line = line[:x]
+      lines.append(line)
+    ranges = []
+    for r in (' ' if sep is None else sep).join(lines).split(sep):
+      r = r.strip()
+      if not r:
+        continue
+      parts = r.split('-')
+      if len(parts) == 1:
+        v = int(parts[0], base)
+        ranges.append((v, v))
+      elif len(parts) == 2:
+        ranges.append((int(parts[0], base), int(parts[1], base)))
+      else:
+        raise ValueError('could not parse range from \'%s\'' % r)
+    if not allow_overlaps:
+      overlaps = []
+      ranges.sort()
+      limit = -1
+      for start, end in ranges:
+        if start <= limit:
+          overlaps.append((start, min(end, limit)))
+        limit = max(limit, end)
+      if overlaps:
+        overlaps = cls.from_ranges(overlaps)
+        raise ValueError('range "%s" has %d duplicates: %s' % (
+            range_string, len(overlaps), overlaps.to_range_string()))
+    return cls.from_ranges(ranges)
+
+  def ranges(self):
+    """Return an iterator over the (start, end) inclusive ranges in order."""
+    return itertools.izip(self._starts, self._ends)
+
+  def num_ranges(self):
+    return len(self._starts)
+
+  def to_range_string(self, in_hex=True, sep=' '):
+    """Return the string tool_utils.write_int_ranges would write for these
+    values."""
+    single_fmt = '%04x' if in_hex else '%d'
+    pair_fmt = single_fmt + '-' + single_fmt
+    return sep.join(
+        single_fmt % start if start == end else pair_fmt % (start, end)
+        for start, end in self.ranges())
+
+  def to_frozenset(self):
+    return frozenset(self)
+
+  def __len__(self):
+    return self._len
+
+  def __nonzero__(self):
+    return self._len > 0
+
+  def __iter__(self):
+    for start, end in self.ranges():
+      for v in xrange(start, end + 1):
+        yield v
+
+  def __contains__(self, value):
+    i = bisect.bisect_right(self._starts, value) - 1
+    return i >= 0 and value <= self._ends[i]
+
+  def __eq__(self, other):
+    if not isinstance(other, CodepointSet):
+      if isinstance(other, (set, frozenset)):
+        return len(other) == self._len and all(v in self for v in other)
+      return NotImplemented
+    return self._starts == other._starts and self._ends == other._ends
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  def __hash__(self):
+    # equal sets and frozensets must hash the same
+    if self._hash is None:
+      self._hash = hash(frozenset(self))
+    return self._hash
+
+  def __repr__(self):
+    return 'CodepointSet.from_range_string(%r)' % self.to_range_string()
+
+  def _merge(self, other, keep):
+    """Sweep the boundaries of both range lists in order, keep(in_self,
+    in_other) determines which parts of the line are in the result."""
+    if not isinstance(other, CodepointSet):
+      other = CodepointSet(other)
+    # Boundaries are half-open: a range [s, e] contributes events at s and
+    # e + 1.
+    events = []
+    for starts, ends, which in ((self._starts, self._ends, 0),
+                                (other._starts, other._ends, 1)):
+      for s, e in itertools.izip(starts, ends):
+        events.append((s, which))
+        events.append((e + 1, which))
+    events.sort()
+    state = [False, False]
+    starts = array.array('i')
+    ends = array.array('i')
+    inside = False
+    i = 0
+    n = len(events)
+    while i < n:
+      pos = events[i][0]
+      while i < n and events[i][0] == pos:
+        which = events[i][1]
+        state[which] = not state[which]
+        i += 1
+      now_inside = keep(state[0], state[1])
+      if now_inside != inside:
+        # all events at pos are handled together, so ranges we emit are
+        # never adjacent.
+        if now_inside:
+          starts.append(pos)
+          ends.append(pos)
+        else:
+          ends[-1] = pos - 1
+        inside = now_inside
+    return CodepointSet._from_arrays(starts, ends)
+
+  def union(self, other):
+    return self._merge(other, lambda a, b: a or b)
+
+  def intersection(self, other):
+    """Intersect by looking up each range of the set with fewer ranges in
+    the other, which is faster than _merge when one set is much smaller."""
+    if not isinstance(other, CodepointSet):
+      other = CodepointSet(other)
+    if self.num_ranges() > other.num_ranges():
+      self, other = other, self
+    other_starts = other._starts
+    other_ends = other._ends
+    num_other = len(other_starts)
+    starts = array.array('i')
+    ends = array.array('i')
+    for start, end in self.ranges():
+      i = bisect.bisect_left(other_ends, start)
+      while i < num_other and other_starts[i] <= end:
+        starts.append(max(start, other_starts[i]))
+        ends.append(min(end, other_ends[i]))
+        i += 1
+    return CodepointSet._from_arrays(starts, ends)
+
+  def difference(self, other):
+    return self._merge(other, lambda a, b: a and not b)
+
+  def symmetric_difference(self, other):
+    return self._merge(other, lambda a, b: a != b)
+
+  __or__ = union
+  __and__ = intersection
+  __sub__ = difference
+  __xor__ = symmetric_difference
+
+  def __ror__(self, other):
+    return self.union(other)
+
+  def __rand__(self, other):
+    return self.intersection(other)
+
+  def __rsub__(self, other):
+    return CodepointSet(other).difference(self)
+
+  def __rxor__(self, other):
+    return self.symmetric_difference(other)
+
+  def isdisjoint(self, other):
+    return not self.intersection(other)
+
+  def issubset(self, other):
+    return not self.difference(other)
+
+  def issuperset(self, other):
+    if not isinstance(other, CodepointSet):
+      other = CodepointSet(other)
+    return other.issubset(self)
+
+
+_BITMAP_LIMIT = 0x110000
+_BITMAP_BYTES = _BITMAP_LIMIT >> 3
+# maps each byte to a byte whose value is its number of set bits
+_POPCOUNT_TABLE = ''.join(chr(bin(i).count('1')) for i in range(256))
+_POPCOUNT_CHARS = [(n, chr(n)) for n in range(1, 9)]
+
+
+class CodepointBitmap(object):
+  """A set of Unicode code points stored as one bit per code point.  Set
+  operations work on the whole bitmap at once, and counting the members in
+  a range is a popcount over the bytes of the range."""
+
+  __slots__ = ('_bits',)
+
+  def __init__(self, values=None):
+    """Construct from a CodepointSet or from an iterable of ints."""
+    self._bits = bytearray(_BITMAP_BYTES)
+    if values:
+      if not isinstance(values, CodepointSet):
+        values = CodepointSet(values)
+      for start, end in values.ranges():
+        self._set_range(start, end)
+
+  @classmethod
+  def from_ranges(cls, ranges):
+    """Construct from an iterable of (start, end) inclusive ranges."""
+    result = cls()
+    for start, end in ranges:
+      if start > end:
+        raise ValueError('range start %x > end %x' % (start, end))
+      result._set_range(start, end)
+    return result
+
+  @classmethod
+  def _from_long(cls, value):
+    result = cls.__new__(cls)
+    result._bits = bytearray(
+        binascii.unhexlify('%0*x' % (_BITMAP_BYTES * 2, value)))
+    return result
+
+  def _to_long(self):
+    return long(binascii.hexlify(self._bits), 16)
+
+  def _set_range(self, start, end):
+    if start < 0 or end >= _BITMAP_LIMIT:
+      raise ValueError('range %04x-%04x is outside unicode' % (start, end))
+    bits = self._bits
+    limit = end + 1
+    while start < limit and start & 7:
+      bits[start >> 3] |= 1 << (start & 7)
+      start += 1
+    while limit > start and limit & 7:
+      limit -= 1
+      bits[limit >> 3] |= 1 << (limit & 7)
+    if start < limit:
+      bits[start >> 3:limit >> 3] = '\xff' * ((limit - start) >> 3)
+
+  def count(self, start=0, limit=_BITMAP_LIMIT):
+    """Return the number of members in the half-open range [start, limit)."""
+    start = max(start, 0)
+    limit = min(limit, _BITMAP_LIMIT)
+    if start >= limit:
+      return 0
+    bits = self._bits
+    result = 0
+    while start < limit and start & 7:
+      result += bits[start >> 3] >> (start & 7) & 1
+      start += 1
+    while limit > start and limit & 7:
+      limit -= 1
+      result += bits[limit >> 3] >> (limit & 7) & 1
+    if start < limit:
+      counts = bits[start >> 3:limit >> 3].translate(_POPCOUNT_TABLE)
+      if len(counts) < 256:
+        result += sum(counts)
+      else:
+        for n, c in _POPCOUNT_CHARS:
+          result += n * counts.count(c)
+    return result
+
+  def count_ranges(self, ranges):
+    """Return a list of the number of members in each half-open range
+    [start, limit) in ranges.  This is faster than calling count for each
+    range when there are many ranges."""
+    counts = self._bits.translate(_POPCOUNT_TABLE)
+    result = []
+    for start, limit in ranges:
+      if start & 7 or limit & 7 or start < 0 or limit > _BITMAP_LIMIT:
+        result.append(self.count(start, limit))
+      elif start < limit:
+        result.append(sum(counts[start >> 3:limit >> 3]))
+      else:
+        result.append(0)
+    return result
+
+  def __len__(self):
+    return self.count()
+
+  def __nonzero__(self):
+    return self._bits.count('\x00') != _BITMAP_BYTES
+
+  def __contains__(self, value):
+    return (0 <= value < _BITMAP_LIMIT and
+            bool(self._bits[value >> 3] >> (value & 7) & 1))
+
+  def __eq__(self, other):
+    if not isinstance(other, CodepointBitmap):
+      return NotImplemented
+    return self._bits == other._bits
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  __hash__ = None
+
+  def union(self, other):
+    return CodepointBitmap._from_long(self._to_long() | other._to_long())
+
+  def intersection(self, other):
+    return CodepointBitmap._from_long(self._to_long() & other._to_long())
+
+  def difference(self, other):
+    return CodepointBitmap._from_long(self._to_long() & ~other._to_long())
+
+  __or__ = union
+  __and__ = intersection
+  __sub__ = difference
+
+
+def _time(fn, count=3):
+  best = None
+  for _ in range(count):
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def benchmark(num_ranges):
+  """Compare CodepointSet with set for two sets of num_ranges random ranges
+  spanning all of Unicode."""
+  # these import this module
+  from nototools import lint_config
+  from nototools import tool_utils
+
+  rng = random.Random(0)
+
+  def random_ranges():
+    cuts = sorted(rng.sample(xrange(0x110000), num_ranges * 2))
+    return zip(cuts[::2], cuts[1::2])
+
+  a_ranges = random_ranges()
+  b_ranges = random_ranges()
+  a_set = set()
+  for s, e in a_ranges:
+    a_set.update(xrange(s, e + 1))
+  b_set = set()
+  for s, e in b_ranges:
+    b_set.update(xrange(s, e + 1))
+  a_cps = CodepointSet.from_ranges(a_ranges)
+  b_cps = CodepointSet.from_ranges(b_ranges)
+  range_str = a_cps.to_range_string()
+
+  print 'sets of %d and %d values in %d ranges' % (
+      len(a_set), len(b_set), num_ranges)
+  tests = [
+      ('union', lambda: a_set | b_set, lambda: a_cps | b_cps),
+      ('intersection', lambda: a_set & b_set, lambda: a_cps & b_cps),
+      ('difference', lambda: a_set - b_set, lambda: a_cps - b_cps),
+      ('write ranges', lambda: tool_utils.write_int_ranges(a_set),
+       a_cps.to_range_string),
+      ('parse ranges', lambda: lint_config.parse_int_ranges(range_str),
+       lambda: CodepointSet.from_range_string(range_str)),
+  ]
+  for name, set_fn, cps_fn in tests:
+    set_time = _time(set_fn)
+    cps_time = _time(cps_fn)
+    print '  %-13s set %8.4fs  CodepointSet %8.4fs  (%.1fx)' % (
+        name, set_time, cps_time, set_time / max(cps_time, 1e-6))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='benchmark CodepointSet against set')
+  parser.add_argument(
+      '-n', '--num_ranges', help='number of ranges in each set, default '
+      '%(default)s', metavar='n', type=int, nargs='+',
+      default=[100, 1000, 10000])
+  args = parser.parse_args()
+  for num_ranges in args.num_ranges:
+    benchmark(num_ranges)
+
+
+if __name__ == '__main__':
+  main()
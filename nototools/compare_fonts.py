@@ -18,9 +18,11 @@
 inspiration."""
 
 import argparse
+import cStringIO
 import os
 from os import path
 import re
+import sys
 
 from fontTools import ttLib
 
@@ -28,8 +30,12 @@ import cldr_data
 import font_data
 import lint_config
 import render
+import tool_utils
 import unicode_data
 
+# Bump this if the contents of FontSnapshot change.
+SNAPSHOT_CACHE_VERSION = 3
+
 name_re = re.compile(r'(.+)-(.*)\.ttf')
 
 family_map = {
@@ -70,6 +76,92 @@ def _get_class_defs(font):
     return None
 
 
+class FontSnapshot(object):
+  """The data from a font that FontCompare uses: the cmap, the glyph id,
+  advance, and cleaned vertical extents of each glyph in the cmap, the hhea
+  and OS/2 fields that get compared, the version and name records, and the
+  GDEF glyph classes.  A snapshot is much smaller than the font and can be
+  pickled, so it can be cached and sent to other processes."""
+
+  _HHEA_ATTRS = ['ascent', 'descent', 'lineGap']
+  _OS2_ATTRS = [
+      'sTypoAscender', 'sTypoDescender', 'sTypoLineGap', 'usWinAscent',
+      'usWinDescent']
+
+  def __init__(self, cmap, glyph_ids, advances, extents, hhea, os2, version,
+               names, class_defs):
+    self.cmap = cmap
+    self.glyph_ids = glyph_ids
+    self.advances = advances
+    self.extents = extents
+    self.hhea = hhea
+    self.os2 = os2
+    self.version = version
+    self.names = names
+    self.class_defs = class_defs
+
+  @staticmethod
+  def from_font(font):
+    cmap = font_data.get_cmap(font)
+    glyph_names = set(cmap.values())
+    glyph_bounds = render.GlyphBounds(font)
+    hmtx = font['hmtx'].metrics
+    glyph_ids = {}
+    advances = {}
+    extents = {}
+    for name in glyph_names:
+      glyph_ids[name] = font.getGlyphID(name, requireReal=True)
+      advances[name] = hmtx[name][0]
+      extents[name] = glyph_bounds.vertical_extents(name)
+    hhea = {a: getattr(font['hhea'], a) for a in FontSnapshot._HHEA_ATTRS}
+    os2 = {a: getattr(font['OS/2'], a) for a in FontSnapshot._OS2_ATTRS}
+    # Assume version has two decimal places, which MTI fonts do but Adobe's
+    # do not.
+    version = font_data.printable_font_revision(font)
+    class_defs = _get_class_defs(font)
+    if class_defs is not None:
+      class_defs = dict(class_defs)
+    return FontSnapshot(
+        cmap, glyph_ids, advances, extents, hhea, os2, version,
+        font_data.get_name_records(font), class_defs)
+
+  @staticmethod
+  def from_file(fontpath):
+    font = ttLib.TTFont(fontpath)
+    snapshot = FontSnapshot.from_font(font)
+    font.close()
+    return snapshot
+
+
+def _snapshot_file(fontpath):
+  """Adapter for parallel_map, returns the snapshot attributes as a dict so
+  that cached values do not depend on how this module was loaded."""
+  return vars(FontSnapshot.from_file(fontpath))
+
+
+def load_snapshots(fontpaths, cache_path=None, processes=None):
+  """Return a map from each font path in fontpaths to its FontSnapshot.  Each
+  font is read once, in a pool of processes (default one per cpu).  If
+  cache_path is provided, it names a cache of snapshots keyed by the hash of
+  the font file, only fonts not in the cache are read, and the cache is
+  updated afterwards."""
+  fontpaths = sorted(set(fontpaths))
+  cache = tool_utils.read_cache(cache_path, SNAPSHOT_CACHE_VERSION)
+  hashes = [tool_utils.file_hash(p) for p in fontpaths]
+  todo = sorted(set(
+      (h, p) for h, p in zip(hashes, fontpaths) if h not in cache))
+  if todo:
+    # several paths might have the same hash, only read one of them
+    todo = dict(todo).items()
+    computed = tool_utils.parallel_map(
+        _snapshot_file, [p for _, p in todo], processes)
+    for (h, _), data in zip(todo, computed):
+      cache[h] = data
+    if cache_path:
+      tool_utils.write_cache(cache_path, SNAPSHOT_CACHE_VERSION, cache)
+  return {p: FontSnapshot(**cache[h]) for p, h in zip(fontpaths, hashes)}
+
+
 class FontCompare(object):
   test_names = frozenset(['cmap', 'advance', 'hhea', 'OS/2', 'bounds', 'gdef'])
 
@@ -97,14 +189,15 @@ class FontCompare(object):
 
   def __init__(self, target, test, incremental, emit_config, ignored_cp, only_cp,
                enabled_tests):
+    """target and test are FontSnapshots."""
     self.target = target
     self.test = test
     self.incremental = incremental # target is different version of same file
     self.emit_config = emit_config # generate config lines
     self.enabled_tests = enabled_tests or FontCompare.test_names
 
-    self.target_cmap = font_data.get_cmap(target)
-    self.test_cmap = font_data.get_cmap(test)
+    self.target_cmap = target.cmap
+    self.test_cmap = test.cmap
 
     target_chars = set(self.target_cmap.keys()) - _get_excluded_chars()
     if ignored_cp:
@@ -113,12 +206,11 @@ class FontCompare(object):
       target_chars &= only_cp
     self.target_chars = target_chars
 
-    # Assume version has two decimal places, which MTI fonts do but Adobe's do not.
-    target_version = font_data.printable_font_revision(target)
-    test_version = font_data.printable_font_revision(test)
+    target_version = target.version
+    test_version = test.version
 
-    target_names = font_data.get_name_records(target)
-    test_names = font_data.get_name_records(test)
+    target_names = target.names
+    test_names = test.names
     self._log('target name: %s %s, version: %s' % (target_names[1], target_names[2], target_version))
     self._log('test name: %s %s, version %s' % (test_names[1], test_names[2], test_version))
 
@@ -151,26 +243,26 @@ class FontCompare(object):
     if self.emit_config:
       print msg
 
-  def _check_attribute(self, target_obj, test_obj, attr):
-    target_value = getattr(target_obj, attr)
-    test_value = getattr(test_obj, attr)
+  def _check_attribute(self, target_map, test_map, attr):
+    target_value = target_map[attr]
+    test_value = test_map[attr]
     if target_value == test_value:
       return None
     return (attr, test_value, target_value)
 
-  def _check_attributes(self, target_obj, test_obj, attr_list):
+  def _check_attributes(self, target_map, test_map, attr_list):
     result = []
     for a in attr_list:
-      r = self._check_attribute(target_obj, test_obj, a)
+      r = self._check_attribute(target_map, test_map, a)
       if r:
         result.append(r)
     return result
 
   def _test_gid(self, cp):
-    return self.test.getGlyphID(self.test_cmap[cp], requireReal=True)
+    return self.test.glyph_ids[self.test_cmap[cp]]
 
   def _target_gid(self, cp):
-    return self.target.getGlyphID(self.target_cmap[cp], requireReal=True)
+    return self.target.glyph_ids[self.target_cmap[cp]]
 
   def _cp_error_msg(self, cp, test_msg, target_msg):
     test_gid = self._test_gid(cp)
@@ -205,15 +297,15 @@ class FontCompare(object):
     if self._skip('advance'):
       return
 
-    target_metrics = self.target['hmtx'].metrics
-    test_metrics = self.test['hmtx'].metrics
+    target_advances = self.target.advances
+    test_advances = self.test.advances
 
     differences = []
     for cp in self.target_chars:
       if cp not in self.test_cmap:
         continue
-      target_advance = target_metrics[self.target_cmap[cp]][0]
-      test_advance = test_metrics[self.test_cmap[cp]][0]
+      target_advance = target_advances[self.target_cmap[cp]]
+      test_advance = test_advances[self.test_cmap[cp]]
       if target_advance != test_advance:
         differences.append((cp, test_advance, target_advance))
 
@@ -227,8 +319,8 @@ class FontCompare(object):
     if self._skip('hhea'):
       return
 
-    target_hhea = self.target['hhea']
-    test_hhea = self.test['hhea']
+    target_hhea = self.target.hhea
+    test_hhea = self.test.hhea
     failed_attrs = self._check_attributes(target_hhea, test_hhea, [
         'ascent', 'descent', 'lineGap'])
 
@@ -246,8 +338,8 @@ class FontCompare(object):
     if self._skip('OS/2'):
       return
 
-    target_os2 = self.target['OS/2']
-    test_os2 = self.test['OS/2']
+    target_os2 = self.target.os2
+    test_os2 = self.test.os2
     attr_name_map = {
         'sTypoAscender': 'ascender',
         'sTypoDescender': 'descender',
@@ -270,13 +362,10 @@ class FontCompare(object):
     if self._skip('bounds'):
       return
 
-    target_glyphset = self.target.getGlyphSet()
-    test_glyphset = self.test.getGlyphSet()
-
-    target_max = self.target['OS/2'].usWinAscent
-    test_max = self.test['OS/2'].usWinAscent
-    target_min = -self.target['OS/2'].usWinDescent
-    test_min = -self.test['OS/2'].usWinDescent
+    target_max = self.target.os2['usWinAscent']
+    test_max = self.test.os2['usWinAscent']
+    target_min = -self.target.os2['usWinDescent']
+    test_min = -self.test.os2['usWinDescent']
 
     # We need to align the glyph ids, but once we get past the cmap it gets more and more
     # complicated to do this.  For now we'll just check the directly mapped glyphs.
@@ -284,14 +373,8 @@ class FontCompare(object):
     for cp in self.target_chars:
       if cp not in self.test_cmap:
         continue
-      target_glyph_name = self.target_cmap[cp]
-      test_glyph_name = self.test_cmap[cp]
-      target_ttglyph = target_glyphset[target_glyph_name]
-      test_ttglyph = test_glyphset[test_glyph_name]
-      target_ymin, target_ymax = render.get_glyph_cleaned_extents(
-          target_ttglyph, target_glyphset)
-      test_ymin, test_ymax = render.get_glyph_cleaned_extents(
-          test_ttglyph, test_glyphset)
+      target_ymin, target_ymax = self.target.extents[self.target_cmap[cp]]
+      test_ymin, test_ymax = self.test.extents[self.test_cmap[cp]]
       target_exceeds_max = target_ymax > target_max
       target_exceeds_min = target_ymin < target_min
       test_exceeds_max = test_ymax > test_max
@@ -334,8 +417,8 @@ class FontCompare(object):
     """Return False if we cannot check classDef-related info."""
     self._log('Check gdef classDefs')
 
-    target_class_defs = _get_class_defs(self.target)
-    test_class_defs = _get_class_defs(self.test)
+    target_class_defs = self.target.class_defs
+    test_class_defs = self.test.class_defs
 
     if mark_glyphs:
       if not target_class_defs:
@@ -360,8 +443,8 @@ class FontCompare(object):
       self._log('No mark glyphs in target')
       return
 
-    target_class_defs = _get_class_defs(self.target)
-    test_class_defs = _get_class_defs(self.test)
+    target_class_defs = self.target.class_defs
+    test_class_defs = self.test.class_defs
     assert target_class_defs and test_class_defs
 
     differences = []
@@ -401,8 +484,8 @@ class FontCompare(object):
   def _check_gdef_combining(self):
     self._log('Check gdef combining')
 
-    target_class_defs = _get_class_defs(self.target)
-    test_class_defs = _get_class_defs(self.test)
+    target_class_defs = self.target.class_defs
+    test_class_defs = self.test.class_defs
     assert target_class_defs and test_class_defs
 
     differences = []
@@ -446,10 +529,8 @@ class FontCompare(object):
     self.check_gdef()
 
 
-def check_font(target_file, test_file, incremental_version=False, emit_config=False,
-               reverse=False, ignored_cp=None, only_cp=None, enabled_tests=None):
-  target = ttLib.TTFont(target_file)
-  test = ttLib.TTFont(test_file)
+def _check_snapshots(target, test, incremental_version=False, emit_config=False,
+                     reverse=False, ignored_cp=None, only_cp=None, enabled_tests=None):
   if reverse:
     print 'reversing comparison'
     temp = target
@@ -463,6 +544,25 @@ def check_font(target_file, test_file, incremental_version=False, emit_config=Fa
               enabled_tests).check_all()
 
 
+def check_font(target_file, test_file, incremental_version=False, emit_config=False,
+               reverse=False, ignored_cp=None, only_cp=None, enabled_tests=None):
+  _check_snapshots(
+      FontSnapshot.from_file(target_file), FontSnapshot.from_file(test_file),
+      incremental_version, emit_config, reverse, ignored_cp, only_cp,
+      enabled_tests)
+
+
+def _check_snapshots_to_string(args):
+  """Adapter for parallel_map, returns the report as a string."""
+  stdout = sys.stdout
+  sys.stdout = cStringIO.StringIO()
+  try:
+    _check_snapshots(*args)
+    return sys.stdout.getvalue()
+  finally:
+    sys.stdout = stdout
+
+
 def get_reference_name_1(name):
     m = name_re.match(name)
     if not m:
@@ -513,7 +613,13 @@ def get_target_path(name, target_dir):
 
 
 def check_fonts(target_dir, fonts, incremental_version=False, emit_config=False, reverse=False,
-                ignored_cp=None, only_cp=None, enabled_tests=None):
+                ignored_cp=None, only_cp=None, enabled_tests=None, cache_path=None,
+                processes=None):
+  """Compare each font with its target in target_dir.  Each font, including a
+  target shared by several fonts, is read once, see load_snapshots for
+  cache_path and processes.  The comparisons also run in the pool, the
+  reports are printed in the order of fonts."""
+  target_paths = []
   for font in fonts:
     target_name = path.basename(font)
     if not incremental_version:
@@ -524,13 +630,20 @@ def check_fonts(target_dir, fonts, incremental_version=False, emit_config=False,
     if not path.isfile(target_path):
       raise ValueError('could not find %s in target dir %s' % (
           target_name, target_dir))
+    target_paths.append(target_path)
 
-    check_font(target_path, font, incremental_version, emit_config, reverse, ignored_cp,
-               only_cp, enabled_tests)
+  snapshots = load_snapshots(fonts + target_paths, cache_path, processes)
+  reports = tool_utils.parallel_map(_check_snapshots_to_string, [
+      (snapshots[target_path], snapshots[font], incremental_version,
+       emit_config, reverse, ignored_cp, only_cp, enabled_tests)
+      for font, target_path in zip(fonts, target_paths)], processes)
+  for report in reports:
+    sys.stdout.write(report)
 
 
 def main():
   default_target = '/usr/local/google/home/dougfelt/msfonts'
+  default_cache = '/tmp/compare_fonts/snapshot_cache.pkl'
 
   parser = argparse.ArgumentParser()
   parser.add_argument('fonts', metavar='font', nargs='+', help='fonts to check')
@@ -546,6 +659,11 @@ def main():
                       help='report no errors on these codepoints (hex ranges separated by space)')
   parser.add_argument('-oc', '--only_codepoints', metavar = 'ranges',
                       help='only report errors on these codepoints (hex ranges separated by space)')
+  parser.add_argument('--cache_file', metavar='file', default=default_cache,
+                      help='cache of font data keyed by file hash (default %s), '
+                      '\'-\' for no cache' % default_cache)
+  parser.add_argument('-p', '--processes', metavar='n', type=int,
+                      help='number of processes to use, default one per cpu')
   args = parser.parse_args()
 
   enabled_tests = FontCompare.check_test_list(args.test)
@@ -556,7 +674,8 @@ def main():
   only_cp = FontCompare.get_codepoints(args.only_codepoints)
 
   check_fonts(args.target, args.fonts, args.incremental_version, args.config, args.reverse,
-              ignored_cp, only_cp, enabled_tests)
+              ignored_cp, only_cp, enabled_tests,
+              tool_utils.resolve_path(args.cache_file), args.processes)
 
 
 if __name__ == "__main__":
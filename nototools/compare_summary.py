@@ -184,9 +184,14 @@ def tuple_compare_no_size(base_t, target_t):
 
 def compare_summary(base_root, target_root, name=None, comparefn=tuple_compare,
                     show_added=True, show_removed=True, show_identical=True,
-                    show_paths=True):
-  base_map = summary_to_map(summary.summarize(base_root, name))
-  target_map = summary_to_map(summary.summarize(target_root, name))
+                    show_paths=True, cache_path=None, processes=None):
+  """See summary.summarize for cache_path and processes.  Both trees share
+  the cache, so files that did not change between them are summarized at
+  most once."""
+  base_map = summary_to_map(
+      summary.summarize(base_root, name, cache_path, processes))
+  target_map = summary_to_map(
+      summary.summarize(target_root, name, cache_path, processes))
   added, removed, changed, identical = get_key_lists(base_map, target_map,
                                                      base_root, target_root)
 
@@ -219,6 +224,7 @@ def compare_summary(base_root, target_root, name=None, comparefn=tuple_compare,
     print_keys(identical)
 
 def main():
+  default_cache = '/tmp/summary/summary_cache.pkl'
   parser = argparse.ArgumentParser()
   parser.add_argument('-b', '--base_root', help='root of directory tree, base for comparison '
                       '(default [fonts])', metavar='dir', default='[fonts]')
@@ -233,6 +239,11 @@ def main():
                       action='store_true')
   parser.add_argument('--nopaths', help='do not print root paths', action='store_false',
                       default=True, dest='show_paths')
+  parser.add_argument('--cache_file', help='cache of summaries keyed by file hash '
+                      '(default %s), \'-\' for no cache' % default_cache,
+                      metavar='file', default=default_cache)
+  parser.add_argument('-p', '--processes', help='number of processes to use, '
+                      'default one per cpu', metavar='n', type=int)
   args = parser.parse_args()
 
   args.base_root = tool_utils.resolve_path(args.base_root)
@@ -249,7 +260,8 @@ def main():
   comparefn = tuple_compare if args.compare_size else tuple_compare_no_size
 
   compare_summary(args.base_root, args.target_root, args.name, comparefn,
-                  args.added, args.removed, args.identical, args.show_paths)
+                  args.added, args.removed, args.identical, args.show_paths,
+                  tool_utils.resolve_path(args.cache_file), args.processes)
 
 if __name__ == '__main__':
   main()
@@ -18,18 +18,96 @@
 __author__ = 'roozbeh@google.com (Roozbeh Pournader)'
 
 import argparse
+import array
 import codecs
 import os
 from os import path
 import re
+import struct
 import sys
 import unicode_data
 
+from nototools import codepoint_set
 from nototools import lint_config
+from nototools import sfnt_directory
+from nototools import tool_utils
 
 from fontTools import ttLib
 
 
+def _read_array(typecode, data, offset, count):
+  values = array.array(typecode)
+  values.fromstring(data[offset:offset + count * values.itemsize])
+  if sys.byteorder != 'big':
+    values.byteswap()
+  return values
+
+
+def cmap_table_ranges(data):
+  """Return a CodepointSet of the code points the raw cmap table data maps
+  in the subtable character_set uses: the Windows format 12 subtable if
+  there is one, else the Windows format 4 subtable.  Only that subtable is
+  decoded, and only its ranges, not its glyph ids.  Returns None if there is
+  neither subtable."""
+  _, num_subtables = struct.unpack('>2H', data[:4])
+  fmt_to_offset = {}
+  for i in range(num_subtables):
+    platform_id, enc_id, offset = struct.unpack(
+        '>2HL', data[4 + i * 8:12 + i * 8])
+    fmt = struct.unpack('>H', data[offset:offset + 2])[0]
+    if (fmt, platform_id, enc_id) in [(4, 3, 1), (12, 3, 10)]:
+      fmt_to_offset[fmt] = offset
+
+  ranges = []
+  if 12 in fmt_to_offset:
+    offset = fmt_to_offset[12]
+    num_groups = struct.unpack('>L', data[offset + 12:offset + 16])[0]
+    # start char code, end char code, start glyph id
+    groups = _read_array('I', data, offset + 16, num_groups * 3)
+    ranges = zip(groups[0::3], groups[1::3])
+  elif 4 in fmt_to_offset:
+    offset = fmt_to_offset[4]
+    seg_count = struct.unpack('>H', data[offset + 6:offset + 8])[0] // 2
+    ends = _read_array('H', data, offset + 14, seg_count)
+    starts = _read_array('H', data, offset + 16 + seg_count * 2, seg_count)
+    # like fontTools, skip the final 0xffff segment
+    ranges = zip(starts[:-1], ends[:-1])
+  else:
+    return None
+  return codepoint_set.CodepointSet.from_ranges(
+      (start, end) for start, end in ranges if start <= end)
+
+
+def cmap_ranges(font):
+  """Returns the character coverage of a font as a CodepointSet.
+
+  Args:
+    font: The input font's file name, or a TTFont.  For a file name, only the
+      table directory and the cmap subtable character_set uses are read from
+      the file, for a ttc the first font is used.
+  """
+  if type(font) is str:
+    try:
+      with open(font, 'rb') as f:
+        data = sfnt_directory.SfntDirectory(f).table_data('cmap')
+    except ValueError:
+      # not an sfnt or ttc, like woff, so leave it to fontTools
+      data = None
+    if data is not None:
+      return cmap_table_ranges(data) or codepoint_set.CodepointSet()
+    font = ttLib.TTFont(font, fontNumber=0)
+  return codepoint_set.CodepointSet(_character_map(font))
+
+
+def cmap_ranges_for_files(filenames, processes=1):
+  """Return a map from each file name to the cmap_ranges of the font.  If
+  processes is not 1 the files are read using a pool of processes, see
+  tool_utils.parallel_map."""
+  filenames = list(filenames)
+  return dict(zip(filenames, tool_utils.parallel_map(
+      cmap_ranges, filenames, processes)))
+
+
 def character_set(font):
   """Returns the character coverage of a font.
 
@@ -40,7 +118,11 @@ def character_set(font):
     A frozenset listing the characters supported in the font.
   """
   if type(font) is str:
-    font = ttLib.TTFont(font, fontNumber=0)
+    return cmap_ranges(font).to_frozenset()
+  return frozenset(_character_map(font))
+
+
+def _character_map(font):
   cmap_table = font['cmap']
   cmaps = {}
   for table in cmap_table.tables:
@@ -54,21 +136,12 @@ def character_set(font):
     cmap = cmaps[4]
   else:
     cmap = {}
-  return frozenset(cmap.keys())
+  return cmap
 
 
 def convert_set_to_ranges(charset):
   """Converts a set of characters to a list of ranges."""
-  working_set = set(charset)
-  output_list = []
-  while working_set:
-    start = min(working_set)
-    end = start + 1
-    while end in working_set:
-      end += 1
-    output_list.append((start, end - 1))
-    working_set.difference_update(range(start, end))
-  return output_list
+  return list(codepoint_set.CodepointSet(charset).ranges())
 
 
 def _print_char_info(chars):
@@ -103,8 +176,7 @@ def _write_char_text(chars, filepath, chars_per_line, sep):
     f.write(text)
 
 
-def _process_font(filepath, args):
-  char_set = character_set(filepath)
+def _process_font(filepath, char_set, args):
   if args.limit_set:
     char_set = char_set & args.limit_set
     if not char_set:
@@ -120,7 +192,15 @@ def _process_font(filepath, args):
 
 
 def main():
-  parser = argparse.ArgumentParser()
+  if len(sys.argv) > 1 and sys.argv[1] in ['build', 'update', 'query']:
+    # coverage_db imports noto_fonts, which imports this module
+    from nototools import coverage_db
+    coverage_db.main(sys.argv[1:])
+    return
+
+  parser = argparse.ArgumentParser(
+      epilog='Use \'%(prog)s build|update|query\' for the coverage db of the '
+      'noto families, see coverage_db.py.')
   parser.add_argument('files', help='Files to dump', metavar='file', nargs='+')
   parser.add_argument('--ranges',
                       help='Dump cmap as hex ranges',
@@ -144,6 +224,12 @@ def main():
                       help='string of hex codepoint ranges limiting cmap '
                       'to output',
                       metavar='ranges')
+  parser.add_argument('-j', '--processes',
+                      help='number of processes used to read the cmaps, '
+                      'default 1, 0 for one per cpu',
+                      type=int,
+                      metavar='N',
+                      default=1)
   args = parser.parse_args()
 
   if not (args.ranges or args.text or args.info):
@@ -156,9 +242,10 @@ def main():
     # make sure it exists so checks don't have to care
     args.limit_set = None
 
+  charsets = cmap_ranges_for_files(args.files, args.processes or None)
   for fontpath in args.files:
     print 'Font: ' + path.normpath(fontpath)
-    _process_font(fontpath, args)
+    _process_font(fontpath, charsets[fontpath].to_frozenset(), args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A compiled database of the character coverage of the Noto families.
+
+The database is built once from the noto_fonts families and saved as json.
+It holds the cmap of each family as ranges and an inverted index from code
+point to the families that support it, so questions like 'which families
+support this code point' or 'which families support this language' don't
+require rescanning the fonts.
+
+The index is a sorted list of segment starts, each segment runs to the next
+start and maps to the set of families supporting every code point in it.
+Code points before the first start are not supported by any family.
+
+Each family records the path, size and modification time of its
+representative font, the one its name and cmap are read from.  Updating a
+database rescans the font directories but only reads the fonts of families
+that are new or whose representative changed.
+
+  notocoverage build -o noto_coverage.json
+  notocoverage update --db noto_coverage.json
+  notocoverage query 0041 1c00-1c4f
+  notocoverage query --all 0915 094d 0937
+  notocoverage query --lang hi
+"""
+
+import argparse
+import bisect
+import collections
+import json
+import os
+import sys
+
+from nototools import cldr_data
+from nototools import codepoint_set
+from nototools import coverage
+from nototools import noto_fonts
+
+DEFAULT_DB = 'noto_coverage.json'
+
+_VERSION = 1
+
+# - family_id: the noto_fonts family id
+# - name: the family name
+# - filepath: path of the representative font
+# - stamp: (size, mtime) of the representative font when it was read
+# - charset: a CodepointSet, or None for families only available as ttc
+FamilyCoverage = collections.namedtuple(
+    'FamilyCoverage', 'family_id, name, filepath, stamp, charset')
+
+
+def _file_stamp(filepath):
+  st = os.stat(filepath)
+  return (st.st_size, st.st_mtime)
+
+
+def _to_path(name):
+  """json reads strings as unicode, but paths are byte strings elsewhere."""
+  return name.encode(sys.getfilesystemencoding() or 'utf-8')
+
+
+def _read_family_coverage(members):
+  """Return FamilyCoverage for a NotoFamilyMembers, reading the
+  representative font."""
+  rep_member = members.rep_member
+  stamp = _file_stamp(rep_member.filepath)
+  name = noto_fonts.get_font_family_name(rep_member.filepath)
+  if rep_member.fmt in {'ttf', 'otf'}:
+    charset = codepoint_set.CodepointSet(
+        coverage.character_set(rep_member.filepath))
+  else:
+    charset = None
+  return FamilyCoverage(
+      members.family_id, name, rep_member.filepath, stamp, charset)
+
+
+def _build_index(families):
+  """Return the segment starts and the family id sets for them, for a list of
+  FamilyCoverage."""
+  events = collections.defaultdict(list)
+  for family in families:
+    if not family.charset:
+      continue
+    for start, end in family.charset.ranges():
+      events[start].append((1, family.family_id))
+      events[end + 1].append((-1, family.family_id))
+
+  starts = []
+  family_sets = []
+  current = set()
+  for cp in sorted(events):
+    for delta, family_id in events[cp]:
+      if delta > 0:
+        current.add(family_id)
+      else:
+        current.discard(family_id)
+    family_set = frozenset(current)
+    if family_sets and family_sets[-1] == family_set:
+      continue
+    starts.append(cp)
+    family_sets.append(family_set)
+  return starts, family_sets
+
+
+class CoverageDb(object):
+  """Character coverage of a set of families, with an index from code point
+  to the families that support it."""
+
+  def __init__(self, families, paths=None, index=None):
+    """families is a list of FamilyCoverage, paths the font directories they
+    were found in.  If index is None it is built from the families."""
+    self.paths = list(paths) if paths else None
+    self._families = {family.family_id: family for family in families}
+    self._starts, self._family_sets = index or _build_index(families)
+
+  def family_ids(self):
+    return sorted(self._families)
+
+  def family(self, family_id):
+    """Return the FamilyCoverage for the family id."""
+    return self._families[family_id]
+
+  def families_for_cp(self, cp):
+    """Return the frozenset of ids of the families that support cp."""
+    i = bisect.bisect_right(self._starts, cp) - 1
+    return self._family_sets[i] if i >= 0 else frozenset()
+
+  def families_for_any(self, cps):
+    """Return a map from the id of each family that supports any of cps to
+    the CodepointSet of those it supports."""
+    family_to_cps = collections.defaultdict(list)
+    for cp in cps:
+      for family_id in self.families_for_cp(cp):
+        family_to_cps[family_id].append(cp)
+    return {family_id: codepoint_set.CodepointSet(family_cps)
+            for family_id, family_cps in family_to_cps.iteritems()}
+
+  def families_for_all(self, cps):
+    """Return the frozenset of ids of the families that support all of
+    cps."""
+    result = None
+    for cp in cps:
+      family_ids = self.families_for_cp(cp)
+      result = family_ids if result is None else result & family_ids
+      if not result:
+        break
+    return result if result is not None else frozenset()
+
+  def families_for_lang(self, lang):
+    """Return the code points of the CLDR exemplar characters for lang, and
+    the frozenset of ids of the families that support all of them.  Returns
+    None if there are no exemplar characters for lang."""
+    exemplar, _ = cldr_data.get_exemplar_and_source(lang)
+    if not exemplar:
+      return None
+    cps = codepoint_set.CodepointSet(ord(c) for s in exemplar for c in s)
+    return cps, self.families_for_all(cps)
+
+  def update(self, paths=None):
+    """Return a CoverageDb for the families currently found in paths, which
+    default to the paths this was built from.  Only the fonts of families
+    that are new, or whose representative font changed, are read.  Also
+    returns the lists of added, changed, and removed family ids."""
+    paths = paths or self.paths
+    fonts = noto_fonts.get_noto_fonts(
+        paths=paths or noto_fonts.NOTO_FONT_PATHS)
+    families = []
+    added = []
+    changed = []
+    for family_id, members in sorted(
+        noto_fonts.get_family_members(fonts).iteritems()):
+      old = self._families.get(family_id)
+      filepath = members.rep_member.filepath
+      if (old and old.filepath == filepath and
+          old.stamp == _file_stamp(filepath)):
+        families.append(old)
+        continue
+      (changed if old else added).append(family_id)
+      families.append(_read_family_coverage(members))
+    removed = sorted(
+        set(self._families) - set(family.family_id for family in families))
+    if added or changed or removed:
+      db = CoverageDb(families, paths)
+    else:
+      db = CoverageDb(
+          families, paths, index=(self._starts, self._family_sets))
+    return db, added, changed, removed
+
+  def to_json(self):
+    family_ids = self.family_ids()
+    family_index = {family_id: i for i, family_id in enumerate(family_ids)}
+    set_index = {}
+    sets = []
+    for family_set in self._family_sets:
+      if family_set not in set_index:
+        set_index[family_set] = len(sets)
+        sets.append(sorted(family_index[f] for f in family_set))
+    families = []
+    for family_id in family_ids:
+      family = self._families[family_id]
+      families.append({
+          'id': family_id,
+          'name': family.name,
+          'filepath': family.filepath,
+          'stamp': list(family.stamp),
+          'cmap': (family.charset.to_range_string()
+                   if family.charset is not None else None),
+      })
+    return {
+        'version': _VERSION,
+        'paths': self.paths,
+        'families': families,
+        'index': {
+            'starts': self._starts,
+            'sets': [set_index[family_set]
+                     for family_set in self._family_sets],
+            'family_sets': sets,
+        },
+    }
+
+  @classmethod
+  def from_json(cls, data):
+    if data.get('version') != _VERSION:
+      raise ValueError(
+          'unsupported coverage db version %s' % data.get('version'))
+    families = []
+    for family in data['families']:
+      charset = family['cmap']
+      if charset is not None:
+        charset = codepoint_set.CodepointSet.from_range_string(charset)
+      families.append(FamilyCoverage(
+          family['id'], family['name'], _to_path(family['filepath']),
+          tuple(family['stamp']), charset))
+    family_ids = [family.family_id for family in families]
+    index = data['index']
+    family_sets = [frozenset(family_ids[i] for i in family_set)
+                   for family_set in index['family_sets']]
+    paths = data['paths']
+    return cls(
+        families, [_to_path(p) for p in paths] if paths else None,
+        index=(index['starts'], [family_sets[i] for i in index['sets']]))
+
+
+def build_db(paths=None):
+  """Return a CoverageDb for the noto families found in paths, which default
+  to the standard noto font paths."""
+  db, _, _, _ = CoverageDb([], paths).update()
+  return db
+
+
+def read_db(filename):
+  with open(filename, 'r') as f:
+    return CoverageDb.from_json(json.load(f))
+
+
+def write_db(db, filename):
+  with open(filename, 'w') as f:
+    json.dump(db.to_json(), f, sort_keys=True, separators=(',', ':'))
+
+
+def _print_updates(added, changed, removed):
+  for label, family_ids in [
+      ('added', added), ('changed', changed), ('removed', removed)]:
+    if family_ids:
+      print '%s %d: %s' % (label, len(family_ids), ', '.join(family_ids))
+
+
+def _family_names(db, family_ids):
+  return sorted(db.family(family_id).name for family_id in family_ids)
+
+
+def _query_each(db, cps):
+  """Print the families supporting each run of cps with the same
+  families."""
+  def emit(run_cps, family_ids):
+    if family_ids:
+      names = '\n  '.join(_family_names(db, family_ids))
+    else:
+      names = '<no coverage>'
+    print '%s:\n  %s' % (
+        codepoint_set.CodepointSet(run_cps).to_range_string(), names)
+
+  run_cps = []
+  run_families = None
+  for cp in cps:
+    family_ids = db.families_for_cp(cp)
+    if run_cps and family_ids != run_families:
+      emit(run_cps, run_families)
+      run_cps = []
+    run_cps.append(cp)
+    run_families = family_ids
+  if run_cps:
+    emit(run_cps, run_families)
+
+
+def _query_all(db, cps):
+  print 'families that contain all of %s' % cps.to_range_string()
+  family_ids = db.families_for_all(cps)
+  if family_ids:
+    print '\n'.join('  %s' % name for name in _family_names(db, family_ids))
+  else:
+    print 'no family contains all the codepoints'
+
+
+def _query_lang(db, lang):
+  result = db.families_for_lang(lang)
+  if result is None:
+    print 'no exemplar characters for %s' % lang
+    return
+  cps, family_ids = result
+  print 'families that support the %d exemplar characters of %s' % (
+      len(cps), lang)
+  if family_ids:
+    print '\n'.join('  %s' % name for name in _family_names(db, family_ids))
+    return
+  print 'no family supports all of them, best coverage:'
+  family_to_cps = db.families_for_any(cps)
+  for family_id, family_cps in sorted(
+      family_to_cps.iteritems(), key=lambda (f, c): (-len(c), f))[:5]:
+    print '  %s: missing %s' % (
+        db.family(family_id).name, (cps - family_cps).to_range_string())
+
+
+def _read_or_update(db_file, update):
+  db = read_db(db_file)
+  if update:
+    db, added, changed, removed = db.update()
+    if added or changed or removed:
+      _print_updates(added, changed, removed)
+      write_db(db, db_file)
+  return db
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='notocoverage')
+  subparsers = parser.add_subparsers(dest='command')
+
+  build_parser = subparsers.add_parser(
+      'build', help='build a coverage db from the noto fonts')
+  build_parser.add_argument(
+      '-d', '--dirs', help='font directories, default the standard noto '
+      'font paths', metavar='dir', nargs='+')
+  build_parser.add_argument(
+      '-o', '--output', help='db file to write (default %s)' % DEFAULT_DB,
+      metavar='file', default=DEFAULT_DB)
+
+  update_parser = subparsers.add_parser(
+      'update', help='update a coverage db for changed fonts')
+  update_parser.add_argument(
+      '--db', help='db file (default %s)' % DEFAULT_DB, metavar='file',
+      default=DEFAULT_DB)
+
+  query_parser = subparsers.add_parser(
+      'query', help='show families supporting code points or a language')
+  query_parser.add_argument(
+      'cps', help='hex code points or ranges, show the supporting families '
+      'for each', metavar='cp', nargs='*')
+  query_parser.add_argument(
+      '--all', help='show families that support all of the code points',
+      metavar='cp', nargs='+')
+  query_parser.add_argument(
+      '--lang', help='show families that support the exemplar characters '
+      'of the language', metavar='lang', nargs='+')
+  query_parser.add_argument(
+      '--names', help='print family names', action='store_true')
+  query_parser.add_argument(
+      '--db', help='db file (default %s)' % DEFAULT_DB, metavar='file',
+      default=DEFAULT_DB)
+  query_parser.add_argument(
+      '-u', '--update', help='update the db for changed fonts first',
+      action='store_true')
+
+  args = parser.parse_args(argv)
+
+  if args.command == 'build':
+    db = build_db(args.dirs)
+    write_db(db, args.output)
+    print 'wrote %d families to %s' % (len(db.family_ids()), args.output)
+    return
+
+  if args.command == 'update':
+    db, added, changed, removed = read_db(args.db).update()
+    _print_updates(added, changed, removed)
+    write_db(db, args.db)
+    return
+
+  db = _read_or_update(args.db, args.update)
+  if args.names:
+    print '\n'.join(_family_names(db, db.family_ids()))
+  if args.cps:
+    cps = codepoint_set.CodepointSet.from_range_string(' '.join(args.cps))
+    print 'families that contain any of %s, by cp' % cps.to_range_string()
+    _query_each(db, cps)
+  if args.all:
+    _query_all(
+        db, codepoint_set.CodepointSet.from_range_string(' '.join(args.all)))
+  if args.lang:
+    for lang in args.lang:
+      _query_lang(db, lang)
+
+
+if __name__ == '__main__':
+  main()
@@ -21,15 +21,14 @@ __author__ = 'roozbeh@google.com (Roozbeh Pournader)'
 import sys
 
 from fontTools import ttLib
-from fontTools.ttLib import sfnt
+
+from nototools import sfnt_directory
 
 
 def main(argv):
     """Decompose all fonts provided in the command line."""
     for font_file_name in argv[1:]:
-        with open(font_file_name, 'rb') as font_file:
-            font = sfnt.SFNTReader(font_file, fontNumber=0)
-            num_fonts = font.numFonts
+        num_fonts = sfnt_directory.read_directory(font_file_name).num_fonts
         for font_number in range(num_fonts):
             font = ttLib.TTFont(font_file_name, fontNumber=font_number)
             font.save('%s-part%d' % (font_file_name, font_number))
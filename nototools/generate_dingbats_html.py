@@ -22,12 +22,12 @@ import string
 import sys
 
 from fontTools import ttLib
-from fontTools.pens.boundsPen import BoundsPen
 
 from os import path
 
 from nototools import cmap_data
 from nototools import font_data
+from nototools import render
 from nototools import tool_utils
 from nototools import unicode_data
 
@@ -121,7 +121,7 @@ class CodeList(object):
 
   @staticmethod
   def fromfontcmap(fontname):
-    font = ttLib.TTFont(fontname)
+    font = ttLib.TTFont(fontname, lazy=True)
     return CodeList.fromset(font_data.get_cmap(font))
 
   @staticmethod
@@ -409,11 +409,8 @@ class CodeTableTarget(Target):
 
     if metrics != None:
       # the metrics apply to the rightmost font
-      fontname = self.used_fonts[-1][1][0][0]
-      if fontname:
-        metrics_font = _get_font(fontname)
-      else:
-        metrics_font = None
+      metrics_font = self.used_fonts[-1][1][0][0]
+      if not metrics_font:
         print >> sys.stderr, 'no metrics font'
 
     lines = ['<h3 id="target_%d">%s</h3>' % (tindex, self.name)]
@@ -520,7 +517,8 @@ def _load_fonts(data_list, data_dir, codelist_map):
       codelist = _load_codelist(codelistfile, data_dir, codelist_map)
 
     if fname and (not codelistfile or not name):
-      font = ttLib.TTFont(fontpath)
+      # only the name and cmap tables are read
+      font = ttLib.TTFont(fontpath, lazy=True)
       if not name:
         names = font_data.get_name_records(font)
         name = names[16] if 16 in names else names[1] if 1 in names else None
@@ -966,32 +964,69 @@ def _character_string_html(codelist, used_font):
   return ''.join(line)
 
 
-_FONT_CACHE = {}
-def _get_font(fontname):
-  font = _FONT_CACHE.get(fontname)
-  if not font:
-    font = ttLib.TTFont(fontname)
-    _FONT_CACHE[fontname] = font
-  return font
+GMetrics = collections.namedtuple('GMetrics', 'lsb, rsb, wid, adv, cy')
 
+# Bump this if the format of the cached metrics changes.
+METRICS_CACHE_VERSION = 1
+
+# Path of the persistent metrics cache, set by generate.  None for no cache.
+_metrics_cache_path = None
+
+_FONT_METRICS = {}
+
+
+def _compute_font_metrics(fontname):
+  """Return a map from cp to a (lsb, rsb, wid, adv, cy) tuple for the nominal
+  glyph of each cp in the font's cmap.  Cps whose glyphs have no outline are
+  omitted.  Each glyph is measured once even if several cps map to it."""
+  font = ttLib.TTFont(fontname, lazy=True)
+  cmap = font_data.get_cmap(font)
+  hmtx = font['hmtx'].metrics
+  glyph_bounds = render.GlyphBounds(font, ignore_single_points=False)
+  glyph_metrics = {}
+  cp_metrics = {}
+  for cp, glyph_name in cmap.iteritems():
+    if glyph_name not in glyph_metrics:
+      bounds = glyph_bounds.bounds(glyph_name)
+      if bounds:
+        xmin, ymin, xmax, ymax = bounds
+        width = hmtx[glyph_name][0]
+        glyph_metrics[glyph_name] = (
+            xmin, width - xmax, xmax - xmin, width, (ymin + ymax) / 2)
+      else:
+        glyph_metrics[glyph_name] = None
+    if glyph_metrics[glyph_name]:
+      cp_metrics[cp] = glyph_metrics[glyph_name]
+  font.close()
+  return cp_metrics
 
-GMetrics = collections.namedtuple('GMetrics', 'lsb, rsb, wid, adv, cy')
 
+def _get_font_metrics(fontname):
+  """Return a map from cp to GMetrics for the font, see _compute_font_metrics.
+  The metrics are computed once per font file and kept in the metrics cache
+  keyed by the hash of the file."""
+  cp_metrics = _FONT_METRICS.get(fontname)
+  if cp_metrics is not None:
+    return cp_metrics
+
+  font_hash = tool_utils.file_hash(fontname)
+  cache = tool_utils.read_cache(_metrics_cache_path, METRICS_CACHE_VERSION)
+  metrics_tuples = cache.get(font_hash)
+  if metrics_tuples is None:
+    metrics_tuples = _compute_font_metrics(fontname)
+    if _metrics_cache_path:
+      cache[font_hash] = metrics_tuples
+      tool_utils.write_cache(
+          _metrics_cache_path, METRICS_CACHE_VERSION, cache)
 
-def _get_cp_metrics(font, cp):
-    # returns metrics for nominal glyph for cp, or None if cp not in font
-    cmap = font_data.get_cmap(font)
-    if cp not in cmap:
-      return None
-    glyphs = font.getGlyphSet()
-    g = glyphs[cmap[cp]]
-    pen = BoundsPen(glyphs)
-    g.draw(pen)
-    if not pen.bounds:
-      return None
-    xmin, ymin, xmax, ymax = pen.bounds
-    return GMetrics(
-        xmin, g.width - xmax, xmax - xmin, g.width, (ymin + ymax) / 2)
+  cp_metrics = {cp: GMetrics(*t) for cp, t in metrics_tuples.iteritems()}
+  _FONT_METRICS[fontname] = cp_metrics
+  return cp_metrics
+
+
+def _get_cp_metrics(fontname, cp):
+  """Return metrics for nominal glyph for cp, or None if cp not in font."""
+  return _get_font_metrics(fontname).get(cp)
 
 
 _expr_re = re.compile(r'(\||&|(?<![0-9a-fA-F])-(?![0-9a-fA-F]))')
@@ -1167,9 +1202,14 @@ def _build_cp_to_targets(targets):
 
 def generate(
     outfile, fmt, data_dir, font_spec, target_spec, flag_spec, title=None,
-    context=None, metrics=False, relpath=None):
+    context=None, metrics=False, relpath=None, metrics_cache=None):
+  """If metrics_cache is provided, it names a file in which the glyph metrics
+  of the fonts are cached, keyed by the hash of the font file."""
+  global _metrics_cache_path
+
   if not path.isdir(data_dir):
     raise Exception('data dir "%s" does not exist' % data_dir)
+  _metrics_cache_path = metrics_cache
 
   font_data = _read_font_data_from_file(path.join(data_dir, font_spec))
   target_data = _read_target_data_from_file(
@@ -1214,7 +1254,7 @@ def _parse_metrics_file(filename):
 
 def _call_generate(
     outfile, fmt, data_dir, font_spec, target_spec, flag_spec, title=None,
-    context=None, metrics=None):
+    context=None, metrics=None, metrics_cache=None):
   data_dir = path.realpath(path.abspath(data_dir))
   if metrics != None:
     if metrics == '-':
@@ -1250,17 +1290,18 @@ def _call_generate(
     with codecs.open(outfile, 'w', 'utf-8') as f:
       generate(
           f, fmt, data_dir, font_spec, target_spec, flag_spec, title, context,
-          metrics, relpath)
+          metrics, relpath, metrics_cache)
   else:
     if not fmt:
       fmt = 'txt'
     generate(
         sys.stdout, fmt, data_dir, font_spec, target_spec, flag_spec, title,
-        context, metrics)
+        context, metrics, metrics_cache=metrics_cache)
 
 
 def main():
   DEFAULT_OUT = 'dingbats_compare'
+  DEFAULT_METRICS_CACHE = '/tmp/generate_dingbats_html/metrics_cache.pkl'
 
   parser = argparse.ArgumentParser()
   parser.add_argument(
@@ -1293,12 +1334,16 @@ def main():
   parser.add_argument(
       '-m', '--metrics', help='Report metrics of target font, optionally '
       'with preferred metrics file', metavar='file', nargs='?', const='-')
+  parser.add_argument(
+      '--cache_file', help='cache of glyph metrics, keyed by font file hash '
+      '(default %s), \'-\' for no cache' % DEFAULT_METRICS_CACHE,
+      metavar='file', default=DEFAULT_METRICS_CACHE)
   args = parser.parse_args()
 
   _call_generate(
       args.outfile, args.output_type, args.data_dir, args.font_spec,
       args.target_spec, args.flag_spec, args.title, args.context,
-      args.metrics)
+      args.metrics, tool_utils.resolve_path(args.cache_file))
 
 if __name__ == '__main__':
   main()
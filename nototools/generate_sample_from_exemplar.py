@@ -19,6 +19,7 @@ exemplar data for languages written in a script."""
 import argparse
 import codecs
 import collections
+import hashlib
 import locale
 import os
 from os import path
@@ -48,6 +49,48 @@ CLDR_DIR = path.join(NOTO_TOOLS, 'third_party', 'cldr')
 
 _VERBOSE = False
 
+# Bump this if the format of the cached exemplar data changes.
+EXEMPLAR_CACHE_VERSION = 1
+
+def _exemplar_data_signature():
+  """Return a digest identifying the state of the CLDR files and the extra
+  locale data read by get_script_to_exemplar_data_map."""
+  h = hashlib.sha1()
+  for directory in ['common', 'seed', 'exemplars']:
+    data_dir = path.join(CLDR_DIR, directory, 'main')
+    for filename in sorted(os.listdir(data_dir)):
+      st = os.stat(path.join(data_dir, filename))
+      h.update('%s/%s:%d:%d\n' % (directory, filename, st.st_size, st.st_mtime))
+  h.update(repr(sorted(extra_locale_data.EXEMPLARS.iteritems())))
+  return h.hexdigest()
+
+
+def get_cached_exemplar_data(cache_path):
+  """Return a tuple of the script to exemplar data map (see
+  get_script_to_exemplar_data_map) and a map from script to the char to
+  lang map for that script's locales (see get_char_to_lang_map).  If
+  cache_path is provided, the data is read from there when the CLDR data
+  has not changed since it was written, otherwise it is computed and
+  written there."""
+  signature = _exemplar_data_signature()
+  cache = tool_utils.read_cache(cache_path, EXEMPLAR_CACHE_VERSION)
+  if cache.get('signature') == signature:
+    if _VERBOSE:
+      print 'using exemplar data from %s' % cache_path
+    return cache['script_map'], cache['script_to_char_to_lang_map']
+
+  script_map = get_script_to_exemplar_data_map()
+  script_to_char_to_lang_map = {
+      script: dict(get_char_to_lang_map(loc_map))
+      for script, loc_map in script_map.iteritems()}
+  if cache_path:
+    tool_utils.write_cache(cache_path, EXEMPLAR_CACHE_VERSION, {
+        'signature': signature,
+        'script_map': dict(script_map),
+        'script_to_char_to_lang_map': script_to_char_to_lang_map})
+  return script_map, script_to_char_to_lang_map
+
+
 def get_script_to_exemplar_data_map():
   """Return a map from script to 3-tuples of:
     - locale tuple (lang, script, region, variant)
@@ -419,7 +462,9 @@ def _generate_excluded_characters():
 _EXCLUDE_CHARS = _generate_excluded_characters()
 
 
-def generate_sample_for_script(script, loc_map):
+def generate_sample_for_script(script, loc_map, char_to_lang_map=None):
+  """Return a tuple of sample and info for the script.  If char_to_lang_map
+  is not provided it is computed from loc_map."""
   num_locales = len(loc_map)
 
   if num_locales == 1:
@@ -435,7 +480,8 @@ def generate_sample_for_script(script, loc_map):
 
   script_tag = '-' + script
 
-  char_to_lang_map = get_char_to_lang_map(loc_map)
+  if char_to_lang_map is None:
+    char_to_lang_map = get_char_to_lang_map(loc_map)
   if len(char_to_lang_map) <= 60:
     info = '%s (%d locales)\nfrom merged exemplars (%d chars) from %s' % (
         script, num_locales, len(char_to_lang_map),
@@ -483,7 +529,22 @@ def generate_sample_for_script(script, loc_map):
   return sample, info
 
 
-def generate_samples(dstdir, imgdir, summary):
+def _generate_sample_for_script(args):
+  """Process pool adapter for generate_sample_for_script."""
+  return generate_sample_for_script(*args)
+
+
+def _create_sample_image(args):
+  """Process pool adapter for create_image.create_png."""
+  sample, imgpath, rtl = args
+  create_image.create_png(
+      sample, imgpath, font_size=34, line_spacing=40, width=800, rtl=rtl)
+
+
+def generate_samples(dstdir, imgdir, summary, cache_path=None, processes=None):
+  """Generate samples for all scripts, using a pool of processes (default
+  one per cpu), and write the samples to dstdir and/or images of them to
+  imgdir.  See get_cached_exemplar_data for cache_path."""
   if imgdir:
     imgdir = tool_utils.ensure_dir_exists(imgdir)
     print 'writing images to %s' % imgdir
@@ -492,21 +553,25 @@ def generate_samples(dstdir, imgdir, summary):
     dstdir = tool_utils.ensure_dir_exists(dstdir)
     print 'writing files to %s' % dstdir
 
-  verbose = summary
-  script_map = get_script_to_exemplar_data_map()
-  for script in sorted(script_map):
-    sample, info = generate_sample_for_script(script, script_map[script])
+  script_map, script_to_char_to_lang_map = get_cached_exemplar_data(cache_path)
+  scripts = sorted(script_map)
+  results = tool_utils.parallel_map(
+      _generate_sample_for_script,
+      [(script, script_map[script], script_to_char_to_lang_map[script])
+       for script in scripts],
+      processes)
+
+  image_args = []
+  for script, (sample, info) in zip(scripts, results):
     if summary:
       print
       print info
       print sample
 
     if imgdir:
-      path = os.path.join(imgdir, 'und-%s_chars.png' % script)
-      print 'writing image %s.png' % script
+      imgpath = os.path.join(imgdir, 'und-%s_chars.png' % script)
       rtl = script in ['Adlm', 'Arab', 'Hebr', 'Nkoo', 'Syrc', 'Tfng', 'Thaa']
-      create_image.create_png(
-          sample, path, font_size=34, line_spacing=40, width=800, rtl=rtl)
+      image_args.append((sample, imgpath, rtl))
 
     if dstdir:
       filename = 'und-%s_chars.txt' % script
@@ -515,9 +580,14 @@ def generate_samples(dstdir, imgdir, summary):
       with codecs.open(filepath, 'w', 'utf-8') as f:
         f.write(sample + '\n')
 
+  if image_args:
+    print 'writing %d images' % len(image_args)
+    tool_utils.parallel_map(_create_sample_image, image_args, processes)
+
 
 def main():
   default_dstdir = os.path.join(NOTO_TOOLS, 'sample_texts')
+  default_cache = '/tmp/generate_sample_from_exemplar/exemplar_cache.pkl'
 
   parser = argparse.ArgumentParser()
   parser.add_argument('--dstdir', help='where to write samples (default %s)' %
@@ -528,6 +598,11 @@ def main():
   parser.add_argument('--summary', help='output list of samples and how they were generated',
                       action='store_true')
   parser.add_argument('--verbose', help='print warnings and extra info', action='store_true')
+  parser.add_argument('--cache_file', help='cache of parsed exemplar data (default '
+                      '%s), \'-\' for no cache' % default_cache,
+                      default=default_cache, metavar='file')
+  parser.add_argument('-p', '--processes', help='number of processes to use '
+                      '(default one per cpu)', type=int, metavar='n')
   args = parser.parse_args()
 
   if not args.save and not args.imgdir and not args.summary:
@@ -538,7 +613,9 @@ def main():
     global _VERBOSE
     _VERBOSE = True
 
-  generate_samples(args.dstdir if args.save else None, args.imgdir, args.summary)
+  generate_samples(
+      args.dstdir if args.save else None, args.imgdir, args.summary,
+      tool_utils.resolve_path(args.cache_file), args.processes)
 
 
 if __name__ == '__main__':
@@ -16,7 +16,9 @@
 
 import argparse
 import codecs
+import itertools
 import re
+import sys
 
 """Generate samples from a description file."""
 
@@ -97,6 +99,10 @@ sequences within an group.
 #   write a line containing the name of the pattern before the samples that
 #   each pattern generates, and separate each such group of samples with a
 #   blank line.
+#
+# --count
+#   report the number of samples and the size of the output each pattern
+#   would generate, without generating it.
 
 
 # Some unicode utilities for working with python2 narrow builds.
@@ -151,63 +157,90 @@ class SampleGen(object):
     self.patterns = patterns
     self.pattern_order = pattern_order
 
-  def generate(self, out_file, select_patterns, group, sep, label, sort):
+  def _select_patterns(self, select_patterns):
     if not select_patterns:
-      select_patterns = self.pattern_order
-    else:
-      ok_patterns = []
-      for pattern in select_patterns:
-        if pattern not in self.patterns:
-          print 'No pattern named \'%s\' in %s' % (
-              pattern, ', '.join(self.pattern_order))
-          continue
-        ok_patterns.append(pattern)
-      select_patterns = ok_patterns
-
-    output_lines = []
+      return self.pattern_order
+    ok_patterns = []
     for pattern in select_patterns:
-      self._generate_output(output_lines, pattern, group, sep, label, sort)
-    if not label:
-      # force trailing newline, if we label we already have one
-      output_lines.append('')
-    output_text = '\n'.join(output_lines)
+      if pattern not in self.patterns:
+        print 'No pattern named \'%s\' in %s' % (
+            pattern, ', '.join(self.pattern_order))
+        continue
+      ok_patterns.append(pattern)
+    return ok_patterns
 
+  def generate(self, out_file, select_patterns, group, sep, label, sort):
+    """Write the samples to out_file, or to stdout if out_file is None.
+    Samples are written as they are generated, so the output is never
+    held in memory."""
+    select_patterns = self._select_patterns(select_patterns)
     if out_file:
       with codecs.open(out_file, 'w', 'utf-8') as f:
-        f.write(output_text)
-    else:
-      print output_text
-
-
-  def _generate_output(self, output_lines, pattern, group, sep, label, sort):
-    pat_list = self.patterns[pattern]
-    if label:
-      output_lines.append(pattern)
-    pat_output = []
-    self._gen_results(pat_list, sort, '', pat_output)
-    if group:
-      output_lines.append(sep.join(pat_output))
+        self._write_output(f, select_patterns, group, sep, label, sort)
     else:
-      output_lines.extend(pat_output)
-    if label:
-      output_lines.append('')
-
-  def _gen_results(self, pat_list, sort, prefix, samples):
-    if not pat_list:
-      samples.append(prefix)
-      return
-    items = self._get_items(pat_list[0], sort)
-    for item in items:
-      self._gen_results(pat_list[1:], sort, prefix + item, samples)
-
+      out = codecs.getwriter('utf-8')(sys.stdout)
+      self._write_output(out, select_patterns, group, sep, label, sort)
+      # the output ends with a newline, but this used to be printed, which
+      # added another
+      out.write('\n')
+
+  def _write_output(self, f, select_patterns, group, sep, label, sort):
+    for i, pattern in enumerate(select_patterns):
+      if label:
+        if i:
+          f.write('\n')
+        f.write(pattern + '\n')
+      samples = self._gen_results(self.patterns[pattern], sort)
+      if group:
+        for j, sample in enumerate(samples):
+          if j:
+            f.write(sep)
+          f.write(sample)
+        f.write('\n')
+      else:
+        for sample in samples:
+          f.write(sample + '\n')
+
+  def count(self, select_patterns, group, sep, label):
+    """Return a list of tuples of pattern name, number of samples, and size
+    in bytes of the utf-8 output that generate would produce for that pattern
+    (including labels and separators).  This does not generate the samples."""
+    result = []
+    sep_len = len(sep.encode('utf-8'))
+    for i, pattern in enumerate(self._select_patterns(select_patterns)):
+      item_lens = [
+          [len(item.encode('utf-8')) for item in self._get_items(g, False)]
+          for g in self.patterns[pattern]]
+      num_samples = 1
+      for lens in item_lens:
+        num_samples *= len(lens)
+      # each item of a group appears in num_samples / len(group) samples
+      size = sum(sum(lens) * (num_samples // len(lens))
+                 for lens in item_lens if lens)
+      if group:
+        size += max(0, num_samples - 1) * sep_len + 1
+      else:
+        size += num_samples
+      if label:
+        size += len(pattern.encode('utf-8')) + 1 + (1 if i else 0)
+      result.append((pattern, num_samples, size))
+    return result
+
+  def _gen_results(self, pat_list, sort):
+    """Generate the samples for the pattern list in order."""
+    item_lists = [self._get_items(group, sort) for group in pat_list]
+    for items in itertools.product(*item_lists):
+      yield ''.join(items)
 
   def _get_items(self, group, sort):
     if type(group) == tuple:
       items = []
+      seen = set()
       for subgroup in group:
         for item in self._get_items(subgroup, False):
           # ensure no duplicates result from union of groups
-          if item not in items:
+          if item not in seen:
+            seen.add(item)
             items.append(item)
     else:
       items = group
@@ -485,11 +518,22 @@ def parse_sample_gen(definition):
 
 def generate_samples(
     defs_file, out_file, patterns=None, group=False, sep='\t',
-    label=False, sort=False):
+    label=False, sort=False, count=False):
 
   with codecs.open(defs_file, 'r', 'utf-8') as f:
     sample_gen = parse_sample_gen(f.read())
-  if sample_gen:
+  if not sample_gen:
+    return
+  if count:
+    total_samples = 0
+    total_size = 0
+    for pattern, num_samples, size in sample_gen.count(
+        patterns, group, sep, label):
+      print '%s: %d samples, %d bytes' % (pattern, num_samples, size)
+      total_samples += num_samples
+      total_size += size
+    print 'total: %d samples, %d bytes' % (total_samples, total_size)
+  else:
     sample_gen.generate(out_file, patterns, group, sep, label, sort)
 
 
@@ -512,6 +556,9 @@ def main():
         '-l', '--label', help='include the name of a pattern before the '
         'samples it generates, separate groups with blank lines',
         action='store_true')
+    parser.add_argument(
+        '-c', '--count', help='report the number of samples and output size '
+        'for each pattern instead of generating them', action='store_true')
     parser.add_argument(
         'defs', help='the name of the definitions file',
         metavar='definition_file')
@@ -522,7 +569,7 @@ def main():
 
     generate_samples(
         args.defs, args.out, patterns=args.patterns, group=args.group,
-        sep=args.sep, label=args.label, sort=args.sort)
+        sep=args.sep, label=args.label, sort=args.sort, count=args.count)
 
 if __name__ == '__main__':
     main()
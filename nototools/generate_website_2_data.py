@@ -27,6 +27,7 @@ import collections
 import csv
 import datetime
 import glob
+import hashlib
 import json
 import locale
 import os
@@ -71,6 +72,12 @@ Built on %s from the following noto repositor%s:
 -----
 """
 
+# The build manifest records the inputs of each output in the target directory.
+# Bump the version when a change to this file changes what gets built from the
+# same inputs; all outputs are then rebuilt.
+BUILD_MANIFEST_NAME = '.build_manifest'
+BUILD_MANIFEST_VERSION = 1
+
 
 def check_families(family_map):
   # ensure the count of fonts in a family is what we expect
@@ -635,11 +642,71 @@ def check_debug(debug):
   return frozenset(debug)
 
 
+class BuildManifest(object):
+  """Tracks the outputs built in a target directory.
+
+  Each output is recorded with a key computed from its inputs: the hashes of
+  the files it is built from and the other values that determine its content.
+  An output is current if it exists and its recorded key matches the key for
+  its inputs now, so a run only rebuilds outputs whose inputs changed.  File
+  hashes are cached by path, size, and modification time so that unchanged
+  fonts are not read again."""
+
+  def __init__(self, target):
+    self.target = target
+    self.manifest_path = path.join(target, BUILD_MANIFEST_NAME)
+    data = tool_utils.read_cache(self.manifest_path, BUILD_MANIFEST_VERSION)
+    self._output_keys = data.get('outputs', {})
+    self._file_hashes = data.get('files', {})
+
+  def file_hash(self, filepath):
+    st = os.stat(filepath)
+    signature = (st.st_size, st.st_mtime)
+    entry = self._file_hashes.get(filepath)
+    if not entry or entry[0] != signature:
+      entry = (signature, tool_utils.file_hash(filepath))
+      self._file_hashes[filepath] = entry
+    return entry[1]
+
+  def inputs_key(self, filepaths, values=()):
+    """Return a key for an output built from the files in filepaths and the
+    values, which must have a stable repr."""
+    h = hashlib.sha1()
+    for filepath in filepaths:
+      h.update('%s:%s\n' % (path.basename(filepath), self.file_hash(filepath)))
+    h.update(repr(values))
+    return h.hexdigest()
+
+  def _output_name(self, outpath):
+    return path.relpath(outpath, self.target)
+
+  def is_current(self, outpath, key):
+    return (path.isfile(outpath) and
+            self._output_keys.get(self._output_name(outpath)) == key)
+
+  def record(self, outpath, key):
+    self._output_keys[self._output_name(outpath)] = key
+
+  def save(self):
+    tool_utils.write_cache(
+        self.manifest_path, BUILD_MANIFEST_VERSION,
+        {'outputs': self._output_keys, 'files': self._file_hashes})
+
+
+def _create_image(args):
+  """Adapter for parallel_map, args are the text, output path, and
+  create_image.create_img keyword arguments."""
+  sample_text, image_location, kwargs = args
+  print 'create %s' % path.basename(image_location)
+  create_image.create_img(sample_text, image_location, **kwargs)
+
+
 class WebGen(object):
 
   def __init__(
       self, target, clean, repo_info, pretty_json, no_zips=False,
-      no_images=False, no_css=False, no_data=False, no_build=False, debug=None):
+      no_images=False, no_css=False, no_data=False, no_build=False, debug=None,
+      processes=None):
     self.target = target
     self.clean = clean
     self.repo_info = repo_info
@@ -650,6 +717,8 @@ class WebGen(object):
     self.no_data = no_data
     self.no_build = no_build or (no_zips and no_images and no_css and no_data)
     self.debug = check_debug(debug)
+    self.processes = processes
+    self.manifest = None
 
     self.pkgs = path.join(target, 'pkgs')
     self.fonts = path.join(target, 'fonts')
@@ -686,21 +755,39 @@ class WebGen(object):
     if self.pretty_json:
       mkdirs(path.join(self.data, 'pretty'))
 
-  def create_zip(self, name, fonts, readme_path):
+  def zip_is_current(self, zippath, pairs, readme_key):
+    """Return a tuple of whether the zip at zippath is current, and its key.
+    pairs are the (source path, name in zip) pairs except for the readme.
+    The readme includes the build date, so it is represented in the key by
+    its text without the date.  If readme_key is None there is no readme."""
+    readme_text = self.readme_text(readme_key, None) if readme_key else None
+    pairs = sorted(pairs)
+    key = self.manifest.inputs_key(
+        [src for src, _ in pairs], ([dst for _, dst in pairs], readme_text))
+    return self.manifest.is_current(zippath, key), key
+
+  def create_zip(self, name, fonts, readme_key):
     zipname = name + '.zip'
     zippath = path.join(self.pkgs, zipname)
-    if path.isfile(zippath):
-      print('Assuming %s is valid.' % zipname)
+    readme_path = self.get_readme_path(readme_key)
+    pairs = []
+    license_types = set(font.license_type for font in fonts)
+    if 'apache' in license_types:
+      pairs.append((APACHE_LICENSE_LOC, 'LICENSE_APACHE.txt'))
+    if 'sil' in license_types:
+      pairs.append((SIL_LICENSE_LOC, 'LICENSE_OFL.txt'))
+    for font in fonts:
+      pairs.append((font.filepath, path.basename(font.filepath)))
+    is_current, key = self.zip_is_current(zippath, pairs, readme_key)
+    if is_current:
+      print 'Zip %s is up to date.' % zipname
     else:
-      pairs = [(readme_path, path.basename(readme_path))]
-      license_types = set(font.license_type for font in fonts)
-      if 'apache' in license_types:
-        pairs.append((APACHE_LICENSE_LOC, 'LICENSE_APACHE.txt'))
-      if 'sil' in license_types:
-        pairs.append((SIL_LICENSE_LOC, 'LICENSE_OFL.txt'))
-      for font in fonts:
-        pairs.append((font.filepath, path.basename(font.filepath)))
+      if path.isfile(zippath):
+        # 7za adds to an existing zip
+        os.remove(zippath)
+      pairs.insert(0, (readme_path, path.basename(readme_path)))
       tool_utils.generate_zip_with_7za_from_filepairs(pairs, zippath)
+      self.manifest.record(zippath, key)
       print 'Created zip %s' % zippath
     return os.stat(zippath).st_size
 
@@ -718,42 +805,43 @@ class WebGen(object):
   def get_readme_path(self, readme_key):
     return '/tmp/readmes/%s/README' % readme_key
 
+  def readme_text(self, readme_key, date_str):
+    names = self.get_readme_keys()
+    if readme_key == 'all':
+      parts = [README_HEADER % (date_str, 'ies')]
+      for i, n in enumerate(names[:-1]):
+        if i > 0:
+          parts.append('-----\n')
+        parts.append(self.repo_info[n])
+        parts.append('\n')
+    else:
+      parts = [README_HEADER % (date_str, 'y'), self.repo_info[readme_key], '\n']
+    return ''.join(parts)
+
   def build_readmes(self):
     """Create README files for the zips.  These are named README
     and are put into /tmp/readmes/{fonts|cjk|emoji|all} before
     being copied to zip files."""
 
     date_str = str(datetime.date.today())
-    names = self.get_readme_keys()
-    for name in names:
+    for name in self.get_readme_keys():
       fname = self.get_readme_path(name)
       tool_utils.ensure_dir_exists(path.dirname(fname))
       with open(fname, 'w') as f:
-        if name == 'all':
-          f.write(README_HEADER % (date_str, 'ies'))
-          for i, n in enumerate(names[:-1]):
-            if i > 0:
-              f.write('-----\n')
-            f.write(self.repo_info[n])
-            f.write('\n')
-        else:
-          f.write(README_HEADER % (date_str, 'y'))
-          f.write(self.repo_info[name])
-          f.write('\n')
+        f.write(self.readme_text(name, date_str))
 
   def build_family_zips(self, key, family):
     readme_key = self.get_readme_key_for_filepath(family.rep_member.filepath)
-    readme_path = self.get_readme_path(readme_key)
 
     zip_name = noto_fonts.get_family_filename(family)
     hinted_size = 0
     unhinted_size = 0
     if family.hinted_members:
       hinted_size = self.create_zip(
-          zip_name + '-hinted', family.hinted_members, readme_path)
+          zip_name + '-hinted', family.hinted_members, readme_key)
     if family.unhinted_members:
       unhinted_size = self.create_zip(
-          zip_name + '-unhinted', family.unhinted_members, readme_path)
+          zip_name + '-unhinted', family.unhinted_members, readme_key)
     return zip_name, hinted_size, unhinted_size
 
   def build_zips(self, families):
@@ -765,22 +853,22 @@ class WebGen(object):
   def build_universal_zips(self, families):
     hinted_fonts = []
     unhinted_fonts = []
-    readme_path = self.get_readme_path('all')
     for family_data in families.values():
       hinted_fonts.extend(
           family_data.hinted_members or family_data.unhinted_members)
       unhinted_fonts.extend(
           family_data.unhinted_members or family_data.hinted_members)
-    hinted_size = self.create_zip(
-        'Noto-hinted', hinted_fonts, readme_path)
-    unhinted_size = self.create_zip(
-        'Noto-unhinted', unhinted_fonts, readme_path)
+    hinted_size = self.create_zip('Noto-hinted', hinted_fonts, 'all')
+    unhinted_size = self.create_zip('Noto-unhinted', unhinted_fonts, 'all')
     return 'Noto', hinted_size, unhinted_size
 
   def copy_font(self, fontpath):
     basename = path.basename(fontpath)
     dst = path.join(self.fonts, basename)
-    shutil.copy(fontpath, dst)
+    key = self.manifest.inputs_key([fontpath])
+    if not self.manifest.is_current(dst, key):
+      shutil.copy(fontpath, dst)
+      self.manifest.record(dst, key)
     return basename
 
   def build_family_css(self, key, family):
@@ -1038,8 +1126,12 @@ class WebGen(object):
     self.write_json(meta_obj, 'meta')
 
 
-  def build_family_images(
+  def get_family_image_jobs(
       self, family, lang_scr, sample_text, attrib, sample_key):
+    """Return a list of (job, key) for the images of family in lang_scr that
+    are not current.  The job is the argument tuple for _create_image, and
+    key is the manifest key to record once the image is built."""
+    jobs = []
     family_id = family.family_id
     is_cjk = family.rep_member.is_cjk
     is_rtl = cldr_data.is_rtl(lang_scr)
@@ -1080,14 +1172,7 @@ class WebGen(object):
       else:
         family_name = family.name
       image_location = path.join(self.samples, image_file_name)
-      if path.isfile(image_location):
-        # Don't rebuild images when continuing.
-        print "Continue: assuming image file '%s' is valid." % image_location
-        continue
-      print 'create %s' % image_file_name
-      create_image.create_img(
-          sample_text,
-          image_location,
+      kwargs = dict(
           family=family_name,
           language=lang_scr,
           rtl=is_rtl,
@@ -1100,6 +1185,12 @@ class WebGen(object):
           stretch=stretch,
           maxheight=maxheight,
           horiz_margin=horiz_margin)
+      key = self.manifest.inputs_key(
+          [font.filepath], (sample_text, sorted(kwargs.iteritems())))
+      if self.manifest.is_current(image_location, key):
+        continue
+      jobs.append(((sample_text, image_location, kwargs), key))
+    return jobs
 
   def build_images(self, family_id_to_lang_scr_to_sample_key,
                    families, family_id_to_default_lang_scr,
@@ -1115,10 +1206,20 @@ class WebGen(object):
       # name them based on the language.  But most of the samples with the
       # same font and text will be the same, because the fonts generally
       # only customize for a few language tags.  Sad!
+      jobs = []
       for lang_scr, sample_key in sorted(lang_scr_to_sample_key.iteritems()):
         sample_text, attrib, _ = sample_key_to_info[sample_key]
-        self.build_family_images(
-            family, lang_scr, sample_text, attrib, sample_key)
+        jobs.extend(self.get_family_image_jobs(
+            family, lang_scr, sample_text, attrib, sample_key))
+      if not jobs:
+        print 'Images for %s are up to date.' % family.name
+        continue
+      tool_utils.parallel_map(
+          _create_image, [job for job, _ in jobs], self.processes)
+      for (_, image_location, _), key in jobs:
+        self.manifest.record(image_location, key)
+      # save after each family so an interrupted run keeps its progress
+      self.manifest.save()
 
   def build_ttc_zips(self):
     """Generate zipped versions of the ttc files and put in pkgs directory."""
@@ -1136,15 +1237,19 @@ class WebGen(object):
     for filename in filenames:
       zip_basename = filename + '.zip'
       zip_path = path.join(self.pkgs, zip_basename)
-      if path.isfile(zip_path):
-          print("Assuming built %s is valid." % zip_basename)
-          continue
-      oldsize = os.stat(path.join(CJK_DIR, filename)).st_size
       pairs = [
-          readme_pair,
           (SIL_LICENSE_LOC, 'LICENSE_OFL.txt'),
           (path.join(CJK_DIR, filename), filename)]
+      is_current, key = self.zip_is_current(zip_path, pairs, 'cjk')
+      if is_current:
+        print 'Zip %s is up to date.' % zip_basename
+        continue
+      if path.isfile(zip_path):
+        os.remove(zip_path)
+      oldsize = os.stat(path.join(CJK_DIR, filename)).st_size
+      pairs.insert(0, readme_pair)
       tool_utils.generate_zip_with_7za_from_filepairs(pairs, zip_path)
+      self.manifest.record(zip_path, key)
       newsize = os.stat(zip_path).st_size
       print "Wrote " + zip_path
       print 'Compressed from {0:,}B to {1:,}B.'.format(oldsize, newsize)
@@ -1165,12 +1270,20 @@ class WebGen(object):
       if not path.isfile(src_zip):
         print 'Warning: %s does not exist' % filename
         continue
-      pairs = [(SIL_LICENSE_LOC, 'LICENSE_OFL.txt')]
-      if os.stat(src_zip).st_size < 100000000:  # lower than 100MB
-        pairs.append(readme_pair)
+      pairs = [(SIL_LICENSE_LOC, 'LICENSE_OFL.txt'), (src_zip, filename)]
+      with_readme = os.stat(src_zip).st_size < 100000000  # lower than 100MB
       dst_zip = path.join(self.pkgs, filename)
+      is_current, key = self.zip_is_current(
+          dst_zip, pairs, 'cjk' if with_readme else None)
+      if is_current:
+        print 'Zip %s is up to date.' % filename
+        continue
+      pairs = pairs[:1]
+      if with_readme:
+        pairs.append(readme_pair)
       shutil.copy2(src_zip, dst_zip)
       tool_utils.generate_zip_with_7za_from_filepairs(pairs, dst_zip)
+      self.manifest.record(dst_zip, key)
 
 
   def build_subset_zips(self):
@@ -1189,21 +1302,25 @@ class WebGen(object):
         base_name = 'Noto%s%s' % (style, subset)
         zip_name = '%s.zip' % base_name
         zip_path = path.join(self.pkgs, zip_name)
-        if path.isfile(zip_path):
-          print("Assuming built %s is valid." % zip_name)
-          continue
 
-        filenames = glob.glob(path.join(CJK_DIR, base_name + '-*.otf'))
+        filenames = sorted(
+            glob.glob(path.join(CJK_DIR, base_name + '-*.otf')))
         if not filenames:
           raise Exception('no file in %s matched "%s"' % (CJK_DIR, family_pat))
 
-        oldsize = sum(os.stat(f).st_size for f in filenames)
-        pairs = [
-            readme_pair,
-            (SIL_LICENSE_LOC, 'LICENSE_OFL.txt')]
+        pairs = [(SIL_LICENSE_LOC, 'LICENSE_OFL.txt')]
         pairs.extend((f, path.basename(f)) for f in filenames)
+        is_current, key = self.zip_is_current(zip_path, pairs, 'cjk')
+        if is_current:
+          print 'Zip %s is up to date.' % zip_name
+          continue
+        if path.isfile(zip_path):
+          os.remove(zip_path)
 
+        oldsize = sum(os.stat(f).st_size for f in filenames)
+        pairs.insert(0, readme_pair)
         tool_utils.generate_zip_with_7za_from_filepairs(pairs, zip_path)
+        self.manifest.record(zip_path, key)
         newsize = os.stat(zip_path).st_size
         print "Wrote " + zip_path
         print 'Compressed from {0:,}B to {1:,}B.'.format(oldsize, newsize)
@@ -1214,6 +1331,7 @@ class WebGen(object):
 
     if not self.no_build:
       self.ensure_target_dirs_exist()
+      self.manifest = BuildManifest(self.target)
 
     def use_in_web(font):
       return (not font.subset and
@@ -1385,11 +1503,13 @@ class WebGen(object):
       if not self.no_zips:
         self.build_ttc_zips()
         self.build_subset_zips()
+      self.manifest.save()
 
     if self.no_css:
       print 'skipping css output'
     else:
       family_css_info = self.build_css(families)
+      self.manifest.save()
 
     if self.no_data:
       print 'skipping data output'
@@ -1495,6 +1615,9 @@ def main():
     parser.add_argument('--debug',
                         help='types of information to dump during build',
                         nargs='*')
+    parser.add_argument('-p', '--processes',
+                        help='number of processes to use to build images, '
+                        'default one per cpu', metavar='n', type=int)
     args = parser.parse_args();
 
     repo_info = get_repo_info(args.no_repo_check)
@@ -1502,7 +1625,8 @@ def main():
     webgen = WebGen(args.dest, args.clean, repo_info, args.pretty_json,
                     no_zips=args.no_zips, no_images=args.no_images,
                     no_css=args.no_css, no_data=args.no_data,
-                    no_build=args.no_build, debug=args.debug)
+                    no_build=args.no_build, debug=args.debug,
+                    processes=args.processes)
     webgen.generate()
 
 
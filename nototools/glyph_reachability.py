@@ -0,0 +1,567 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compute the glyphs of a font reachable from a set of characters.
+
+This computes the same closure the fontTools subsetter computes with its
+default options: the glyphs the cmap maps the characters to (including
+variation sequences), the .notdef glyph, then in turn the closure over GSUB,
+MATH variants, COLR layers, the bsln standard glyph, glyf components, and CFF
+seac accents.  It only reads the font.
+
+The subsetter closes over GSUB by applying every lookup to the whole glyph
+set repeatedly until the set stops growing.  Here each lookup is indexed once
+by the first glyph of its inputs, and a worklist applies a lookup to a glyph
+only when the glyph is first added or when a contextual rule first starts
+the lookup at that glyph's position.  Rules whose other inputs (ligature
+components, context glyphs or classes) are not yet reachable wait on those
+inputs and fire when the last one becomes reachable."""
+
+import argparse
+import collections
+import time
+
+from fontTools import subset
+from fontTools import ttLib
+from fontTools.ttLib.tables import otTables
+
+
+# Targets of a lookup started by a contextual rule, besides a set of glyphs:
+# the glyph that started the rule, or every reachable glyph.
+_FIRST = 'first'
+_ALL = 'all'
+
+# Subtables that can change the number of glyphs.
+_NON_1TO1_TYPES = (
+    otTables.MultipleSubst, otTables.LigatureSubst, otTables.ContextSubst,
+    otTables.ChainContextSubst)
+
+
+class _AllBut(object):
+  """The glyphs not in a class definition, class 0 of a ClassDef."""
+
+  def __init__(self, glyphs):
+    self.glyphs = glyphs
+
+
+def _extension_subtable(subtable):
+  while isinstance(subtable, otTables.ExtensionSubst):
+    if subtable.Format != 1:
+      raise ValueError('unknown extension format: %s' % subtable.Format)
+    subtable = subtable.ExtSubTable
+  return subtable
+
+
+def feature_lookups(table):
+  """Return the sorted indices of the lookups in the otTables GSUB (or GPOS)
+  table used by a feature of some script and language system, including
+  the feature variations of those features."""
+  features = set()
+  if table.ScriptList:
+    for script_record in table.ScriptList.ScriptRecord:
+      script = script_record.Script
+      lang_systems = [r.LangSys for r in script.LangSysRecord]
+      if script.DefaultLangSys:
+        lang_systems.append(script.DefaultLangSys)
+      for lang_sys in lang_systems:
+        features.update(lang_sys.FeatureIndex)
+        if lang_sys.ReqFeatureIndex != 65535:
+          features.add(lang_sys.ReqFeatureIndex)
+
+  lookups = set()
+  if table.FeatureList:
+    for index in features:
+      if index < table.FeatureList.FeatureCount:
+        lookups.update(
+            table.FeatureList.FeatureRecord[index].Feature.LookupListIndex)
+  feature_variations = getattr(table, 'FeatureVariations', None)
+  if feature_variations:
+    for variation in feature_variations.FeatureVariationRecord:
+      substitution = variation.FeatureTableSubstitution
+      for record in substitution.SubstitutionRecord:
+        if record.FeatureIndex in features:
+          lookups.update(record.Feature.LookupListIndex)
+
+  all_lookups = table.LookupList.Lookup if table.LookupList else []
+  return sorted(
+      i for i in lookups if i < len(all_lookups) and all_lookups[i])
+
+
+class GsubClosure(object):
+  """Closes a set of glyphs over the lookups of a GSUB table.
+
+  A lookup's index maps a glyph to the rules of the lookup whose first
+  input is that glyph.  A rule is a tuple of conditions, output glyphs, and
+  nested lookups.  Each condition is a frozenset of glyphs or an _AllBut,
+  and is met when one of its glyphs is reachable.  Each nested lookup is a
+  lookup index and the glyphs it applies to, _FIRST, _ALL, a frozenset, or
+  an _AllBut."""
+
+  def __init__(self, table):
+    self._table = table
+    self._lookups = table.LookupList.Lookup if table.LookupList else []
+    self._indexes = {}
+    self._sets = {}
+    self._coverage_sets = {}
+    self._class_sets = {}
+
+  def close(self, glyphs):
+    """Add to the set glyphs the glyphs reachable from them through the
+    lookups of the table's features."""
+    self._glyphs = glyphs
+    self._queue = collections.deque()
+    self._applied = collections.defaultdict(set)
+    self._activated = set()
+    self._glyph_lookups = collections.defaultdict(list)
+    self._satisfied = set()
+    self._waiters = {}
+    self._glyph_conditions = collections.defaultdict(list)
+    self._all_but_conditions = []
+
+    for lookup_index in feature_lookups(self._table):
+      self._start(lookup_index, _ALL, None)
+    while self._queue:
+      self._reached(self._queue.popleft())
+
+  def _add(self, glyph):
+    if glyph not in self._glyphs:
+      self._glyphs.add(glyph)
+      self._queue.append(glyph)
+
+  def _reached(self, glyph):
+    """Run everything waiting on glyph."""
+    for lookup_index in self._glyph_lookups.pop(glyph, ()):
+      self._apply(lookup_index, glyph)
+    for condition in self._glyph_conditions.pop(glyph, ()):
+      self._satisfy(condition)
+    satisfied = [c for c in self._all_but_conditions if glyph not in c.glyphs]
+    if satisfied:
+      self._all_but_conditions = [
+          c for c in self._all_but_conditions if glyph in c.glyphs]
+      for condition in satisfied:
+        self._satisfy(condition)
+
+  def _start(self, lookup_index, target, first_glyph):
+    """Apply the lookup to the target glyphs, now and as they are reached.
+    Only the glyphs in the lookup's index need to be watched."""
+    if target is _FIRST:
+      self._apply(lookup_index, first_glyph)
+      return
+    key = (lookup_index, target)
+    if key in self._activated:
+      return
+    self._activated.add(key)
+    index = self._lookup_index(lookup_index)
+    if target is _ALL:
+      glyphs = list(index)
+    elif isinstance(target, _AllBut):
+      glyphs = [g for g in index if g not in target.glyphs]
+    else:
+      glyphs = [g for g in target if g in index]
+    for glyph in glyphs:
+      if glyph in self._glyphs:
+        self._apply(lookup_index, glyph)
+      else:
+        self._glyph_lookups[glyph].append(lookup_index)
+
+  def _apply(self, lookup_index, glyph):
+    rules = self._lookup_index(lookup_index).get(glyph)
+    if not rules:
+      return
+    applied = self._applied[lookup_index]
+    if glyph in applied:
+      return
+    applied.add(glyph)
+    for rule in rules:
+      conditions = [c for c in rule[0] if not self._is_satisfied(c)]
+      if not conditions:
+        self._fire(glyph, rule)
+        continue
+      pending = [len(conditions), glyph, rule]
+      for condition in conditions:
+        self._wait(condition, pending)
+
+  def _fire(self, glyph, rule):
+    _, outputs, nested = rule
+    for output in outputs:
+      self._add(output)
+    for lookup_index, target in nested:
+      self._start(lookup_index, target, glyph)
+
+  def _is_satisfied(self, condition):
+    if condition in self._satisfied:
+      return True
+    if isinstance(condition, _AllBut):
+      satisfied = any(g not in condition.glyphs for g in self._glyphs)
+    else:
+      satisfied = not condition.isdisjoint(self._glyphs)
+    if satisfied:
+      self._satisfied.add(condition)
+    return satisfied
+
+  def _wait(self, condition, pending):
+    waiters = self._waiters.get(condition)
+    if waiters is None:
+      waiters = self._waiters[condition] = []
+      if isinstance(condition, _AllBut):
+        self._all_but_conditions.append(condition)
+      else:
+        for glyph in condition:
+          self._glyph_conditions[glyph].append(condition)
+    waiters.append(pending)
+
+  def _satisfy(self, condition):
+    self._satisfied.add(condition)
+    for pending in self._waiters.pop(condition, ()):
+      pending[0] -= 1
+      if not pending[0]:
+        self._fire(pending[1], pending[2])
+
+  def _lookup_index(self, lookup_index):
+    index = self._indexes.get(lookup_index)
+    if index is None:
+      index = collections.defaultdict(list)
+      for subtable in self._lookups[lookup_index].SubTable:
+        if subtable:
+          self._index_subtable(_extension_subtable(subtable), index)
+      index = self._indexes[lookup_index] = dict(index)
+    return index
+
+  def _index_subtable(self, subtable, index):
+    if isinstance(subtable, otTables.SingleSubst):
+      for glyph, output in subtable.mapping.items():
+        index[glyph].append(((), (output,), ()))
+    elif isinstance(subtable, otTables.MultipleSubst):
+      for glyph, outputs in subtable.mapping.items():
+        index[glyph].append(((), tuple(outputs), ()))
+    elif isinstance(subtable, otTables.AlternateSubst):
+      for glyph, outputs in subtable.alternates.items():
+        index[glyph].append(((), tuple(outputs), ()))
+    elif isinstance(subtable, otTables.LigatureSubst):
+      for glyph, ligatures in subtable.ligatures.items():
+        for ligature in ligatures:
+          conditions = tuple(self._glyph_set([c]) for c in ligature.Component)
+          index[glyph].append((conditions, (ligature.LigGlyph,), ()))
+    elif isinstance(subtable, otTables.ReverseChainSingleSubst):
+      if subtable.Format != 1:
+        raise ValueError('unknown format: %s' % subtable.Format)
+      conditions = tuple(
+          self._coverage_set(c)
+          for c in subtable.LookAheadCoverage + subtable.BacktrackCoverage)
+      for glyph, output in zip(subtable.Coverage.glyphs, subtable.Substitute):
+        index[glyph].append((conditions, (output,), ()))
+    elif isinstance(subtable, (otTables.ContextSubst,
+                               otTables.ChainContextSubst)):
+      self._index_context(subtable, index)
+    else:
+      raise ValueError('unknown subtable: %s' % type(subtable).__name__)
+
+  def _index_context(self, subtable, index):
+    chain = isinstance(subtable, otTables.ChainContextSubst)
+    prefix = 'ChainSub' if chain else 'Sub'
+    if subtable.Format == 1:
+      rule_sets = getattr(subtable, prefix + 'RuleSet')
+      rule_set_count = getattr(subtable, prefix + 'RuleSetCount')
+      for i, glyph in enumerate(subtable.Coverage.glyphs):
+        if i >= rule_set_count or not rule_sets[i]:
+          continue
+        for rule in getattr(rule_sets[i], prefix + 'Rule'):
+          if not rule:
+            continue
+          context = rule.Input
+          if chain:
+            context = rule.Backtrack + rule.Input + rule.LookAhead
+          inputs = [self._glyph_set([g]) for g in rule.Input]
+          index[glyph].append((
+              tuple(self._glyph_set([g]) for g in context), (),
+              self._nested(rule.SubstLookupRecord, inputs,
+                           len(rule.Input) + 2)))
+
+    elif subtable.Format == 2:
+      class_def = subtable.InputClassDef if chain else subtable.ClassDef
+      rule_sets = getattr(subtable, prefix + 'ClassSet')
+      rule_set_count = getattr(subtable, prefix + 'ClassSetCount')
+      class_rules = {}
+      for glyph in subtable.Coverage.glyphs:
+        klass = class_def.classDefs.get(glyph, 0) if class_def else 0
+        if klass >= rule_set_count or not rule_sets[klass]:
+          continue
+        rules = class_rules.get(klass)
+        if rules is None:
+          rules = class_rules[klass] = self._class_rules(
+              subtable, chain, class_def,
+              getattr(rule_sets[klass], prefix + 'ClassRule'))
+        index[glyph].extend(rules)
+
+    elif subtable.Format == 3:
+      if chain:
+        inputs = subtable.InputCoverage
+        coverages = (subtable.BacktrackCoverage + inputs +
+                     subtable.LookAheadCoverage)
+      else:
+        coverages = inputs = subtable.Coverage
+      rule = (
+          tuple(self._coverage_set(c) for c in coverages), (),
+          self._nested(subtable.SubstLookupRecord,
+                       [self._coverage_set(c) for c in inputs[1:]],
+                       len(inputs) + 1))
+      for glyph in inputs[0].glyphs:
+        index[glyph].append(rule)
+
+    else:
+      raise ValueError('unknown format: %s' % subtable.Format)
+
+  def _class_rules(self, subtable, chain, class_def, rules):
+    """Return the rules of a format 2 context subtable's class rule set.
+    Classes of a missing class definition other than 0 never match, so rules
+    using them are dropped."""
+    result = []
+    for rule in rules:
+      if not rule:
+        continue
+      if chain:
+        context = [(subtable.BacktrackClassDef, rule.Backtrack),
+                   (class_def, rule.Input),
+                   (subtable.LookAheadClassDef, rule.LookAhead)]
+        input_classes = rule.Input
+      else:
+        context = [(class_def, rule.Class)]
+        input_classes = rule.Class
+      conditions = []
+      for context_class_def, classes in context:
+        if context_class_def:
+          conditions.extend(
+              self._class_set(context_class_def, k) for k in classes)
+        elif any(classes):
+          break
+      else:
+        inputs = [self._class_set(class_def, k) if class_def else _ALL
+                  for k in input_classes]
+        result.append((tuple(conditions), (), self._nested(
+            rule.SubstLookupRecord, inputs, len(input_classes) + 2)))
+    return result
+
+  def _nested(self, lookup_records, inputs, chaos_end):
+    """Return the nested lookups of a context rule and the glyphs each
+    applies to.  Inputs are the glyphs that can be at each position after the
+    first.  Once a lookup that can change the number of glyphs applies at a
+    position, the glyphs at that and later positions are not known, so the
+    lookups there apply to all glyphs."""
+    nested = []
+    chaos = set()
+    for record in lookup_records:
+      if not record:
+        continue
+      position = record.SequenceIndex
+      if position in chaos:
+        target = _ALL
+      elif position == 0:
+        target = _FIRST
+      elif position <= len(inputs):
+        target = inputs[position - 1]
+      else:
+        target = frozenset()
+      chaos.add(position)
+      if self._may_have_non_1to1(record.LookupListIndex):
+        chaos.update(range(position, chaos_end))
+      nested.append((record.LookupListIndex, target))
+    return tuple(nested)
+
+  def _may_have_non_1to1(self, lookup_index):
+    return any(
+        isinstance(_extension_subtable(subtable), _NON_1TO1_TYPES)
+        for subtable in self._lookups[lookup_index].SubTable if subtable)
+
+  def _glyph_set(self, glyphs):
+    glyph_set = frozenset(glyphs)
+    return self._sets.setdefault(glyph_set, glyph_set)
+
+  def _coverage_set(self, coverage):
+    glyph_set = self._coverage_sets.get(id(coverage))
+    if glyph_set is None:
+      glyph_set = self._coverage_sets[id(coverage)] = self._glyph_set(
+          coverage.glyphs)
+    return glyph_set
+
+  def _class_set(self, class_def, klass):
+    class_sets = self._class_sets.get(id(class_def))
+    if class_sets is None:
+      members = collections.defaultdict(list)
+      for glyph, glyph_class in class_def.classDefs.items():
+        members[glyph_class].append(glyph)
+      class_sets = {k: self._glyph_set(v) for k, v in members.iteritems()}
+      class_sets[0] = _AllBut(frozenset(class_def.classDefs))
+      self._class_sets[id(class_def)] = class_sets
+    return class_sets.get(klass, frozenset())
+
+
+def _cmap_glyphs(font, unicodes):
+  glyphs = set()
+  for table in font['cmap'].tables:
+    if not table.isUnicode():
+      continue
+    if table.format == 14:
+      for uvs_map in table.uvsDict.values():
+        glyphs.update(g for u, g in uvs_map if u in unicodes)
+      glyphs.discard(None)
+    else:
+      cmap = table.cmap
+      glyphs.update(cmap[u] for u in unicodes if u in cmap)
+  return glyphs
+
+
+def _math_glyphs(math_table, glyphs):
+  variants = set()
+  math_variants = math_table.table.MathVariants
+  if not math_variants:
+    return variants
+  for coverage, constructions in [
+      (math_variants.VertGlyphCoverage, math_variants.VertGlyphConstruction),
+      (math_variants.HorizGlyphCoverage,
+       math_variants.HorizGlyphConstruction)]:
+    if not coverage:
+      continue
+    for glyph, construction in zip(coverage.glyphs, constructions):
+      if glyph not in glyphs:
+        continue
+      variants.update(
+          v.VariantGlyph for v in construction.MathGlyphVariantRecord)
+      if construction.GlyphAssembly:
+        variants.update(
+            p.glyph for p in construction.GlyphAssembly.PartRecords)
+  return variants
+
+
+def _close(glyphs, components_fn):
+  """Add to glyphs the components of glyphs, recursively."""
+  new_glyphs = glyphs
+  while new_glyphs:
+    components = set()
+    for glyph in new_glyphs:
+      components.update(components_fn(glyph))
+    new_glyphs = components - glyphs
+    glyphs.update(new_glyphs)
+
+
+def reachable_glyphs(font, unicodes):
+  """Return the frozenset of names of the glyphs in the TTFont reachable
+  from the characters in unicodes, the glyphs a subsetter keeping those
+  characters would keep.  May include '.notdef' for a CFF font without it."""
+  unicodes = frozenset(unicodes)
+  real_glyphs = set(font.getGlyphOrder())
+  glyphs = set()
+  if 'cmap' in font:
+    glyphs = _cmap_glyphs(font, unicodes) & real_glyphs
+  glyphs.add(font.getGlyphName(0) if 'glyf' in font else '.notdef')
+
+  if 'GSUB' in font:
+    GsubClosure(font['GSUB'].table).close(glyphs)
+    glyphs &= real_glyphs
+  if 'MATH' in font:
+    glyphs.update(_math_glyphs(font['MATH'], glyphs))
+    glyphs &= real_glyphs
+  if 'COLR' in font:
+    layers = font['COLR'].ColorLayers
+    _close(glyphs, lambda g: [l.name for l in layers.get(g, ())])
+    glyphs &= real_glyphs
+  if 'bsln' in font:
+    baseline = font['bsln'].table.Baseline
+    if baseline.Format in (2, 3):
+      glyphs.add(baseline.StandardGlyph)
+    glyphs &= real_glyphs
+  if 'glyf' in font:
+    glyf_table = font['glyf']
+    glyph_set = glyf_table.glyphs
+    _close(glyphs, lambda g: glyph_set[g].getComponentNames(glyf_table)
+           if g in glyph_set else ())
+    glyphs &= real_glyphs
+  if 'CFF ' in font:
+    # Finding seac accents means interpreting the charstrings, the subsetter
+    # adds a method to the CFF table for that which only needs the glyphs.
+    font['CFF '].closure_glyphs(_GlyphsHolder(glyphs))
+    glyphs &= real_glyphs
+  return frozenset(glyphs)
+
+
+_GlyphsHolder = collections.namedtuple('_GlyphsHolder', 'glyphs')
+
+
+def unreachable_glyphs(font):
+  """Return the set of names of glyphs in the TTFont not reachable from the
+  characters its cmap maps."""
+  unicodes = set()
+  if 'cmap' in font:
+    for table in font['cmap'].tables:
+      if table.isUnicode() and table.format != 14:
+        unicodes.update(table.cmap)
+  return set(font.getGlyphOrder()) - reachable_glyphs(font, unicodes)
+
+
+def _subsetter_glyphs(font, unicodes):
+  subsetter = subset.Subsetter()
+  subsetter.populate(unicodes=unicodes)
+  subsetter._closure_glyphs(font)
+  return subsetter.glyphs_retained
+
+
+def _compare(files):
+  """Compare with the subsetter's closure over the cmap of each font, and
+  report the time each takes."""
+  total_subsetter = total_reachable = 0
+  for f in files:
+    font = ttLib.TTFont(f)
+    unicodes = font.getBestCmap().keys()
+    start = time.time()
+    reachable = reachable_glyphs(font, unicodes)
+    reachable_time = time.time() - start
+    font = ttLib.TTFont(f)
+    start = time.time()
+    expected = _subsetter_glyphs(font, unicodes)
+    subsetter_time = time.time() - start
+    total_reachable += reachable_time
+    total_subsetter += subsetter_time
+    status = 'same' if reachable == expected else 'DIFFERENT'
+    print '%s: %s, %d glyphs, %.3fs subsetter, %.3fs reachable' % (
+        f, status, len(expected), subsetter_time, reachable_time)
+    if reachable != expected:
+      print '  only subsetter: %s' % ', '.join(sorted(expected - reachable))
+      print '  only reachable: %s' % ', '.join(sorted(reachable - expected))
+  print 'total: %.3fs subsetter, %.3fs reachable' % (
+      total_subsetter, total_reachable)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      'files', help='fonts to check', metavar='file', nargs='+')
+  parser.add_argument(
+      '--compare', help='compare with the subsetter and time both',
+      action='store_true')
+  args = parser.parse_args()
+
+  if args.compare:
+    _compare(args.files)
+    return
+  for f in args.files:
+    font = ttLib.TTFont(f)
+    unreachable = unreachable_glyphs(font)
+    print '%s: %d unreachable glyphs' % (f, len(unreachable))
+    if unreachable:
+      print '  %s' % ', '.join(sorted(unreachable))
+
+
+if __name__ == '__main__':
+  main()
@@ -28,8 +28,11 @@
 # a customization file that allows this api.
 
 import argparse
+import operator
 import re
 
+from nototools import codepoint_set
+
 
 spec_format = """
 A spec defines a list of conditions to be run in sequence.  A condition consists of
@@ -124,6 +127,9 @@ def write_int_ranges(int_values, in_hex=True, sep=' '):
   if not int_values:
     return ''
 
+  if isinstance(int_values, codepoint_set.CodepointSet):
+    return int_values.to_range_string(in_hex, sep)
+
   num_list = []
 
   if type(int_values) is not list:
@@ -182,6 +188,10 @@ class FontInfo(object):
 
 class FontCondition(object):
 
+  # the FontInfo attributes a condition can test
+  attrs = ['filename', 'name', 'style', 'script', 'variant', 'weight', 'hinted',
+           'vendor', 'version']
+
   def _init_fn_map():
     def test_lt(lhs, rhs):
       return float(lhs) < float(rhs)
@@ -284,19 +294,25 @@ class FontCondition(object):
         variant=self.variant, weight=self.weight, hinted=self.hinted, vendor=self.vendor,
         version=self.version)
 
-  def accepts(self, fontinfo):
-    for k in ['filename', 'name', 'style', 'script', 'variant', 'weight', 'hinted', 'vendor',
-              'version']:
+  def tests(self):
+    """Return a list of (attr, test) for the attributes this condition tests."""
+    result = []
+    for k in FontCondition.attrs:
       test = getattr(self, k, None)
       if test:
-        val = getattr(fontinfo, k, None)
-        if isinstance(test, basestring):
-          if test != val:
-            return False
-          continue
-        if not test[0](val, test[1]):
-          return False
+        result.append((k, test))
+    return result
 
+  @staticmethod
+  def test_value(test, val):
+    if isinstance(test, basestring):
+      return test == val
+    return test[0](val, test[1])
+
+  def accepts(self, fontinfo):
+    for k, test in self.tests():
+      if not FontCondition.test_value(test, getattr(fontinfo, k, None)):
+        return False
     return True
 
   def __repr__(self):
@@ -483,8 +499,36 @@ class TestSpec(object):
         indent = (line_indent, tag, indent)
     return tag_data
 
+  def _index_tags(tag_set):
+    """Return maps from a partial tag to the tags it matches, and from a tag
+    to its descendants (including itself) and to its ancestors, so that
+    resolving a tag does not scan all the tags.
+
+    A partial tag matches a tag if its first occurrence in the tag starts and
+    ends on a segment boundary ('/' or '_', or the start or end of the tag).
+    Descendants are the tags the tag is a prefix of."""
+    partial_tags = {}
+    descendant_tags = {}
+    ancestor_tags = {}
+    for t in tag_set:
+      starts = [0] + [i + 1 for i, c in enumerate(t) if c in '/_']
+      ends = [i for i, c in enumerate(t) if c in '/_'] + [len(t)]
+      for start in starts:
+        for end in ends:
+          if end > start and t.find(t[start:end]) == start:
+            partial_tags.setdefault(t[start:end], set()).add(t)
+      descendant_tags[t] = frozenset(c for c in tag_set if c.startswith(t))
+      ancestors = set()
+      ix = t.rfind('/')
+      while ix != -1:
+        ancestors.add(t[:ix])
+        ix = t.rfind('/', 0, ix)
+      ancestor_tags[t] = frozenset(ancestors)
+    return partial_tags, descendant_tags, ancestor_tags
+
   tag_data = _process_data(data)
   tag_set = frozenset(tag_data.keys())
+  _partial_tags, _descendant_tags, _ancestor_tags = _index_tags(tag_set)
 
   def __init__(self):
     self.touched_tags = set()
@@ -494,47 +538,26 @@ class TestSpec(object):
   def _get_single_tag(self, tag):
     """Resolve tag to a single node"""
     if not tag in self.tag_set:
-      unique_tag = None
       # try to find a unique tag with this as a segment
-      for t in TestSpec.tag_set:
-        ix = t.find(tag)
-        if ix != -1:
-          if ix > 0 and t[ix-1] not in '/_':
-            continue
-          ix += len(tag)
-          if ix < len(t) and t[ix] not in '/_':
-            continue
-          if unique_tag:
-            raise ValueError('multiple matches for partial tag %s' % tag)
-          unique_tag = t
-      if not unique_tag:
+      matches = TestSpec._partial_tags.get(tag)
+      if not matches:
         raise ValueError('unknown tag: %s' % tag)
-      tag = unique_tag
+      if len(matches) > 1:
+        raise ValueError('multiple matches for partial tag %s' % tag)
+      tag = next(iter(matches))
     return tag
 
   def _get_tag_set(self, tag):
     """Resolve tag to a single node, and return it and all of its descendants."""
     if tag == '*':
       return TestSpec.tag_set
-    tag = self._get_single_tag(tag)
-    result = set()
-    for candidate in self.tag_set:
-      if candidate.startswith(tag):
-        result.add(candidate)
-    return result
+    return set(TestSpec._descendant_tags[self._get_single_tag(tag)])
 
   def _get_ancestor_tag_set(self, tag):
     """Resolve tag to a single node, and return all of its ancestors."""
-    result = set()
-    if tag != '*':
-      tag = self._get_single_tag(tag)
-      while tag:
-        ix = tag.rfind('/')
-        if ix == -1:
-          break
-        tag = tag[:ix]
-        result.add(tag)
-    return result
+    if tag == '*':
+      return set()
+    return set(TestSpec._ancestor_tags[self._get_single_tag(tag)])
 
   def _set_enable_options(self, tag, relation, arg_type, arg):
     allowed_options = TestSpec.tag_data[tag]
@@ -685,19 +708,80 @@ class LintSpec(object):
 
   def __init__(self):
     self.specs = []
+    self._reset_compiled()
+
+  def _reset_compiled(self):
+    self._compiled = None
+    self._tested_attrs = None
+    self._resolutions = {}
+    self._accepted_resolutions = {}
 
   def add_spec(self, font_condition, test_spec):
     self.specs.append((font_condition, test_spec))
+    self._reset_compiled()
+
+  def _compile(self):
+    """Index the conditions.  Each distinct (attr, test) pair gets a number,
+    each spec becomes the list of numbers of the tests its condition requires,
+    and each test gets the list of specs that require it.  Also collect the
+    attributes any condition tests, only these can affect the tests to run on
+    a font."""
+    test_ids = {}
+    self._tests = []
+    self._test_specs = []
+    self._compiled = []
+    for spec_index, (condition, _) in enumerate(self.specs):
+      ids = []
+      for attr, test in condition.tests():
+        if isinstance(test, basestring):
+          key = (attr, test)
+          fn, value = operator.eq, test
+        else:
+          fn, value = test
+          key = (attr, fn, frozenset(value) if isinstance(value, set) else value)
+        if key not in test_ids:
+          test_ids[key] = len(self._tests)
+          self._tests.append((attr, fn, value))
+          self._test_specs.append([])
+        ids.append(test_ids[key])
+        self._test_specs[test_ids[key]].append(spec_index)
+      self._compiled.append(ids)
+    self._tested_attrs = sorted(set(attr for attr, _, _ in self._tests))
+
+  def _resolve(self, font_info):
+    """Return the tag set and options for font_info."""
+    # Each test is run once, and a spec applies if all of its tests pass.
+    passed = [0] * len(self._compiled)
+    for (attr, fn, value), spec_indices in zip(self._tests, self._test_specs):
+      if fn(getattr(font_info, attr, None), value):
+        for i in spec_indices:
+          passed[i] += 1
+    accepted = tuple(i for i, ids in enumerate(self._compiled)
+                     if passed[i] == len(ids))
+    resolution = self._accepted_resolutions.get(accepted)
+    if resolution is None:
+      result = set(TestSpec.tag_set)
+      options = {}
+      for i in accepted:
+        self.specs[i][1].apply_spec(result, options)
+      resolution = (frozenset(result), options)
+      self._accepted_resolutions[accepted] = resolution
+    return resolution
 
   def get_tests(self, font_info):
-    result = set()
-    options = {}
-    result |= TestSpec.tag_set
-    for condition, spec in self.specs:
-      if condition.accepts(font_info):
-        spec.apply_spec(result, options)
-
-    return LintTests(frozenset(result), options)
+    """Return the LintTests for font_info.  Resolutions are cached by the
+    values of the attributes the conditions test, so fonts that differ only in
+    other attributes (and fonts whose conditions accept the same specs) share
+    one.  Each call returns a new LintTests since it logs the tests run.
+    Specs should not be modified after they are added."""
+    if self._compiled is None:
+      self._compile()
+    key = tuple(getattr(font_info, attr, None) for attr in self._tested_attrs)
+    resolution = self._resolutions.get(key)
+    if resolution is None:
+      resolution = self._resolve(font_info)
+      self._resolutions[key] = resolution
+    return LintTests(*resolution)
 
   def __repr__(self):
     return '--- spec ---\n' + '\n--- spec ---\n'.join('%s\n%s' % spec for spec in self.specs)
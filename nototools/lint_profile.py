@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Timing of noto_lint tests.
+
+A LintProfile charges wall time to lint_config test tags.  Time is charged
+to the test that most recently started: noto_lint starts the top-level tag
+of each check function before calling it, and the LintTests returned by
+profile_tests starts a tag each time checking it says the test should run.
+So the time a check function spends between tests.check('paths/extrema')
+and the next test it runs is charged to 'paths/extrema', and work a check
+function does before its first test is charged to the function's tag.
+
+The number of calls for a tag is the number of times checking it said the
+test should run, for tests checked per glyph or character this is the
+number of glyphs or characters tested."""
+
+import collections
+import time
+
+
+class _ProfiledLintTests(object):
+  """Wraps a LintTests, starting each test that is run in the profile."""
+
+  def __init__(self, tests, profile):
+    self._tests = tests
+    self._profile = profile
+
+  def check(self, tag):
+    run = self._tests.check(tag)
+    if run:
+      self._profile.start(tag)
+    return run
+
+  def checkvalue(self, tag, value):
+    run = self._tests.checkvalue(tag, value)
+    if run:
+      self._profile.start(tag)
+    return run
+
+  def __getattr__(self, name):
+    return getattr(self._tests, name)
+
+
+class LintProfile(object):
+  """Accumulates the time and number of calls for each test tag, per font
+  and across all fonts."""
+
+  def __init__(self, timer=time.time):
+    self._timer = timer
+    # font name to (total time, tag to [time, calls])
+    self.fonts = collections.OrderedDict()
+    self._font = None
+    self._font_start = None
+    self._font_tags = None
+    self._tag = None
+    self._tag_start = None
+
+  def start_font(self, font_name):
+    self.end_font()
+    self._font = font_name
+    self._font_tags = collections.defaultdict(lambda: [0.0, 0])
+    self._font_start = self._timer()
+
+  def end_font(self):
+    if self._font is None:
+      return
+    self.stop()
+    elapsed = self._timer() - self._font_start
+    self.fonts[self._font] = (elapsed, dict(self._font_tags))
+    self._font = None
+    self._font_tags = None
+
+  def profile_tests(self, tests):
+    """Return a LintTests that starts tests in this profile when they
+    run."""
+    return _ProfiledLintTests(tests, self)
+
+  def start(self, tag, count=True):
+    """Charge the time since the current test started to it, and make tag
+    the current test.  If count is false this is not counted as a call of
+    tag."""
+    now = self._timer()
+    self._charge(now)
+    self._tag = tag
+    self._tag_start = now
+    self._font_tags[tag][1] += count
+
+  def stop(self):
+    """Charge the time since the current test started to it, time up to
+    the next start is not charged to any test."""
+    self._charge(self._timer())
+    self._tag = None
+
+  def _charge(self, now):
+    if self._tag is not None:
+      self._font_tags[self._tag][0] += now - self._tag_start
+
+  def tag_totals(self):
+    """Return a map from tag to [time, calls] across all fonts."""
+    totals = collections.defaultdict(lambda: [0.0, 0])
+    for _, tags in self.fonts.values():
+      for tag, (elapsed, calls) in tags.iteritems():
+        total = totals[tag]
+        total[0] += elapsed
+        total[1] += calls
+    return dict(totals)
+
+  def write_report(self, out, top_n=10):
+    """Write the top_n slowest tests, top-level test groups, and fonts."""
+    def write_rows(title, rows):
+      out.write('%s:\n' % title)
+      for elapsed, calls, name in rows[:top_n]:
+        calls_str = '' if calls is None else '%8d' % calls
+        out.write('  %9.3f %8s  %s\n' % (elapsed, calls_str, name))
+
+    totals = self.tag_totals()
+    groups = collections.defaultdict(lambda: [0.0, 0])
+    for tag, (elapsed, calls) in totals.iteritems():
+      group = groups[tag.split('/')[0]]
+      group[0] += elapsed
+      group[1] += calls
+
+    run_time = sum(elapsed for elapsed, _ in self.fonts.values())
+    out.write('Profiled %d font%s in %.3f seconds\n' % (
+        len(self.fonts), '' if len(self.fonts) == 1 else 's', run_time))
+    out.write('  %9s %8s  %s\n' % ('seconds', 'calls', 'name'))
+    write_rows('Slowest tests', sorted(
+        [(elapsed, calls, tag) for tag, (elapsed, calls) in totals.iteritems()],
+        reverse=True))
+    write_rows('Slowest test groups', sorted(
+        [(elapsed, calls, group)
+         for group, (elapsed, calls) in groups.iteritems()],
+        reverse=True))
+    write_rows('Slowest fonts', sorted(
+        [(elapsed, None, font)
+         for font, (elapsed, _) in self.fonts.iteritems()],
+        reverse=True))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Structured output for noto_lint results.
+
+A ResultSink writes the findings of a lint run in a machine-readable format.
+Findings are collected per font by a FontResults and written together when
+the font is finished, so memory use does not grow with the number of fonts.
+Each font's output is written with one write under a lock, so fonts linted
+on different threads do not interleave.
+
+The identity of a font (its file, family, script, revision, etc.) is
+computed once per font.  The JSON Lines sink writes it once as a 'font'
+record and findings refer to it by id.  The CSV sink writes the same rows
+noto_lint --csv always has, with the identity columns repeated on each
+row."""
+
+import abc
+import collections
+import json
+import sys
+import threading
+
+
+FontIdentity = collections.namedtuple(
+    'FontIdentity',
+    'path, hint_dir, filename, family, script, script_name, style, variant, '
+    'weight, slope, manufacturer, revision')
+
+
+class FontResults(object):
+  """Collects the findings for one font.  Call close when the font is done
+  to write them."""
+
+  def __init__(self, sink, identity):
+    self._sink = sink
+    self.identity = identity
+    self._findings = []
+
+  def add(self, err_type, test_name, category, message):
+    """Err_type is 'Error', 'Warning', or 'Info'."""
+    self._findings.append((err_type, test_name, category, message))
+
+  def close(self, error_count=None, warning_count=None):
+    self._sink._write_font(self, error_count, warning_count)
+    self._findings = []
+
+
+class ResultSink(object):
+  """Base class for writers of lint results to a stream.  Subclasses
+  implement _finding_lines."""
+
+  __metaclass__ = abc.ABCMeta
+
+  def __init__(self, out=sys.stdout):
+    self._out = out
+    self._lock = threading.Lock()
+    self._font_ids = {}
+
+  def font_results(self, identity):
+    """Return a FontResults to collect the findings for the font."""
+    return FontResults(self, identity)
+
+  def write_header(self):
+    pass
+
+  def _write_font(self, font_results, error_count, warning_count):
+    with self._lock:
+      identity = font_results.identity
+      lines = []
+      font_id = self._font_ids.get(identity)
+      if font_id is None:
+        font_id = len(self._font_ids)
+        self._font_ids[identity] = font_id
+        lines.extend(self._font_lines(font_id, identity))
+      lines.extend(self._finding_lines(
+          font_id, identity, font_results._findings))
+      lines.extend(self._summary_lines(font_id, error_count, warning_count))
+      if lines:
+        self._out.write(''.join(line + '\n' for line in lines))
+        self._out.flush()
+
+  def _font_lines(self, font_id, identity):
+    return []
+
+  @abc.abstractmethod
+  def _finding_lines(self, font_id, identity, findings):
+    """Return the lines to write for the findings of the font."""
+
+  def _summary_lines(self, font_id, error_count, warning_count):
+    return []
+
+
+class CsvResultSink(ResultSink):
+  """Writes the comma-separated rows of noto_lint --csv."""
+
+  HEADER = ('Type,Script,Style,Variant,Subfamily,Manufacturer,Category,'
+            'Hint Status,File Name,Revision,Issue')
+
+  def write_header(self):
+    with self._lock:
+      self._out.write(self.HEADER + '\n')
+
+  def _finding_lines(self, font_id, identity, findings):
+    if not findings:
+      return []
+    names = []
+    if identity.weight != 'Regular' or not identity.slope:
+      names.append(identity.weight)
+    if identity.slope:
+      names.append(identity.slope)
+    prefix = ','.join([
+        identity.script_name,
+        identity.style or '',
+        identity.variant or '',
+        ''.join(names),
+        identity.manufacturer])
+    if identity.hint_dir is None:
+      file_parts = [identity.filename]
+    else:
+      file_parts = [identity.hint_dir, identity.filename]
+    suffix = '%s,%s' % (','.join(file_parts), identity.revision)
+    return [('%s,%s,%s,%s,"%s"' % (
+        err_type, prefix, category, suffix, message)).encode('UTF-8')
+            for err_type, _, category, message in findings]
+
+
+class JsonLinesResultSink(ResultSink):
+  """Writes one JSON object per line.  A 'font' record with the font's
+  identity and an id precedes the first 'finding' record for a font, and
+  each font ends with a 'summary' record with its error and warning
+  counts."""
+
+  def _dumps(self, record):
+    return json.dumps(record, sort_keys=True)
+
+  def _font_lines(self, font_id, identity):
+    record = identity._asdict()
+    record.update(record='font', id=font_id)
+    return [self._dumps(record)]
+
+  def _finding_lines(self, font_id, identity, findings):
+    return [self._dumps({
+        'record': 'finding', 'font': font_id, 'type': err_type,
+        'test': test_name, 'category': category, 'message': message})
+            for err_type, test_name, category, message in findings]
+
+  def _summary_lines(self, font_id, error_count, warning_count):
+    return [self._dumps({
+        'record': 'summary', 'font': font_id, 'errors': error_count,
+        'warnings': warning_count})]
@@ -33,11 +33,12 @@ Sample Usage:
 import sys
 import os.path
 import logging
+import resource
 from argparse import ArgumentParser
 
 from fontTools import ttLib
 from fontTools import merge
-from merge_noto import add_gsub_to_font, has_gsub_table
+from merge_noto import load_merge_sources
 from nototools.substitute_linemetrics import read_line_metrics, set_line_metrics
 from fontTools.misc.loggingTools import Timer
 
@@ -147,6 +148,8 @@ def main():
         help='Path to output file.')
     parser.add_argument('-v', '--verbose', action='store_true',
         help='Verbose mode, printing out more info')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+        help='Number of processes used to load the fonts, default one per cpu')
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
@@ -157,21 +160,24 @@ def main():
             + 'font(s).', len(valid_files))
         sys.exit(-1)
 
-    for idx, file in enumerate(valid_files):
-        if not has_gsub_table(file):
-            log.info('adding default GSUB table to %s.' % file)
-            valid_files[idx] = add_gsub_to_font(file)
+    # Fonts without GSUB get an empty one, the merger needs it in every font.
+    sources = load_merge_sources(valid_files, args.processes)
+    log.info('loaded %d fonts in %0.3f s.', len(sources), t.time())
 
     merger = merge.Merger()
     print('Merging %d Fonts...' % len(valid_files))
-    font = merger.merge(valid_files)
+    font = merger.merge(sources)
     # Use the line metric in the first font to replace the one in final result.
-    metrics = read_line_metrics(ttLib.TTFont(valid_files[0]))
+    metrics = read_line_metrics(ttLib.TTFont(sources[0]))
     set_line_metrics(font, metrics)
     font.save(args.output)
     font.close()
 
     print('%d fonts are merged. %d fonts are skipped. Cost %0.3f s.' % (len(valid_files), len(files) - len(valid_files), t.time()))
+    # ru_maxrss is in kilobytes on Linux
+    print('Peak memory %0.1f MB, loading processes %0.1f MB.' % (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0))
     print('Please check the result at %s.' % os.path.abspath(
         os.path.realpath(args.output)))
 
@@ -15,13 +15,18 @@
 # limitations under the License.
 
 """Merges Noto fonts."""
+from io import BytesIO
 import os.path
 import tempfile
 
 from fontTools import merge
 from fontTools import ttLib
+from fontTools.ttLib import sfnt
 from fontTools.ttLib.tables import otTables
 
+from nototools import sfnt_directory
+from nototools import tool_utils
+
 
 def make_font_name(script):
     if script:
@@ -47,9 +52,20 @@ def add_ui_alternative(table, target):
     table[new_target] = new_sources
 
 
+def _has_gsub(stream):
+    try:
+        return 'GSUB' in sfnt_directory.SfntDirectory(stream)
+    except ValueError:
+        # not an sfnt or ttc, like woff, so leave it to fontTools
+        stream.seek(0)
+        return 'GSUB' in sfnt.SFNTReader(stream)
+
+
 def has_gsub_table(fontfile):
-    font = ttLib.TTFont(fontfile)
-    return 'GSUB' in font
+    """Returns True if the font has a GSUB table, reading only the sfnt
+    table directory."""
+    with open(fontfile, 'rb') as f:
+        return _has_gsub(f)
 
 SCRIPT_TO_OPENTYPE_SCRIPT_TAG = {
     'CypriotSyllabary': 'cprt',
@@ -96,9 +112,8 @@ def get_opentype_script_tag(fontfile):
     return SCRIPT_TO_OPENTYPE_SCRIPT_TAG[fontfile]
 
 
-def add_gsub_to_font(fontfile):
-    """Adds an empty GSUB table to a font."""
-    font = ttLib.TTFont(fontfile)
+def add_empty_gsub(font, script_tag):
+    """Adds an empty GSUB table with a single script to a loaded font."""
     gsub_table = ttLib.getTableClass('GSUB')('GSUB')
     gsub_table.table = otTables.GSUB()
     gsub_table.table.Version = 1.0
@@ -112,7 +127,7 @@ def add_gsub_to_font(fontfile):
     gsub_table.table.LookupList.FeatureRecord = []
 
     script_record = otTables.ScriptRecord()
-    script_record.ScriptTag = get_opentype_script_tag(fontfile)
+    script_record.ScriptTag = script_tag
     script_record.Script = otTables.Script()
     script_record.Script.LangSysCount = 0
     script_record.Script.LangSysRecord = []
@@ -128,11 +143,42 @@ def add_gsub_to_font(fontfile):
 
     font['GSUB'] = gsub_table
 
+
+def add_gsub_to_font(fontfile):
+    """Adds an empty GSUB table to a font, saving the result in the temp
+    directory and returning its path."""
+    font = ttLib.TTFont(fontfile)
+    add_empty_gsub(font, get_opentype_script_tag(fontfile))
     target_file = tempfile.gettempdir() + '/' + os.path.basename(fontfile)
     font.save(target_file)
     return target_file
 
 
+def _merge_source_data(fontfile):
+    """Returns the data of the font, with an empty GSUB table added if the
+    font has none."""
+    with open(fontfile, 'rb') as f:
+        data = f.read()
+    if _has_gsub(BytesIO(data)):
+        return data
+    font = ttLib.TTFont(BytesIO(data))
+    add_empty_gsub(font, get_opentype_script_tag(fontfile))
+    stream = BytesIO()
+    font.save(stream)
+    return stream.getvalue()
+
+
+def load_merge_sources(fontfiles, processes=None):
+    """Returns in-memory streams of the fonts for merge.Merger, adding an
+    empty GSUB table to fonts without one.  The fonts are read using a pool
+    of processes, one per cpu if processes is None.
+
+    The merger loads each font it is passed twice, so it is passed streams
+    rather than loaded fonts, and no temporary files are written."""
+    return [BytesIO(data) for data in tool_utils.parallel_map(
+        _merge_source_data, fontfiles, processes)]
+
+
 def main():
     merge_table = {
         'Historic': [
@@ -242,11 +288,7 @@ def main():
 
             print('Merging Noto Sans %s %s' % (merge_target, weight))
 
-            for index, fontfile in enumerate(regular_sources):
-                if not has_gsub_table(fontfile):
-                    regular_sources[index] = add_gsub_to_font(fontfile)
-
-            font = merger.merge(regular_sources)
+            font = merger.merge(load_merge_sources(regular_sources))
 
             first_font = source_fonts[0]
             if first_font != merge_target:
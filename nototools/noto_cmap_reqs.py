@@ -40,7 +40,9 @@ ZSye: for blocks going into the color emoji font
 
 import argparse
 import collections
+from os import path
 import sys
+import time
 
 from nototools import cldr_data
 from nototools import cmap_data
@@ -51,6 +53,8 @@ from nototools import opentype_data
 from nototools import tool_utils
 from nototools import unicode_data
 
+_DATA_DIR = path.join(path.abspath(path.dirname(__file__)), 'data')
+
 _MERGED_SCRIPTS_BY_TARGET = {
     'CJK': 'Bopo Hang Hani Hans Hant Hira Jpan Kana Kore'.split(),
     'LGC': 'Latn Grek Cyrl'.split(),
@@ -75,6 +79,10 @@ class CmapOps(object):
           script: set(script_to_chars[script])
           for script in script_to_chars
       }
+    # The inverse of _script_to_chars, kept in sync as chars are added and
+    # removed so passes can ask which scripts a char is in without a rebuild.
+    # A char in no script has no entry.
+    self._char_to_scripts = _invert_script_to_chars(self._script_to_chars)
     self._log_events = log_events
     self._log_details = log_details
     self._suppressed_blocks = {
@@ -103,7 +111,12 @@ class CmapOps(object):
         'EXCL',
     }
     self._block = None
+    self._block_start = None
+    self._block_end = None
     self._undefined_exceptions = undefined_exceptions or set()
+    self._phase_name = None
+    self._phase_start = None
+    self._phase_times = []
 
   def _report(self, text):
     if self._log_events:
@@ -119,12 +132,22 @@ class CmapOps(object):
   def _report_cp(self, cp, text, script):
     if not self._log_events:
       return
-    cp_block = unicode_data.block(cp)
-    if cp_block != self._block:
-      self._finish_block()
-      self._block = cp_block
-      print '# block: ' + self._block
-      self._block_count = collections.defaultdict(set)
+    # Most events are for chars in the same block as the previous event, so
+    # only look up the block when cp falls outside the current block's range.
+    if (self._block is None or
+        not self._block_start <= cp <= self._block_end):
+      cp_block = unicode_data.block(cp)
+      if cp_block == 'No_Block':
+        block_start = block_end = cp
+      else:
+        block_start, block_end = unicode_data.block_range(cp_block)
+      if cp_block != self._block:
+        self._finish_block()
+        self._block = cp_block
+        print '# block: ' + self._block
+        self._block_count = collections.defaultdict(set)
+      self._block_start = block_start
+      self._block_end = block_end
     if self._log_details:
       if not (
           self._block in self._suppressed_blocks or
@@ -164,6 +187,7 @@ class CmapOps(object):
   def _script_cp_ok_add(self, cp, script):
     if cp not in self._script_to_chars[script]:
       self._script_to_chars[script].add(cp)
+      self._char_to_scripts[cp].add(script)
       self._report_cp(cp, 'added to ' + script, script)
 
   def _script_ok_remove(self, cp, script):
@@ -174,15 +198,48 @@ class CmapOps(object):
     if cp in self._script_to_chars[script]:
       self._report_cp(cp, 'removed from ' + script, script)
       self._script_to_chars[script].remove(cp)
+      self._remove_char_script(cp, script)
+
+  def _remove_char_script(self, cp, script):
+    scripts = self._char_to_scripts[cp]
+    scripts.remove(script)
+    if not scripts:
+      del self._char_to_scripts[cp]
+
+  def _range_cps(self, start, end):
+    """Return the chars from start to end inclusive that can be added."""
+    return [
+        cp for cp in xrange(start, end + 1)
+        if unicode_data.is_defined(cp) or cp in self._undefined_exceptions]
+
+  def _finish_timing(self):
+    if self._phase_name is not None:
+      self._phase_times.append(
+          (self._phase_name, time.time() - self._phase_start))
+      self._phase_name = None
 
   def _finish_phase(self):
     self._finish_block()
     self._block = None
+    self._finish_timing()
+
+  def timing_section(self, name):
+    """Start timing work that is not part of a phase, such as the setup a
+    pass does before its first phase.  Nothing is logged."""
+    self._finish_timing()
+    self._phase_name = name
+    self._phase_start = time.time()
 
   def phase(self, phase_name):
     self._finish_phase()
+    self.timing_section(phase_name)
     self._report('\n# phase: ' + phase_name)
 
+  def phase_times(self):
+    """Return a list of (name, seconds) for the finished phases and timing
+    sections, in the order they ran."""
+    return self._phase_times[:]
+
   def log(self, log_msg):
     self._report('# log: ' + log_msg)
 
@@ -199,6 +256,8 @@ class CmapOps(object):
   def delete_script(self, script):
     self._verify_script_exists(script)
     self._verify_script_empty(script)
+    for cp in self._script_to_chars[script]:
+      self._remove_char_script(cp, script)
     del self._script_to_chars[script]
     self._report('# delete script: ' + script)
 
@@ -218,6 +277,16 @@ class CmapOps(object):
         for script in scripts:
           self._script_cp_ok_add(cp, script)
 
+  def add_range(self, start, end, script):
+    """Add the defined chars from start to end inclusive to script."""
+    self._verify_script_exists(script)
+    for cp in self._range_cps(start, end):
+      self._script_cp_ok_add(cp, script)
+
+  def add_block(self, block, script):
+    start, end = unicode_data.block_range(block)
+    self.add_range(start, end, script)
+
   def remove(self, cp, script):
     self._verify_script_exists(script)
     self._script_ok_remove(cp, script)
@@ -234,6 +303,18 @@ class CmapOps(object):
         for script in scripts:
           self._script_cp_ok_remove(cp, script)
 
+  def remove_range(self, start, end, script):
+    """Remove all of script's chars from start to end inclusive, including
+    any undefined exceptions."""
+    self._verify_script_exists(script)
+    cps = self._script_to_chars[script]
+    if end - start + 1 > len(cps):
+      in_range = sorted(cp for cp in cps if start <= cp <= end)
+    else:
+      in_range = [cp for cp in xrange(start, end + 1) if cp in cps]
+    for cp in in_range:
+      self._script_cp_ok_remove(cp, script)
+
   def remove_script_from(self, src_script, from_script):
     self._verify_script_exists(from_script)
     cps = self.script_chars(src_script)
@@ -260,12 +341,19 @@ class CmapOps(object):
     return self._script_to_chars.keys()
 
   def create_char_to_scripts(self):
-    return _invert_script_to_chars(self._script_to_chars)
+    char_to_scripts = collections.defaultdict(set)
+    for cp, scripts in self._char_to_scripts.iteritems():
+      char_to_scripts[cp] = set(scripts)
+    return char_to_scripts
 
   def script_chars(self, script):
     self._verify_script_exists(script)
     return sorted(self._script_to_chars[script])
 
+  def char_scripts(self, cp):
+    """Return the sorted scripts cp is currently assigned to."""
+    return sorted(self._char_to_scripts.get(cp, ()))
+
   def create_script_to_chars(self):
     return {
         script: set(self._script_to_chars[script])
@@ -547,13 +635,6 @@ def _reassign_common_by_block(cmap_ops):
   cmap_ops.delete_script('Zyyy')
 
 
-def _block_cps(block):
-  start, end = unicode_data.block_range(block)
-  return frozenset([
-      cp for cp in range(start, end + 1)
-      if unicode_data.is_defined(cp)])
-
-
 def _reassign_by_block(cmap_ops):
   """Reassign all chars in select blocks to designated scripts."""
   # block, from, to.  from '*' means from all scripts.
@@ -583,7 +664,6 @@ def _reassign_by_block(cmap_ops):
       block_assignments, key=lambda k: unicode_data.block_range(k[0])[0])
 
   cmap_ops.phase('reassign by block')
-  char_to_scripts = cmap_ops.create_char_to_scripts()
   for block, from_scripts, to_script in block_assignments:
     start, finish = unicode_data.block_range(block)
     if from_scripts == '*':
@@ -594,12 +674,13 @@ def _reassign_by_block(cmap_ops):
     for cp in range(start, finish + 1):
       if not unicode_data.is_defined(cp):
         continue
-      if cp not in char_to_scripts and to_script != 'EXCL':
+      cp_scripts = cmap_ops.char_scripts(cp)
+      if not cp_scripts and to_script != 'EXCL':
         print >> sys.stderr, 'reassign missing %04X %s' % (
             cp, unicode_data.name(cp, '<unnamed>'))
         continue
       if all_scripts:
-        from_list = char_to_scripts[cp]
+        from_list = cp_scripts
       else:
         from_list = from_scripts
       for from_script in from_list:
@@ -2694,7 +2775,8 @@ def _assign_script_special_chars(cmap_ops):
 
 def _assign_legacy_phase2(cmap_ops):
   """Assign legacy chars in some scripts, excluding some blocks."""
-  legacy_data = cmap_data.read_cmap_data_file('data/noto_cmap_phase2.xml')
+  legacy_data = cmap_data.read_cmap_data_file(
+      path.join(_DATA_DIR, 'noto_cmap_phase2.xml'))
   legacy_map = cmap_data.create_map_from_table(legacy_data.table)
   legacy_script_to_chars = {
       script: tool_utils.parse_int_ranges(row.ranges)
@@ -2945,7 +3027,8 @@ def _assign_symbols_from_groups(cmap_ops):
   and symbols blocks are themselves mixed)."""
 
   cmap_ops.phase('assign symbols from groups')
-  with open('codepoint_groups.txt', 'r') as f:
+  with open(path.join(path.dirname(path.abspath(__file__)),
+                     'codepoint_groups.txt'), 'r') as f:
     for lineix, line in enumerate(f):
       ix = line.find('#')
       if ix >= 0:
@@ -3029,7 +3112,7 @@ def _assign_mono(cmap_ops):
   cmap_ops.add(0xfe00, 'MONO')
 
   # geometric shapes should be in MONO too, many are but they're scattered
-  cmap_ops.add_all(_block_cps('Geometric Shapes'), 'MONO')
+  cmap_ops.add_block('Geometric Shapes', 'MONO')
 
 
 def _assign_sym2(cmap_ops):
@@ -3088,8 +3171,8 @@ def _assign_math(cmap_ops):
   cmap_ops.add_all(printable_ascii, 'Zmth')
 
   # Add back blocks that get split up too arbitrarily
-  cmap_ops.add_all(_block_cps('Mathematical Operators'), 'Zmth')
-  cmap_ops.add_all(_block_cps('Miscellaneous Mathematical Symbols-B'), 'Zmth')
+  cmap_ops.add_block('Mathematical Operators', 'Zmth')
+  cmap_ops.add_block('Miscellaneous Mathematical Symbols-B', 'Zmth')
 
   # Add back some symbols for math/logic
   math_geom = tool_utils.parse_int_ranges(
@@ -3202,7 +3285,50 @@ def _assign_basic(cmap_ops):
   cmap_ops.add_all_to_all(basic_chars, scripts_to_add)
 
 
-def build_script_to_chars(log_level):
+# The passes run by build_script_to_chars, in order.
+_BUILD_PASSES = [
+    _remove_unicode_assignments,
+    _unassign_inherited_and_common_with_extensions,
+    _reassign_inherited,
+    _reassign_common,
+    _unassign_latin,
+    _assign_cldr_punct,
+    _reassign_merged_scripts,
+    _reassign_common_by_block,
+    _reassign_by_block,
+    _remove_empty,
+    _reassign_symbols,
+    _reassign_emoji,
+    _assign_nastaliq,
+    _assign_complex_script_extra,
+    _assign_hyphens_for_autohyphenation,
+    _assign_script_required,
+    _assign_script_special_chars,
+    _assign_legacy_phase2,
+    _assign_bidi_mirroring,
+    _unassign_lgc_from_symbols,
+    _assign_programming_lang_symbols,
+    _assign_symbols_from_groups,
+    _assign_mono, # after LGC is defined except for basics
+    _assign_sym2, # after LGC removed, add back for enclosing keycaps
+    _assign_math,
+    _assign_dotted_circle, # for all fonts with combining marks
+    _remove_unwanted,  # comes before assign_basic, assign_wanted
+    _assign_wanted,
+    _assign_basic,
+]
+
+
+def _report_phase_times(phase_times):
+  total = sum(t for _, t in phase_times)
+  print >> sys.stderr, 'phase times:'
+  for phase_name, t in phase_times:
+    if t >= 0.0005:
+      print >> sys.stderr, '  %7.3fs  %s' % (t, phase_name)
+  print >> sys.stderr, '  %7.3fs  total' % total
+
+
+def _run_passes(log_level, passes):
   if log_level == 0:
     log_events = False
     log_details = False
@@ -3219,37 +3345,19 @@ def build_script_to_chars(log_level):
       script_to_chars, log_events=log_events, log_details=log_details,
       undefined_exceptions=temp_defined)
 
-  _remove_unicode_assignments(cmap_ops)
-  _unassign_inherited_and_common_with_extensions(cmap_ops)
-  _reassign_inherited(cmap_ops)
-  _reassign_common(cmap_ops)
-  _unassign_latin(cmap_ops)
-  _assign_cldr_punct(cmap_ops)
-  _reassign_merged_scripts(cmap_ops)
-  _reassign_common_by_block(cmap_ops)
-  _reassign_by_block(cmap_ops)
-  _remove_empty(cmap_ops)
-  _reassign_symbols(cmap_ops)
-  _reassign_emoji(cmap_ops)
-  _assign_nastaliq(cmap_ops)
-  _assign_complex_script_extra(cmap_ops)
-  _assign_hyphens_for_autohyphenation(cmap_ops)
-  _assign_script_required(cmap_ops)
-  _assign_script_special_chars(cmap_ops)
-  _assign_legacy_phase2(cmap_ops)
-  _assign_bidi_mirroring(cmap_ops)
-  _unassign_lgc_from_symbols(cmap_ops)
-  _assign_programming_lang_symbols(cmap_ops)
-  _assign_symbols_from_groups(cmap_ops)
-  _assign_mono(cmap_ops) # after LGC is defined except for basics
-  _assign_sym2(cmap_ops) # after LGC removed, add back for enclosing keycaps
-  _assign_math(cmap_ops)
-  _assign_dotted_circle(cmap_ops) # for all fonts with combining marks
-  _remove_unwanted(cmap_ops)  # comes before assign_basic, assign_wanted
-  _assign_wanted(cmap_ops)
-  _assign_basic(cmap_ops)
+  for build_pass in passes:
+    cmap_ops.timing_section(build_pass.__name__)
+    build_pass(cmap_ops)
   cmap_ops.finish()  # so we can clean up log
+  return cmap_ops
+
 
+def build_script_to_chars(log_level, report_times=False):
+  """Run all the passes and return the resulting map from script to chars.
+  If report_times is true, report the time taken by each phase to stderr."""
+  cmap_ops = _run_passes(log_level, _BUILD_PASSES)
+  if report_times:
+    _report_phase_times(cmap_ops.phase_times())
   return cmap_ops.create_script_to_chars()
 
 
@@ -3307,13 +3415,16 @@ def main():
   parser.add_argument(
       '--regen', help='reformat script required data, no cmap generation',
       action='store_true')
+  parser.add_argument(
+      '-t', '--timing', help='report the time taken by each phase',
+      action='store_true')
 
   args = parser.parse_args()
   if args.regen:
     _regen_script_required()
     return
 
-  script_to_chars = build_script_to_chars(args.loglevel)
+  script_to_chars = build_script_to_chars(args.loglevel, args.timing)
   meta_params = []
   if args.merge:
     script_to_chars = _merge_fallback_chars(script_to_chars, args.merge)
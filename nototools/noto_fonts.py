@@ -498,9 +498,16 @@ NotoFamily = collections.namedtuple(
     'NotoFamily',
     'name, family_id, rep_member, charset, hinted_members, unhinted_members')
 
-def get_families(fonts):
+# NotoFamilyMembers holds the members of a family, without the name and
+# charset that NotoFamily reads from the representative font.
+NotoFamilyMembers = collections.namedtuple(
+    'NotoFamilyMembers',
+    'family_id, rep_member, hinted_members, unhinted_members')
+
+def get_family_members(fonts):
   """Group fonts into families, separate into hinted and unhinted, select
-  representative."""
+  representative.  Returns a map from family_id to NotoFamilyMembers, the
+  fonts themselves are not read."""
 
   family_id_to_fonts = collections.defaultdict(set)
   families = {}
@@ -535,6 +542,19 @@ def get_families(fonts):
       raise ValueError(
           'Family %s does not have a representative font.' % family_id)
 
+    families[family_id] = NotoFamilyMembers(
+        family_id, rep_member, hinted_members, unhinted_members)
+
+  return families
+
+
+def get_families(fonts):
+  """Group fonts into families, separate into hinted and unhinted, select
+  representative."""
+
+  families = {}
+  for family_id, members in get_family_members(fonts).iteritems():
+    rep_member = members.rep_member
     name = get_font_family_name(rep_member.filepath)
 
     if rep_member.fmt in {'ttf', 'otf'}:
@@ -544,7 +564,8 @@ def get_families(fonts):
       charset = None
 
     families[family_id] = NotoFamily(
-        name, family_id, rep_member, charset, hinted_members, unhinted_members)
+        name, family_id, rep_member, charset, members.hinted_members,
+        members.unhinted_members)
 
   return families
 
@@ -33,7 +33,6 @@ import subprocess
 import sys
 import tempfile
 
-from fontTools import subset
 from fontTools import ttLib
 from fontTools.ttLib.tables import otTables
 from fontTools.misc import arrayTools
@@ -42,8 +41,12 @@ from fontTools.pens import basePen
 
 from nototools import cldr_data
 from nototools import cmap_data
+from nototools import codepoint_set
 from nototools import font_data
+from nototools import glyph_reachability
 from nototools import lint_config
+from nototools import lint_profile
+from nototools import lint_results
 from nototools import notoconfig
 from nototools import noto_data
 from nototools import noto_fonts
@@ -67,17 +70,12 @@ def all_scripts():
 
 
 def printable_unicode_range(input_char_set):
-    char_set = set(input_char_set)  # copy
     parts_list = []
-    while char_set:
-        last = first = min(char_set)
-        while last in char_set:
-            char_set.remove(last)
-            last += 1
-        if last == first + 1:
+    for first, last in codepoint_set.CodepointSet(input_char_set).ranges():
+        if first == last:
             part = "%04X" % first
         else:
-            part = "%04X..%04X" % (first, last - 1)
+            part = "%04X..%04X" % (first, last)
         parts_list.append(part)
     return ", ".join(parts_list)
 
@@ -465,7 +463,12 @@ def check_font(font_props, filename_error,
                lint_spec, runlog=False, skiplog=False,
                csv_flag=False, info_flag=False,
                extrema_details=True, nowarn=False,
-               quiet=False, noto_phase=3, variable=False):
+               quiet=False, noto_phase=3, variable=False, results_sink=None,
+               profile=None):
+    """Lint one font.  If results_sink is provided it gets the findings
+    instead of their being printed, csv_flag without a results_sink writes
+    them as csv to stdout.  If profile is provided, the time spent in each
+    test is recorded in it."""
     global _processed_files
 
     _processed_files += 1
@@ -515,7 +518,7 @@ def check_font(font_props, filename_error,
 
             ec = err_count[0]
             wc = warn_count[0]
-            if not csv_flag and (not quiet or ec or (wc and not nowarn)):
+            if results is None and (not quiet or ec or (wc and not nowarn)):
                 print_file_name()
                 se = suppressed_err_count[0]
                 if not se:
@@ -557,31 +560,13 @@ def check_font(font_props, filename_error,
         if nowarn and not is_error:
             return
 
-        if not csv_flag:
-            print_file_name()
-
         err_type = 'Info' if category_name is "info" else "Error" if is_error else "Warning"
-        if csv_flag:
-            names = []
-            if font_props.weight != 'Regular' or not font_props.slope:
-                names.append(font_props.weight)
-            if font_props.slope:
-                names.append(font_props.slope)
-            subfamily = ''.join(names)
-            print(('%s,%s,%s,%s,%s,%s,%s,%s,%s,"%s"' % (
-                err_type,
-                noto_fonts.script_name_for_report(font_props.script),
-                font_props.style if font_props.style else '',
-                font_props.variant if font_props.variant else '',
-                subfamily,
-                font_data.get_name_records(font)[8].split()[0],
-                category_name,
-                interesting_part_of_file_name,
-                printable_font_revision(font),
-                message)).encode('UTF-8'))
+        if results is not None:
+            results.add(err_type, test_name, category_name, message)
         else:
+            print_file_name()
             print("%s <%s> %s" % (err_type[0], test_name, message.encode('UTF-8')))
-        sys.stdout.flush()
+            sys.stdout.flush()
 
     _script_key_to_font_name = {
         'Aran': 'Urdu',
@@ -643,10 +628,7 @@ def check_font(font_props, filename_error,
 
         _check_unused_names()
 
-        family_to_name_info = noto_names.family_to_name_info_for_phase(
-            noto_phase)
-        name_data = noto_names.name_table_data(
-            noto_font, family_to_name_info, noto_phase)
+        name_data = noto_names.name_table_data_for_phase(noto_font, noto_phase)
         if not name_data:
             warn("name/unable_to_check", "Unable to check",
                  "No name data available for this font.")
@@ -1160,20 +1142,36 @@ def check_font(font_props, filename_error,
                 tmp_gids.add(font.getGlyphID(cmap[cp], requireReal=True))
         win_ansi_gids = frozenset(tmp_gids)
 
+        def glyph_test(tag):
+            """Return a function of a glyph index that returns whether to
+            run the test for the glyph, or None if the test is not run."""
+            if not tests.check(tag):
+                return None
+            tag_filter = tests.get_filter(tag)
+            if tag_filter:
+                return tag_filter[1].accept
+            return lambda glyph_index: True
+
+        check_glyphs = tests.check('bounds/glyph')
+        if check_glyphs:
+            test_ui_ymax = test_ui_ymin = None
+            if font_props.is_UI_metrics:
+                test_ui_ymax = glyph_test('bounds/glyph/ui_ymax')
+                test_ui_ymin = glyph_test('bounds/glyph/ui_ymin')
+            test_ymax = glyph_test('bounds/glyph/ymax')
+            test_ymin = glyph_test('bounds/glyph/ymin')
+
         font_ymin = None
         font_ymax = None
-        glyph_set = font.getGlyphSet()
+        glyph_bounds = render.GlyphBounds(font)
         for glyph_index in range(len(glyf_table.glyphOrder)):
             glyph_name = glyf_table.glyphOrder[glyph_index]
-            glyph = glyf_table[glyph_name]
             # Compute the ink's yMin and yMax
-
-            ttglyph = glyph_set[glyph_name]
-            ymin, ymax = render.get_glyph_cleaned_extents(ttglyph, glyph_set)
+            ymin, ymax = glyph_bounds.vertical_extents(glyph_name)
             font_ymin = render.min_with_none(font_ymin, ymin)
             font_ymax = render.max_with_none(font_ymax, ymax)
 
-            if not tests.check('bounds/glyph'):
+            if not check_glyphs:
                 continue
 
             is_win_ansi = glyph_index in win_ansi_gids
@@ -1189,14 +1187,14 @@ def check_font(font_props, filename_error,
                 descent_name = 'sTypoDescent'
 
             if font_props.is_UI_metrics:
-                if (tests.checkvalue('bounds/glyph/ui_ymax', glyph_index) and
+                if (test_ui_ymax and test_ui_ymax(glyph_index) and
                         ymax is not None and ymax > max_ui_height):
                     warn("bounds/glyph/ui_ymax", "UI Bounds",
                          "Real yMax for glyph %d (%s) is %d, which is more than "
                          "max ui height %d." % (
                              glyph_index, glyph_name, ymax, max_ui_height),
                          check_test=False)
-                if (tests.checkvalue('bounds/glyph/ui_ymin', glyph_index) and
+                if (test_ui_ymin and test_ui_ymin(glyph_index) and
                         ymin is not None and ymin < min_ui_height):
                     warn("bounds/glyph/ui_ymin", "UI Bounds",
                          "Real yMin for glyph %d (%s) is %d, which is less than "
@@ -1204,7 +1202,7 @@ def check_font(font_props, filename_error,
                              glyph_index, glyph_name, ymin, min_ui_height),
                          check_test=False)
 
-            if (tests.checkvalue('bounds/glyph/ymax', glyph_index) and ymax is not None and
+            if (test_ymax and test_ymax(glyph_index) and ymax is not None and
                     ymax > ascent_limit):
                 warn("bounds/glyph/ymax", "Bounds",
                      "Real yMax for glyph %d (%s) is %d, which is higher than "
@@ -1212,7 +1210,7 @@ def check_font(font_props, filename_error,
                      (glyph_index, glyph_name, ymax, ascent_name, ascent_limit),
                      check_test=False)
 
-            if (tests.checkvalue('bounds/glyph/ymin', glyph_index) and ymin is not None and
+            if (test_ymin and test_ymin(glyph_index) and ymin is not None and
                     ymin < descent_limit):
                 warn("bounds/glyph/ymin", "Bounds",
                      "Real yMin for glyph %d (%s) is %d, which is lower than "
@@ -1671,7 +1669,7 @@ def check_font(font_props, filename_error,
 
         # There should be no fpgm, prep, or cvt tables in unhinted fonts
         if expected_to_be_unhinted:
-            for table_name in ['fpgm', 'prep', 'cvt']:
+            for table_name in ['fpgm', 'prep', 'cvt ']:
                 if table_name in font:
                     warn("hints/unexpected_tables", "Hints",
                          "The font is supposed to be unhinted, but it has "
@@ -1855,9 +1853,9 @@ def check_font(font_props, filename_error,
     def check_accessiblity(cmap):
         """Test if all glyphs are accessible through cmap, decomps, or GSUB.
 
-        This is done using the font subsetter. We ask the subsetter to subset
-        for all Unicode characters in the cmap table, and see if every glyph is
-        covered after subsetting.
+        This computes the glyphs a subsetter would keep when subsetting for
+        all Unicode characters in the cmap table, and sees if every glyph is
+        covered.
         """
         if not tests.check('reachable'):
             return
@@ -1866,16 +1864,15 @@ def check_font(font_props, filename_error,
         glyph_name_to_id = font.getReverseGlyphMap().copy()
 
         all_glyphs = set(font.getGlyphOrder())
-        subsetter = subset.Subsetter()
-        subsetter.populate(unicodes=cmap.keys())
         try:
-            subsetter._closure_glyphs(font)
+            reachable_glyphs = glyph_reachability.reachable_glyphs(
+                font, cmap.keys())
         except Exception as e:
             warn("reachable", "Reachability",
-                 "Subsetter failure, bad/missing tables?: '%s'" % e)
+                 "Glyph closure failure, bad/missing tables?: '%s'" % e)
             return
 
-        unreachable_glyphs = all_glyphs - subsetter.glyphs_retained
+        unreachable_glyphs = all_glyphs - reachable_glyphs
         if unreachable_glyphs:
             reported_glyphs = set()
             reported_list = []
@@ -1901,6 +1898,8 @@ def check_font(font_props, filename_error,
     warn_count = [0]
 
     font_path = path.expanduser(font_props.filepath)
+    if profile is not None:
+        profile.start_font(font_props.filepath)
     font = ttLib.TTFont(font_path)
 
     is_indic = font_props.script in {
@@ -1920,6 +1919,34 @@ def check_font(font_props, filename_error,
         vendor=font_props.vendor,
         version=printable_font_revision(font, accuracy=3 if font_props.vendor == 'Adobe' else 2))
     tests = lint_spec.get_tests(fi)
+    if profile is not None:
+        tests = profile.profile_tests(tests)
+
+    def run_check(tag, check_fn, *args):
+        """Call check_fn, charging the time until its first test to tag."""
+        if profile is not None:
+            profile.start(tag, count=False)
+        return check_fn(*args)
+
+    if results_sink is None and csv_flag:
+        results_sink = lint_results.CsvResultSink()
+    results = None
+    if results_sink is not None:
+        file_parts = font_props.filepath.split("/")[-2:]
+        manufacturer = font_data.get_name_records(font).get(8, '').split()
+        results = results_sink.font_results(lint_results.FontIdentity(
+            path=font_props.filepath,
+            hint_dir=file_parts[0] if len(file_parts) == 2 else None,
+            filename=file_parts[-1],
+            family=font_props.family,
+            script=font_props.script,
+            script_name=noto_fonts.script_name_for_report(font_props.script),
+            style=font_props.style,
+            variant=font_props.variant,
+            weight=font_props.weight,
+            slope=font_props.slope,
+            manufacturer=manufacturer[0] if manufacturer else '',
+            revision=printable_font_revision(font)))
 
     if filename_error:
         if filename_error == 'script':
@@ -1931,25 +1958,33 @@ def check_font(font_props, filename_error,
                  "File name '%s' does not match the Noto font naming guidelines."
                  % path.basename(font_props.filepath))
 
-    check_name_table()
-    cmap = check_cmap_table()
-    check_variants()
-    check_head_tables(cmap)
-    check_vertical_limits()
-    check_for_intersections_and_off_curve_extrema()
-    check_gdef_table(cmap)
-    check_gpos_and_gsub_tables()
-    check_for_bidi_pairs(cmap)
-    check_hints()
-    check_explicit_advances()
-    check_stems(cmap)
-
-    # This must be done at the very end, since the subsetter may change the font
-    check_accessiblity(cmap)
-
-    warn("info", "info",
-         "supported characters: " + printable_unicode_range(cmap.keys()),
-         check_test=False)
+    try:
+        run_check('name', check_name_table)
+        cmap = run_check('cmap', check_cmap_table)
+        run_check('cmap/variants', check_variants)
+        run_check('head', check_head_tables, cmap)
+        run_check('bounds', check_vertical_limits)
+        run_check('paths', check_for_intersections_and_off_curve_extrema)
+        run_check('gdef', check_gdef_table, cmap)
+        run_check('complex', check_gpos_and_gsub_tables)
+        run_check('bidi', check_for_bidi_pairs, cmap)
+        run_check('hints', check_hints)
+        run_check('advances', check_explicit_advances)
+        run_check('stem', check_stems, cmap)
+
+        run_check('reachable', check_accessiblity, cmap)
+        if profile is not None:
+            profile.stop()
+
+        warn("info", "info",
+             "supported characters: " + printable_unicode_range(cmap.keys()),
+             check_test=False)
+    finally:
+        # write what was found even if a check failed
+        if results is not None:
+            results.close(err_count[0], warn_count[0])
+        if profile is not None:
+            profile.end_font()
 
     if runlog:
         log = sorted(tests.runlog())
@@ -2004,10 +2039,16 @@ def main():
         'lint_config', '[tools]/nototools/data/lint_config.txt')
 
     parser = argparse.ArgumentParser()
-    parser.add_argument(
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument(
         "--csv",
         help="produces csv output to import into a spreadsheet",
         action="store_true")
+    output_group.add_argument(
+        "--jsonl",
+        help="produces JSON Lines output, a font record for each font "
+        "followed by a record for each finding and a summary record",
+        action="store_true")
     parser.add_argument(
         "--info",
         help="includes informational messages in the output",
@@ -2068,6 +2109,11 @@ def main():
         "-v", "--variable",
         help="do checks appropriate to masters for variable fonts.",
         action="store_true")
+    parser.add_argument(
+        "--profile",
+        help="report the time spent in tests to stderr, listing the n "
+        "slowest tests and fonts (default 10)",
+        metavar='n', type=int, nargs='?', const=10)
 
     arguments = parser.parse_args()
 
@@ -2085,9 +2131,17 @@ def main():
     config_file = tool_utils.resolve_path(arguments.config_file)
     lint_spec = get_lint_spec(config_file, arguments.config)
 
-    if arguments.csv and arguments.csv_header:
-        print("Type,Script,Style,Variant,Subfamily,Manufacturer,Category,"
-              "Hint Status,File Name,Revision,Issue")
+    results_sink = None
+    if arguments.csv:
+        results_sink = lint_results.CsvResultSink()
+        if arguments.csv_header:
+            results_sink.write_header()
+    elif arguments.jsonl:
+        results_sink = lint_results.JsonLinesResultSink()
+
+    profile = None
+    if arguments.profile is not None:
+        profile = lint_profile.LintProfile()
 
     for font_file_path in arguments.font_files:
         font_file_path = tool_utils.resolve_path(font_file_path)
@@ -2107,7 +2161,9 @@ def main():
                        arguments.nowarn,
                        arguments.quiet,
                        arguments.phase,
-                       arguments.variable)
+                       arguments.variable,
+                       results_sink,
+                       profile)
     if arguments.font_props_file:
         font_props_list = parse_font_props(arguments.font_props_file)
         for font_props in font_props_list:
@@ -2122,9 +2178,11 @@ def main():
                        arguments.nowarn,
                        arguments.quiet,
                        arguments.phase,
-                       arguments.variable)
+                       arguments.variable,
+                       results_sink,
+                       profile)
 
-    if not arguments.csv:
+    if results_sink is None:
         print("------")
         if _processed_files == 1:
             print("Finished linting 1 file.")
@@ -2140,6 +2198,9 @@ def main():
                     _processed_files_with_warnings,
                     '' if _processed_files_with_warnings == 1 else 's'))
 
+    if profile is not None:
+        profile.write_report(sys.stderr, arguments.profile)
+
 
 if __name__ == "__main__":
     main()
@@ -87,6 +87,10 @@ FAMILY_NAME_INFO_FILE='family_name_info.xml'
 PHASE_2_FAMILY_NAME_INFO_FILE = '[tools]/nototools/data/family_name_info_p2.xml'
 PHASE_3_FAMILY_NAME_INFO_FILE = '[tools]/nototools/data/family_name_info_p3.xml'
 
+# 'noto_names write' caches the name data computed for these files alongside
+# them, bump this when the name data generated for a font changes.
+NAME_DATA_CACHE_VERSION = 1
+
 # Represents how we write family names in the name table.
 #
 # If no_style_linking is true, 'Bold' and 'Regular' weights become
@@ -581,26 +585,10 @@ def _license_url(noto_font):
   raise ValueError('unknown license type "%s"' % noto_font.license_type)
 
 
-def name_table_data(noto_font, family_to_name_info, phase):
-  """Returns a NameTableData for this font given the family_to_name_info."""
-  family_id = noto_fonts.noto_font_to_wws_family_id(noto_font)
-  try:
-      info = family_to_name_info[family_id]
-  except KeyError:
-      print('no family name info for "%s"' % family_id, file=sys.stderr)
-      return None
-
-  family_parts, subfamily_parts = _wws_parts(*_preferred_parts(noto_font))
-  if not info.use_preferred and subfamily_parts not in [
-      ['Regular'],
-      ['Bold'],
-      ['Italic'],
-      ['Bold', 'Italic']]:
-    print('Error in family name info: %s requires preferred names, but info says none are required.'
-          % path.basename(noto_font.filepath), file=sys.stderr)
-    print(subfamily_parts, file=sys.stderr)
-    return None
-
+def _face_names(family_parts, subfamily_parts, info, phase):
+  """Returns the original family and subfamily, preferred family and
+  subfamily, full, and postscript names for the wws family and subfamily
+  parts given the FamilyNameInfo."""
   # for phase 3 we'll now force include_regular
   include_regular = phase == 3 or info.include_regular
 
@@ -617,15 +605,42 @@ def name_table_data(noto_font, family_to_name_info, phase):
   if psfn and psfn == osfn:
     psfn = None
 
+  return (ofn, osfn, pfn, psfn,
+          _full_name(family_parts, subfamily_parts, include_regular),
+          _postscript_name(family_parts, subfamily_parts, include_regular))
+
+
+def _face_name_table_data(noto_font, info, phase, parts_to_names):
+  """Returns a NameTableData for this font given its family's FamilyNameInfo,
+  or None if the info does not fit the font.  parts_to_names maps the wws
+  parts of faces of the family to their _face_names, and is updated."""
+  family_parts, subfamily_parts = _wws_parts(*_preferred_parts(noto_font))
+  if not info.use_preferred and subfamily_parts not in [
+      ['Regular'],
+      ['Bold'],
+      ['Italic'],
+      ['Bold', 'Italic']]:
+    print('Error in family name info: %s requires preferred names, but info says none are required.'
+          % path.basename(noto_font.filepath), file=sys.stderr)
+    print(subfamily_parts, file=sys.stderr)
+    return None
+
+  # Hinted and unhinted, ttf and otf faces have the same names.
+  parts_key = (tuple(family_parts), tuple(subfamily_parts))
+  names = parts_to_names.get(parts_key)
+  if not names:
+    names = _face_names(family_parts, subfamily_parts, info, phase)
+    parts_to_names[parts_key] = names
+  ofn, osfn, pfn, psfn, full_name, postscript_name = names
+
   return NameTableData(
       copyright_re=_copyright_re(noto_font),
       original_family=ofn,
       original_subfamily=osfn,
       unique_id='-',
-      full_name=_full_name(family_parts, subfamily_parts, include_regular),
+      full_name=full_name,
       version_re=_version_re(noto_font, phase),
-      postscript_name=_postscript_name(
-          family_parts, subfamily_parts, include_regular),
+      postscript_name=postscript_name,
       trademark=_trademark(noto_font),
       manufacturer=_manufacturer(noto_font),
       designer=_designer(noto_font, phase),
@@ -640,6 +655,52 @@ def name_table_data(noto_font, family_to_name_info, phase):
       wws_subfamily=None)
 
 
+def _face_key(noto_font):
+  # Everything but the file path goes into the name data.
+  return tuple(noto_font[1:])
+
+
+# Map from (phase, wws family id, FamilyNameInfo) to a pair of maps, from the
+# _face_key of each face of the family computed so far to its NameTableData,
+# and from the wws parts of those faces to their _face_names.
+_FAMILY_NAME_DATA_CACHE = {}
+
+# Phases with name data computed since the name data cache was read.
+_NAME_DATA_CACHE_CHANGED = set()
+
+def family_name_table_data(family_id, faces, info, phase):
+  """Returns a map from each NotoFont in faces, fonts in the wws family with
+  family_id, to its NameTableData given the FamilyNameInfo for the family.
+  The names are computed once for the faces with the same family and
+  subfamily parts, the name data once for fonts that differ only in their
+  file path, and both are memoized for later calls.  Fonts the info does not
+  fit map to None, the error is reported when their name data is first
+  computed."""
+  face_to_data, parts_to_names = _FAMILY_NAME_DATA_CACHE.setdefault(
+      (phase, family_id, info), ({}, {}))
+  result = {}
+  for noto_font in faces:
+    key = _face_key(noto_font)
+    if key not in face_to_data:
+      face_to_data[key] = _face_name_table_data(
+          noto_font, info, phase, parts_to_names)
+      _NAME_DATA_CACHE_CHANGED.add(phase)
+    result[noto_font] = face_to_data[key]
+  return result
+
+
+def name_table_data(noto_font, family_to_name_info, phase):
+  """Returns a NameTableData for this font given the family_to_name_info."""
+  family_id = noto_fonts.noto_font_to_wws_family_id(noto_font)
+  try:
+      info = family_to_name_info[family_id]
+  except KeyError:
+      print('no family name info for "%s"' % family_id, file=sys.stderr)
+      return None
+  return family_name_table_data(
+      family_id, [noto_font], info, phase)[noto_font]
+
+
 def _create_family_to_subfamilies(notofonts):
   """Return a map from preferred family name to set of preferred subfamilies.
   Note these are WWS family/subfamilies now."""
@@ -673,9 +734,16 @@ def create_family_to_name_info(notofonts, phase, extra_styles):
   family_to_parts = collections.defaultdict(set)
   family_to_name_styles = collections.defaultdict(set)
   cjk_families = set()
+  seen_parts = set()
   for noto_font in notofonts:
     family_id = noto_fonts.noto_font_to_wws_family_id(noto_font)
     preferred_family, preferred_subfamily = _preferred_parts(noto_font)
+    # Hinted and unhinted, ttf and otf fonts all have the same parts, only
+    # look at them once.
+    parts_key = (family_id, tuple(preferred_family), tuple(preferred_subfamily))
+    if parts_key in seen_parts:
+      continue
+    seen_parts.add(parts_key)
     _, subfamily_parts = _wws_parts(preferred_family, preferred_subfamily)
     family_to_parts[family_id].update(subfamily_parts)
     # It's been asserted that the family name can't be longer than 32 chars.
@@ -818,6 +886,69 @@ def family_to_name_info_for_phase(phase):
   return result
 
 
+def _name_data_cache_path(info_file):
+  """Return the path of the name data cache kept alongside the family name
+  info file."""
+  return (path.splitext(tool_utils.resolve_path(info_file))[0] +
+          '_name_data.pkl')
+
+
+def _read_name_data_cache(phase):
+  """Add the name data in the cache alongside the family name info file for
+  phase to the memoized name data."""
+  cache = tool_utils.read_cache(
+      _name_data_cache_path(_PHASE_TO_FILENAME[phase]),
+      NAME_DATA_CACHE_VERSION)
+  for (family_id, info), face_to_data in cache.iteritems():
+    memo, _ = _FAMILY_NAME_DATA_CACHE.setdefault(
+        (phase, family_id, FamilyNameInfo(*info)), ({}, {}))
+    for key, data in face_to_data.iteritems():
+      memo.setdefault(key, data and NameTableData(*data))
+
+
+def write_name_data_cache(phase, info_file=None):
+  """Write the name data memoized for the families in the family name info
+  file for phase, or info_file if provided, to the cache alongside that file,
+  if any name data was computed since the cache was read.  Name data for
+  families whose info changed since it was computed is dropped.  Only the
+  write command calls this, tools that just read name data do not write
+  files next to the info file."""
+  if phase not in _NAME_DATA_CACHE_CHANGED:
+    return
+  if info_file:
+    family_to_name_info = read_family_name_info_file(info_file)
+  else:
+    info_file = _PHASE_TO_FILENAME[phase]
+    family_to_name_info = family_to_name_info_for_phase(phase)
+  # Store plain tuples, so the cache does not depend on how this module was
+  # loaded.
+  cache = {}
+  for (data_phase, family_id, info), (face_to_data, _) in (
+      _FAMILY_NAME_DATA_CACHE.iteritems()):
+    if data_phase == phase and family_to_name_info.get(family_id) == info:
+      cache[(family_id, tuple(info))] = {
+          key: data and tuple(data) for key, data in face_to_data.iteritems()}
+  try:
+    tool_utils.write_cache(
+        _name_data_cache_path(info_file), NAME_DATA_CACHE_VERSION, cache)
+  except (IOError, OSError) as e:
+    print('could not write name data cache: %s' % e, file=sys.stderr)
+    return
+  _NAME_DATA_CACHE_CHANGED.discard(phase)
+
+
+_NAME_DATA_CACHE_READ = set()
+def name_table_data_for_phase(noto_font, phase):
+  """Returns a NameTableData for this font using the family name info for
+  phase.  The first call for a phase reads the name data cached by
+  write_name_data_cache."""
+  if phase not in _NAME_DATA_CACHE_READ:
+    _NAME_DATA_CACHE_READ.add(phase)
+    _read_name_data_cache(phase)
+  return name_table_data(
+      noto_font, family_to_name_info_for_phase(phase), phase)
+
+
 def read_family_name_info_file(filename):
   """Returns a map from preferred family name to FontNameInfo."""
   filename = tool_utils.resolve_path(filename)
@@ -887,10 +1018,19 @@ def _dump(fonts, info_file, phase):
 
 def _write(fonts, info_file, phase, extra_styles):
   """Build family name info from font_paths and write to info_file.
-  Write to stdout if info_file is None."""
+  Write to stdout if info_file is None, else also cache the name data of the
+  fonts alongside it."""
   family_to_name_info =  create_family_to_name_info(fonts, phase, extra_styles)
   if info_file:
     write_family_name_info_file(family_to_name_info, info_file, pretty=True)
+    family_to_faces = collections.defaultdict(list)
+    for noto_font in fonts:
+      family_id = noto_fonts.noto_font_to_wws_family_id(noto_font)
+      family_to_faces[family_id].append(noto_font)
+    for family_id, faces in family_to_faces.iteritems():
+      family_name_table_data(
+          family_id, faces, family_to_name_info[family_id], phase)
+    write_name_data_cache(phase, info_file)
   else:
     print(write_family_name_info(family_to_name_info, pretty=True))
 
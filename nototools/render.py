@@ -24,6 +24,7 @@ import subprocess
 
 import font_caching
 
+from fontTools.misc.bezierTools import calcQuadraticBounds
 from fontTools.pens.boundsPen import BoundsPen
 
 def min_with_none(first, second):
@@ -59,6 +60,176 @@ def get_glyph_cleaned_extents(ttglyph, glyf_set):
     return pen.bounds[1], pen.bounds[3]
 
 
+class GlyphBounds(object):
+    """The bounds of the glyphs in a font, computed at most once per glyph.
+
+    For glyf fonts the bounds of simple glyphs are computed directly from
+    their coordinates, following the segments a BoundsPen would be drawn,
+    and the bounds of composite glyphs whose components are only offset are
+    computed from the bounds of the components.  Other glyphs are drawn
+    with a BoundsPen.  The bounds are those of a BoundsPen, except that
+    composite bounds can differ in the last bit.
+
+    If ignore_single_points is true, single-point contours are ignored
+    exactly like get_glyph_cleaned_extents does: BoundsPen only ignores a
+    contour that is a lone moveTo.  fontTools draws a single-point glyf
+    contour as a moveTo and a lineTo to the same point, so those still
+    count, and the bounds computed from glyf coordinates count them too."""
+
+    def __init__(self, font, ignore_single_points=True):
+        self._font = font
+        self._ignore_single_points = ignore_single_points
+        if 'glyf' in font:
+            self._glyf_table = font['glyf']
+            self._hmtx = font['hmtx'].metrics
+        else:
+            self._glyf_table = None
+        self._glyph_set = None
+        self._bounds = {}
+
+    def bounds(self, glyph_name):
+        """Return the (xmin, ymin, xmax, ymax) bounds of the glyph, or None if
+        it has no outline."""
+        try:
+            return self._bounds[glyph_name]
+        except KeyError:
+            pass
+        bounds = None
+        if self._glyf_table is not None:
+            glyph = self._glyf_table[glyph_name]
+            if glyph.isComposite():
+                bounds = self._composite_bounds(glyph)
+            elif glyph.numberOfContours <= 0:
+                bounds = None
+            elif self._hmtx[glyph_name][1] != glyph.xMin:
+                # the glyph set draws the glyph offset to its lsb
+                bounds = _NEEDS_PEN
+            else:
+                bounds = self._simple_bounds(glyph)
+        else:
+            bounds = _NEEDS_PEN
+        if bounds is _NEEDS_PEN:
+            bounds = self._pen_bounds(glyph_name)
+        self._bounds[glyph_name] = bounds
+        return bounds
+
+    def vertical_extents(self, glyph_name):
+        """Return the (ymin, ymax) extents of the glyph, or (None, None) if it
+        has no outline."""
+        bounds = self.bounds(glyph_name)
+        if not bounds:
+            return None, None
+        return bounds[1], bounds[3]
+
+    def _pen_bounds(self, glyph_name):
+        if self._glyph_set is None:
+            self._glyph_set = self._font.getGlyphSet()
+        pen = BoundsPen(
+            self._glyph_set, ignoreSinglePoints=self._ignore_single_points)
+        self._glyph_set[glyph_name].draw(pen)
+        return pen.bounds
+
+    def _composite_bounds(self, glyph):
+        bounds = None
+        for component in glyph.components:
+            if hasattr(component, 'transform') or not hasattr(component, 'y'):
+                return _NEEDS_PEN
+            if component.glyphName not in self._glyf_table:
+                # BoundsPen skips missing components too
+                continue
+            component_bounds = self.bounds(component.glyphName)
+            if not component_bounds:
+                continue
+            x, y = component.x, component.y
+            xmin, ymin, xmax, ymax = component_bounds
+            xmin, ymin, xmax, ymax = xmin + x, ymin + y, xmax + x, ymax + y
+            if bounds is None:
+                bounds = xmin, ymin, xmax, ymax
+            else:
+                bounds = (
+                    min(bounds[0], xmin), min(bounds[1], ymin),
+                    max(bounds[2], xmax), max(bounds[3], ymax))
+        return bounds
+
+    def _simple_bounds(self, glyph):
+        """Follows fontTools' Glyph.draw, BasePen.qCurveTo and BoundsPen."""
+        coordinates = list(glyph.coordinates)
+        on_curve = [flag & 1 for flag in glyph.flags]
+        bounds = None
+        start = 0
+        for end in glyph.endPtsOfContours:
+            end += 1
+            points = coordinates[start:end]
+            flags = on_curve[start:end]
+            start = end
+            if 1 not in flags:
+                # a contour with no on-curve points
+                return _NEEDS_PEN
+            # rotate the contour to end with an on-curve point, this is
+            # where it starts
+            first = flags.index(1) + 1
+            points = points[first:] + points[:first]
+            flags = flags[first:] + flags[:first]
+
+            current = points[-1]
+            if bounds is None:
+                xmin, ymin = xmax, ymax = current
+            else:
+                xmin, ymin, xmax, ymax = bounds
+                x, y = current
+                xmin, ymin = min(xmin, x), min(ymin, y)
+                xmax, ymax = max(xmax, x), max(ymax, y)
+
+            off_curve = []
+            for point, flag in zip(points, flags):
+                if not flag:
+                    off_curve.append(point)
+                    continue
+                if not off_curve:
+                    x, y = point
+                    if x < xmin:
+                        xmin = x
+                    elif x > xmax:
+                        xmax = x
+                    if y < ymin:
+                        ymin = y
+                    elif y > ymax:
+                        ymax = y
+                    current = point
+                    continue
+                off_curve.append(point)
+                for i in range(len(off_curve) - 1):
+                    bcp = off_curve[i]
+                    if i == len(off_curve) - 2:
+                        pt = off_curve[-1]
+                    else:
+                        nx, ny = off_curve[i + 1]
+                        pt = (0.5 * (bcp[0] + nx), 0.5 * (bcp[1] + ny))
+                    x, y = pt
+                    if x < xmin:
+                        xmin = x
+                    elif x > xmax:
+                        xmax = x
+                    if y < ymin:
+                        ymin = y
+                    elif y > ymax:
+                        ymax = y
+                    x, y = bcp
+                    if not (xmin <= x <= xmax and ymin <= y <= ymax):
+                        cxmin, cymin, cxmax, cymax = calcQuadraticBounds(
+                            current, bcp, pt)
+                        xmin, ymin = min(xmin, cxmin), min(ymin, cymin)
+                        xmax, ymax = max(xmax, cxmax), max(ymax, cymax)
+                    current = pt
+                off_curve = []
+            bounds = xmin, ymin, xmax, ymax
+        return bounds
+
+
+# Marks glyphs whose bounds GlyphBounds gets from a BoundsPen.
+_NEEDS_PEN = object()
+
+
 def get_glyph_cleaned_extents_OLD(glyph, glyf_table):
     """Get the vertical extent of glyphs, ignoring single-point contours.
 
@@ -120,15 +291,19 @@ def get_glyph_cleaned_extents_OLD(glyph, glyf_table):
         return min_height, max_height
 
 
+_glyph_bounds_cache = {}
+
+
 def get_glyph_vertical_extents(glyph_id, font_file_name):
     """Returns visible vertical extents given a glyph ID and font name."""
     font = font_caching.open_font(font_file_name)
-    glyf_set = font.getGlyphSet()
-
-    glyph_name = font.getGlyphName(glyph_id)
-    ttglyph = glyf_set[glyph_name]
+    try:
+        glyph_bounds = _glyph_bounds_cache[font_file_name]
+    except KeyError:
+        glyph_bounds = GlyphBounds(font)
+        _glyph_bounds_cache[font_file_name] = glyph_bounds
 
-    return get_glyph_cleaned_extents(ttglyph, glyf_set)
+    return glyph_bounds.vertical_extents(font.getGlyphName(glyph_id))
 
 
 # FIXME: figure out how to make this configurable
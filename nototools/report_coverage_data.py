@@ -23,6 +23,8 @@ import sys
 
 from nototools import cmap_data
 from nototools import coverage
+from nototools.codepoint_set import CodepointBitmap
+from nototools.codepoint_set import CodepointSet
 from nototools import generate_coverage_data
 from nototools import tool_utils
 from nototools import unicode_data
@@ -44,26 +46,31 @@ def get_coverages(coverage_files):
 
 
 def get_block_data(defined_cps, coverages, no_empty=False):
-  block_data = []
-  covered_cps_list = [
-      tool_utils.parse_int_ranges(cov.cmapdata.ranges)
-      for cov in coverages]
+  """Return a list of (start, end, block name, defined count, covered counts)
+  for each block with defined cps, where covered counts has the number of
+  defined cps in the block covered by each coverage.  Each set is converted
+  to a bitmap once, and the counts are popcounts over the block ranges."""
+  defined_set = CodepointSet(defined_cps)
+  blocks = []
   for block_name in unicode_data.block_names():
-    block_range = unicode_data.block_range(block_name)
-    block_cps = unicode_data.block_chars(block_name)
-    block_cps &= defined_cps
-    if not block_cps:
+    start, end = unicode_data.block_range(block_name)
+    blocks.append((start, end, block_name))
+  block_limits = [(start, end + 1) for start, end, _ in blocks]
+  defined_counts = CodepointBitmap(defined_set).count_ranges(block_limits)
+  covered_counts_list = [
+      CodepointBitmap(
+          CodepointSet.from_range_string(cov.cmapdata.ranges) & defined_set)
+      .count_ranges(block_limits)
+      for cov in coverages]
+
+  block_data = []
+  for i, (start, end, block_name) in enumerate(blocks):
+    if not defined_counts[i]:
       continue
-    cov_info = []
-    all_empty = True
-    for covered_cps in covered_cps_list:
-      block_covered_cps = covered_cps & block_cps
-      if block_covered_cps:
-        all_empty = False
-      cov_info.append(block_covered_cps)
-    if no_empty and all_empty:
+    cov_info = [covered_counts[i] for covered_counts in covered_counts_list]
+    if no_empty and not any(cov_info):
       continue
-    block_data.append(block_range + (block_name, block_cps, cov_info))
+    block_data.append((start, end, block_name, defined_counts[i], cov_info))
   return block_data
 
 
@@ -111,12 +118,11 @@ def write_block_coverage_html(block_data, names, msg, out_file=sys.stdout):
     out_file.write('<th>Count<th>Pct<th>Chart')
   out_file.write('\n')
 
-  max_block_size = max(len(t[3]) for t in block_data)
+  max_block_size = max(t[3] for t in block_data)
   if max_block_size > cp_limit:
     max_block_size = cp_limit
-  for start, end, name, block_cps, block_covered_cps_list in block_data:
+  for start, end, name, num_in_block, num_covered_list in block_data:
     range_str = '%04x-%04x' % (start, end)
-    num_in_block = len(block_cps)
     tot_ht = 1 + int(math.floor(float(num_in_block) / cp_limit))
     tot_px = int(float(chart_width) * num_in_block / max_block_size / tot_ht)
     vir_cp_limit = int(float(num_in_block) / tot_ht)
@@ -124,8 +130,7 @@ def write_block_coverage_html(block_data, names, msg, out_file=sys.stdout):
     out_file.write('<td class="range">%s' % range_str)
     out_file.write('<td class="name">%s' % name)
     out_file.write('<td class="count">%s' % num_in_block)
-    for block_covered_cps in block_covered_cps_list:
-      num_covered = len(block_covered_cps)
+    for num_covered in num_covered_list:
       pct = '%d%%' % int(100.0 * num_covered / num_in_block)
       bar_ht = min(
           tot_ht, 1 + int(math.floor(float(num_covered) / vir_cp_limit)))
@@ -154,13 +159,11 @@ def write_block_coverage_text(block_data, names, msg, out_file=sys.stdout):
   for fmt, name in zip(header_fmts, names):
     header_parts.append(fmt % name)
   print >> out_file, ' '.join(header_parts)
-  for start, end, name, block_cps, block_covered_cps_list in block_data:
+  for start, end, name, num_in_block, num_covered_list in block_data:
     line_parts = []
     range_str = '%04x-%04x' % (start, end)
-    num_in_block = len(block_cps)
     line_parts.append(fmt_str % (range_str, name, num_in_block))
-    for fmt, covered_cps in zip(header_fmts, block_covered_cps_list):
-      num_covered = len(covered_cps)
+    for fmt, num_covered in zip(header_fmts, num_covered_list):
       pct = '%d%%' % int(100.0 * num_covered / num_in_block)
       part_str = '%5d %4s' % (num_covered, pct)
       line_parts.append(fmt % part_str)
@@ -177,12 +180,10 @@ def write_block_coverage_csv(block_data, names, msg, out_file=sys.stdout):
     headers.append(name + ' count')
     headers.append(name + ' pct')
   csv_writer.writerow(headers)
-  for start, end, name, block_cps, block_covered_cps_list in block_data:
+  for start, end, name, num_in_block, num_covered_list in block_data:
     range_str = '%04x-%04x' % (start, end)
-    num_in_block = len(block_cps)
     row_parts = [range_str, name, num_in_block]
-    for block_covered_cps in block_covered_cps_list:
-      num_covered = len(block_covered_cps)
+    for num_covered in num_covered_list:
       pct = '%d%%' % int(100.0 * num_covered / num_in_block)
       row_parts.append(num_covered)
       row_parts.append(pct)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read the table directory of an sfnt font or of a font in a collection.
+
+Use this instead of a fontTools TTFont to answer questions like whether a
+font has a table, or what the table's length or checksum is.  Only the
+header and the directory are read from the file, and then only the tables
+that are asked for.
+
+The tool api lists the tables of fonts, or benchmarks reading the table
+directory against loading the font with fontTools.
+"""
+
+import argparse
+import struct
+import time
+
+from fontTools import ttLib
+from fontTools.ttLib import sfnt
+
+_TTC_HEADER = struct.Struct('>4sLL')
+_SFNT_HEADER = struct.Struct('>4sH')
+_SFNT_HEADER_SIZE = 12
+_TABLE_ENTRY = '4sLLL'
+_TABLE_ENTRY_SIZE = struct.calcsize('>' + _TABLE_ENTRY)
+
+_SFNT_VERSION_TO_FMT = {
+    '\x00\x01\x00\x00': 'ttf',
+    'true': 'ttf',
+    'OTTO': 'otf',
+}
+
+
+class SfntDirectory(object):
+  """The table directory of an sfnt font, or of one of the fonts in a ttc.
+
+  - num_fonts is the number of fonts in the file, 1 if it is not a ttc.
+  - font_number is the number of the font whose directory this is.
+  - fmt is 'ttf' or 'otf', based on the sfnt version of the font.
+  Tags are the four-character table tags, like 'GSUB' or 'cvt '.
+
+  f is the binary file object of the font, the directory is read from it
+  when this is constructed.  table_data reads from it too, so requires it
+  to be open."""
+
+  def __init__(self, f, font_number=0):
+    self._file = f
+    f.seek(0)
+    header = f.read(_SFNT_HEADER_SIZE)
+    self.num_fonts = 1
+    if header[:4] == 'ttcf':
+      _, _, self.num_fonts = _TTC_HEADER.unpack(header)
+      if not 0 <= font_number < self.num_fonts:
+        raise ValueError('no font %d in collection' % font_number)
+      f.seek(_TTC_HEADER.size + 4 * font_number)
+      offset = f.read(4)
+      if len(offset) < 4:
+        raise ValueError('truncated font collection')
+      f.seek(struct.unpack('>L', offset)[0])
+      header = f.read(_SFNT_HEADER_SIZE)
+    elif font_number != 0:
+      raise ValueError('no font %d in a font that is not a collection' %
+                       font_number)
+    if (len(header) < _SFNT_HEADER_SIZE or
+        header[:4] not in _SFNT_VERSION_TO_FMT):
+      raise ValueError('not an sfnt font')
+    self.font_number = font_number
+    self.fmt = _SFNT_VERSION_TO_FMT[header[:4]]
+
+    num_tables = _SFNT_HEADER.unpack_from(header)[1]
+    data = f.read(num_tables * _TABLE_ENTRY_SIZE)
+    if len(data) < num_tables * _TABLE_ENTRY_SIZE:
+      raise ValueError('truncated table directory')
+    # tag, checksum, offset, length for each table, in directory order.
+    # Directories are small, so tags are looked up by position rather than
+    # building a map.
+    self._values = struct.unpack('>' + _TABLE_ENTRY * num_tables, data)
+    self._tags = self._values[0::4]
+
+  def __contains__(self, tag):
+    return tag in self._tags
+
+  def __len__(self):
+    return len(self._tags)
+
+  def tags(self):
+    """Return the tags of the tables in directory order."""
+    return list(self._tags)
+
+  def entries(self):
+    """Return a list of (tag, offset, length, checksum) for the tables in
+    directory order."""
+    values = self._values
+    return zip(values[0::4], values[2::4], values[3::4], values[1::4])
+
+  def _index(self, tag):
+    try:
+      return 4 * self._tags.index(tag)
+    except ValueError:
+      raise KeyError(tag)
+
+  def entry(self, tag):
+    """Return (offset, length, checksum) of the table, offsets are from the
+    start of the file.  Raises KeyError if there is no such table."""
+    i = self._index(tag)
+    return self._values[i + 2], self._values[i + 3], self._values[i + 1]
+
+  def length(self, tag):
+    return self._values[self._index(tag) + 3]
+
+  def checksum(self, tag):
+    return self._values[self._index(tag) + 1]
+
+  def table_data(self, tag):
+    """Return the data of the table, or None if there is no such table."""
+    if tag not in self._tags:
+      return None
+    i = 4 * self._tags.index(tag)
+    self._file.seek(self._values[i + 2])
+    return self._file.read(self._values[i + 3])
+
+
+def read_directory(filepath, font_number=0):
+  """Return the SfntDirectory of the font in the file.  The file is closed,
+  so table_data can not be used."""
+  with open(filepath, 'rb') as f:
+    return SfntDirectory(f, font_number)
+
+
+def _dump(filepaths):
+  for filepath in filepaths:
+    num_fonts = 1
+    font_number = 0
+    while font_number < num_fonts:
+      with open(filepath, 'rb') as f:
+        directory = SfntDirectory(f, font_number)
+        num_fonts = directory.num_fonts
+        if num_fonts > 1:
+          print '%s [%d] (%s):' % (filepath, font_number, directory.fmt)
+        else:
+          print '%s (%s):' % (filepath, directory.fmt)
+        for tag, offset, length, checksum in directory.entries():
+          print '  %s %8d %8d 0x%08x' % (tag, offset, length, checksum)
+      font_number += 1
+
+
+def _bench(filepaths, tag, count):
+  def directory_probe(filepath):
+    directory = read_directory(filepath)
+    return tag in directory and directory.length(tag)
+
+  def sfnt_reader_probe(filepath):
+    with open(filepath, 'rb') as f:
+      reader = sfnt.SFNTReader(f, fontNumber=0)
+      return tag in reader and reader.tables[tag].length
+
+  def ttlib_probe(filepath):
+    font = ttLib.TTFont(filepath, fontNumber=0, lazy=True)
+    try:
+      return tag in font and font.reader.tables[tag].length
+    finally:
+      font.close()
+
+  print 'probing %d files for %s, best of %d' % (len(filepaths), tag, count)
+  for name, probe in [
+      ('SfntDirectory', directory_probe),
+      ('sfnt.SFNTReader', sfnt_reader_probe),
+      ('ttLib.TTFont', ttlib_probe)]:
+    best = None
+    for _ in range(count):
+      start = time.time()
+      for filepath in filepaths:
+        probe(filepath)
+      elapsed = time.time() - start
+      if best is None or elapsed < best:
+        best = elapsed
+    print '  %-15s %8.1f usec per file' % (
+        name, best * 1e6 / len(filepaths))
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument(
+      'files', help='font files', metavar='file', nargs='+')
+  parser.add_argument(
+      '-b', '--bench', help='time probing the files for a table using the '
+      'directory and using fontTools, best of n runs (default 5)',
+      metavar='n', type=int, nargs='?', const=5)
+  parser.add_argument(
+      '-t', '--tag', help='table to probe for when benchmarking, default '
+      'GSUB', metavar='tag', default='GSUB')
+  args = parser.parse_args()
+
+  if args.bench:
+    _bench(args.files, args.tag.ljust(4), args.bench)
+  else:
+    _dump(args.files)
+
+
+if __name__ == '__main__':
+  main()
@@ -18,11 +18,34 @@
 
 __author__ = 'roozbeh@google.com (Roozbeh Pournader)'
 
+import argparse
+import io
 import sys
 
 from fontTools import subset
+from fontTools import ttLib
 
 import coverage
+from nototools import tool_utils
+
+
+def _create_options(options):
+    opt = subset.Options()
+
+    opt.name_IDs = ['*']
+    opt.name_legacy = True
+    opt.name_languages = ['*']
+    opt.layout_features = ['*']
+    opt.notdef_outline = True
+    opt.recalc_bounds = True
+    opt.recalc_timestamp = True
+    opt.canonical_order = True
+    opt.drop_tables = ['+TTFA']
+
+    if options is not None:
+        for name, value in options.iteritems():
+            setattr(opt, name, value)
+    return opt
 
 
 def subset_font(source_file, target_file,
@@ -46,44 +69,89 @@ def subset_font(source_file, target_file,
     Raises:
       NotImplementedError: Both include and exclude were specified.
     """
-    opt = subset.Options()
+    subset_font_multi(source_file, [(target_file, include, exclude)], options)
 
-    opt.name_IDs = ['*']
-    opt.name_legacy = True
-    opt.name_languages = ['*']
-    opt.layout_features = ['*']
-    opt.notdef_outline = True
-    opt.recalc_bounds = True
-    opt.recalc_timestamp = True
-    opt.canonical_order = True
-    opt.drop_tables = ['+TTFA']
 
-    if options is not None:
-        for name, value in options.iteritems():
-            setattr(opt, name, value)
+def subset_font_multi(source_file, targets, options=None):
+    """Subsets a font file to several character sets, reading it only once.
 
-    if include is not None:
-        if exclude is not None:
-            raise NotImplementedError(
-                'Subset cannot include and exclude a set at the same time.')
-        target_charset = include
-    else:
-        if exclude is None:
-            exclude = []
-        source_charset = coverage.character_set(source_file)
-        target_charset = source_charset - set(exclude)
+    The source is read into memory once and each subset parses only the tables
+    it needs from that copy.  (Deep-copying one fully decompiled font per
+    target is slower than this.)
 
-    font = subset.load_font(source_file, opt)
-    subsetter = subset.Subsetter(options=opt)
-    subsetter.populate(unicodes=target_charset)
-    subsetter.subset(font)
-    subset.save_font(font, target_file, opt)
+    Args:
+      source_file: Input file name.
+      targets: A list of (target_file, include, exclude) tuples, these are
+          interpreted as the corresponding arguments to subset_font.
+      options: A dictionary listing which options should be different from the
+          default.
+
+    Raises:
+      NotImplementedError: Both include and exclude were specified for a
+          target.
+    """
+    opt = _create_options(options)
+    with open(source_file, 'rb') as f:
+        source_data = f.read()
+
+    source_charset = None
+    for target_file, include, exclude in targets:
+        if include is not None:
+            if exclude is not None:
+                raise NotImplementedError(
+                    'Subset cannot include and exclude a set at the same '
+                    'time.')
+            target_charset = include
+        else:
+            if source_charset is None:
+                source_charset = coverage.character_set(
+                    ttLib.TTFont(io.BytesIO(source_data), fontNumber=0))
+            target_charset = source_charset - set(exclude or [])
+
+        source = io.BytesIO(source_data)
+        source.name = source_file
+        font = subset.load_font(source, opt)
+        subsetter = subset.Subsetter(options=opt)
+        subsetter.populate(unicodes=target_charset)
+        subsetter.subset(font)
+        subset.save_font(font, target_file, opt)
+        font.close()
+
+
+def _subset_font_multi(args):
+    """Process pool adapter for subset_font_multi."""
+    subset_font_multi(*args)
+
+
+def subset_fonts(jobs, processes=None):
+    """Subsets many font files using a pool of processes.
+
+    Args:
+      jobs: A list of (source_file, targets, options) tuples, these are
+          interpreted as the corresponding arguments to subset_font_multi.
+      processes: The number of processes to use, by default one per cpu.
+    """
+    tool_utils.parallel_map(_subset_font_multi, jobs, processes)
 
 
 def main(argv):
     """Subset the first argument to second, dropping unused parts of the font.
+    More source and target pairs can follow, these are subsetted in parallel.
     """
-    subset_font(argv[1], argv[2])
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-p', '--processes', help='number of processes to use (default one '
+        'per cpu)', type=int, metavar='n')
+    parser.add_argument(
+        'files', help='source and target file pairs', nargs='+',
+        metavar='source target')
+    args = parser.parse_args(argv[1:])
+    if len(args.files) % 2:
+        parser.error('files must be source and target pairs')
+
+    pairs = zip(args.files[::2], args.files[1::2])
+    subset_fonts([(source_file, [(target_file, None, None)], None)
+                  for source_file, target_file in pairs], args.processes)
 
 
 if __name__ == '__main__':
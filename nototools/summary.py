@@ -22,12 +22,19 @@ import argparse
 import os
 import os.path
 import re
-import sys
+import struct
 
 from fontTools import ttLib
 
+import codepoint_set
+import coverage
 import noto_lint
 import font_data
+import sfnt_directory
+import tool_utils
+
+# Bump this if the format of the cached summaries changes.
+SUMMARY_CACHE_VERSION = 1
 
 def get_largest_cmap(font):
   cmap_table = font['cmap']
@@ -46,7 +53,65 @@ def get_largest_cmap(font):
 def cmap_count(font):
   return len(get_largest_cmap(font))
 
+def _read_name_records(data):
+  """Return the Windows English (3, 1, 0x409) name records in the raw name
+  table data as a map from name id to unicode, like
+  font_data.get_name_records."""
+  _, count, string_offset = struct.unpack('>3H', data[:6])
+  names = {}
+  for i in range(count):
+    platform_id, enc_id, lang_id, name_id, length, offset = struct.unpack(
+        '>6H', data[6 + i * 12:18 + i * 12])
+    if (platform_id, enc_id, lang_id) != (3, 1, 0x409):
+      continue
+    start = string_offset + offset
+    names[name_id] = unicode(data[start:start + length], 'UTF-16BE')
+  return names
+
+
+def _printable_revision(fixed_revision, accuracy=2):
+  """Like noto_lint.printable_font_revision, but from the raw 16.16 fixed
+  value of head.fontRevision."""
+  font_revision = fixed_revision / 65536.0
+  font_revision_int = int(font_revision)
+  font_revision_frac = int(
+      round((font_revision - font_revision_int) * 10 ** accuracy))
+  return '%d.%s' % (
+      font_revision_int, str(font_revision_frac).zfill(accuracy))
+
+
+def _summarize_font_data(path):
+  """Return the summary fields of the font at path that do not depend on where
+  it is in the tree: version, full_name, size, num_glyphs, num_chars, cmap,
+  and table_info.  Rather than loading the font with fontTools, this reads the
+  table directory and decodes only the head, maxp, name, and cmap tables."""
+  with open(path, 'rb') as f:
+    directory = sfnt_directory.SfntDirectory(f)
+    table_info = {
+        tag: (length, checksum)
+        for tag, _, length, checksum in directory.entries()}
+    names = _read_name_records(directory.table_data('name'))
+    num_glyphs = struct.unpack('>H', directory.table_data('maxp')[4:6])[0]
+    cmap = set(coverage.cmap_table_ranges(directory.table_data('cmap')))
+    # See summarize_file_with_ttlib for why the name table version is
+    # preferred.
+    match = re.match(r'Version (\d+\.\d+)', names[5])
+    if match:
+      version = match.group(1)
+    else:
+      version = _printable_revision(struct.unpack(
+          '>l', directory.table_data('head')[4:8])[0])
+  size = os.path.getsize(path)
+  return (version, names[4], size, num_glyphs, len(cmap), cmap, table_info)
+
+
 def summarize_file(root, path):
+  relpath = path[len(root) + 1:]
+  return (relpath,) + _summarize_font_data(path)
+
+
+def summarize_file_with_ttlib(root, path):
+  """Like summarize_file, but loads the font with fontTools."""
   font = ttLib.TTFont(path)
   table_info = {}
   reader = font.reader
@@ -79,8 +144,18 @@ def summarize_file(root, path):
 
   return (relpath, version, full_name, size, num_glyphs, num_chars, cmap, table_info)
 
-def summarize(root, name=None):
-  result = []
+
+def summarize(root, name=None, cache_path=None, processes=None):
+  """Return the summaries of the .ttf and .otf files under root in walk order,
+  see summarize_file.  If name is provided, only files whose path under root
+  matches the name regex are summarized.  Files are read in a pool of
+  processes (default one per cpu).
+
+  If cache_path is provided, it names a cache of summaries keyed by the hash
+  of the file, so files unchanged since the cache was written, including
+  copies of the same file in another tree, are not summarized again.  The
+  cache is updated afterwards."""
+  paths = []
   name_re = re.compile(name) if name else None
   for parent, _, files in os.walk(root):
     for f in sorted(files):
@@ -90,8 +165,43 @@ def summarize(root, name=None):
           relpath = path[len(root) + 1:]
           if not name_re.search(relpath):
             continue
-        result.append(summarize_file(root, path))
-  return result
+        paths.append(path)
+
+  if not cache_path:
+    font_data_list = tool_utils.parallel_map(
+        _summarize_font_data, paths, processes)
+  else:
+    # Hashing and summarizing each read the file, so without a cache
+    # hashing first would only add work.  With a cache we hash first and
+    # summarize only the misses.
+    # The cmaps are cached as CodepointSets, which are much smaller.
+    cache = tool_utils.read_cache(cache_path, SUMMARY_CACHE_VERSION)
+    hashes = tool_utils.parallel_map(tool_utils.file_hash, paths, processes)
+    todo = {}
+    for path, file_hash in zip(paths, hashes):
+      if file_hash not in cache:
+        todo[file_hash] = path
+    if todo:
+      todo_hashes = sorted(todo)
+      computed = tool_utils.parallel_map(
+          _summarize_font_data, [todo[h] for h in todo_hashes], processes)
+      for file_hash, font_data_tuple in zip(todo_hashes, computed):
+        version, full_name, size, num_glyphs, num_chars, cmap, table_info = (
+            font_data_tuple)
+        cache[file_hash] = (
+            version, full_name, size, num_glyphs, num_chars,
+            codepoint_set.CodepointSet(cmap), table_info)
+      tool_utils.write_cache(cache_path, SUMMARY_CACHE_VERSION, cache)
+    font_data_list = []
+    for h in hashes:
+      version, full_name, size, num_glyphs, num_chars, cmap, table_info = (
+          cache[h])
+      font_data_list.append((
+          version, full_name, size, num_glyphs, num_chars, set(cmap),
+          table_info))
+
+  return [(path[len(root) + 1:],) + font_data_tuple
+          for path, font_data_tuple in zip(paths, font_data_list)]
 
 
 def print_tup(tup, short):
@@ -121,12 +231,18 @@ def print_summary(summary_list, short):
     print_tup(tup, short)
 
 def main():
+    default_cache = '/tmp/summary/summary_cache.pkl'
     parser = argparse.ArgumentParser()
     parser.add_argument('root', help='root of directory tree')
     parser.add_argument('--name', help='only report files where name regex matches '
                         'some portion of the path under root'),
     parser.add_argument('-s', '--short', help='shorter summary format',
                         action='store_true')
+    parser.add_argument('--cache_file', help='cache of summaries keyed by file '
+                        'hash (default %s), \'-\' for no cache' % default_cache,
+                        metavar='file', default=default_cache)
+    parser.add_argument('-p', '--processes', help='number of processes to use, '
+                        'default one per cpu', metavar='n', type=int)
     args = parser.parse_args()
 
     if not os.path.isdir(args.root):
@@ -134,7 +250,10 @@ def main():
     else:
       root = os.path.abspath(args.root)
       print "root: %s, name: %s" % (root, args.name if args.name else '[all]')
-      print_summary(summarize(root, name=args.name), args.short)
+      print_summary(summarize(
+          root, name=args.name,
+          cache_path=tool_utils.resolve_path(args.cache_file),
+          processes=args.processes), args.short)
 
 if __name__ == "__main__":
     main()
@@ -14,14 +14,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Swat copyright, bump version."""
+"""Swat copyright, bump version.
+
+Fonts can be processed by a pool of worker processes (-j).  Each font that
+is done is recorded in a journal in the destination root, with the changes
+made to it, so a run that is interrupted can be continued with --resume,
+which skips the recorded fonts and includes their changes in the summary.
+
+Only the tables that are changed are compiled when a font is written, the
+others are copied from the source font."""
 
 
 import argparse
 import collections
+import json
+import multiprocessing
 import os
 from os import path
 import re
+import StringIO
+import sys
 
 from nototools import autofix_for_release
 from nototools import cldr_data
@@ -82,7 +94,22 @@ _FAMILY_KEYS = {
 
 _HINTED_TABLES_TO_DROP = autofix_for_release.TABLES_TO_DROP
 _UNHINTED_TABLES_TO_DROP = (autofix_for_release.TABLES_TO_DROP +
-                            ['fpgm', 'prep', 'cvt'])
+                            ['fpgm', 'prep', 'cvt '])
+
+# Tables that the autofix functions change when they report a change.
+# Dropping hints changes the glyphs, so the tables recalculated from the
+# glyphs when they are compiled change too.
+_AUTOFIX_TABLES = {
+    'fstype': ['OS/2'],
+    'vendor_id': ['OS/2'],
+    'attachlist': ['GDEF'],
+    'drop_hints': ['glyf', 'loca', 'maxp', 'hhea'],
+    'drop_tables': [],
+    'linegap': ['hhea', 'vhea', 'OS/2'],
+    'os2_unicoderange': ['OS/2'],
+}
+
+_JOURNAL_NAME = 'swat_journal.jsonl'
 
 _changes = {}
 
@@ -90,7 +117,7 @@ _autofix = collections.defaultdict(list)
 
 _ttc_fonts = {}
 
-def _swat_fonts(dst_root, dry_run):
+def _swat_fonts(dst_root, dry_run, processes=1, resume=False):
   def family_key(family):
       return _FAMILY_KEYS.get(family, 'x' + family)
   def script_key(script):
@@ -107,11 +134,116 @@ def _swat_fonts(dst_root, dry_run):
             font.slope or '',
             font.fmt)
   fonts = noto_fonts.get_noto_fonts()
+
+  journal_file = path.join(dst_root, _JOURNAL_NAME)
+  done = _read_journal(journal_file) if resume else {}
+  if done:
+    print 'Resuming, %d fonts are already done' % len(done)
+  for filepath, record in done.iteritems():
+    _record_result(filepath, record)
+
+  todo = []
   for font in sorted(fonts, key=compare_key):
-    _swat_font(font, dst_root, dry_run)
+    basename = path.basename(font.filepath)
+    if font.is_cjk:
+      print '# Skipping cjk font %s' % basename
+    elif font.fmt == 'ttc':
+      print '# Deferring ttc font %s' % basename
+      _ttc_fonts[font] = ttc_utils.ttcfile_filenames(font.filepath)
+    elif font.filepath not in done:
+      todo.append(font)
+
+  journal = None
+  if not dry_run:
+    if not path.isdir(dst_root):
+      os.makedirs(dst_root)
+    journal = open(journal_file, 'a' if resume else 'w')
+  try:
+    for filepath, result in _swat_font_results(
+        todo, dst_root, dry_run, processes):
+      _record_result(filepath, result)
+      if journal:
+        _write_journal(journal, filepath, result)
+
+    if _ttc_fonts:
+      _construct_ttc_fonts(fonts, dst_root, dry_run, done, journal)
+  finally:
+    if journal:
+      journal.close()
+
+
+def _swat_font_results(fonts, dst_root, dry_run, processes):
+  """Yield the file path and _swat_font result for each font.  If processes
+  is not 1 the fonts are processed by a pool of processes, one per cpu if
+  processes is None, and results are yielded as they finish."""
+  if processes == 1 or len(fonts) < 2:
+    for font in fonts:
+      yield font.filepath, _swat_font(font, dst_root, dry_run)
+    return
+
+  pool = multiprocessing.Pool(processes)
+  try:
+    for filepath, output, result in pool.imap_unordered(
+        _swat_font_worker, [(font, dst_root, dry_run) for font in fonts]):
+      sys.stdout.write(output)
+      yield filepath, result
+  finally:
+    pool.terminate()
+    pool.join()
+
+
+def _swat_font_worker(args):
+  """Run _swat_font in a pool process, returning the file path, what it
+  printed, and its result.  The output is collected so that the output of
+  fonts processed at the same time is not interleaved."""
+  noto_font, dst_root, dry_run = args
+  output = StringIO.StringIO()
+  stdout = sys.stdout
+  sys.stdout = output
+  try:
+    result = _swat_font(noto_font, dst_root, dry_run)
+  finally:
+    sys.stdout = stdout
+  return noto_font.filepath, output.getvalue(), result
 
-  if _ttc_fonts:
-    _construct_ttc_fonts(fonts, dst_root, dry_run)
+
+def _record_result(filepath, result):
+  """Add the changes and autofixes in the result of _swat_font for the font
+  at filepath to the totals reported by main."""
+  if not result:
+    return
+  changes, autofixes = result
+  for label, new, old in changes:
+    _changes.setdefault(label, {}).setdefault(new, {}).setdefault(
+        old, []).append(filepath)
+  for fix_key in autofixes:
+    _autofix[fix_key].append(filepath)
+
+
+def _read_journal(journal_file):
+  """Return a map from the file path of each font recorded as done in the
+  journal to its result.  A partly written last line is ignored."""
+  done = {}
+  if not path.exists(journal_file):
+    return done
+  with open(journal_file, 'r') as f:
+    for line in f:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        continue
+      result = record['result']
+      if result is not None:
+        changes, autofixes = result
+        result = ([tuple(change) for change in changes], autofixes)
+      done[record['filepath']] = result
+  return done
+
+
+def _write_journal(journal, filepath, result):
+  journal.write(json.dumps({'filepath': filepath, 'result': result}) + '\n')
+  journal.flush()
+  os.fsync(journal.fileno())
 
 
 def _noto_relative_path(filepath):
@@ -180,16 +312,24 @@ def get_bumped_version(ttfont, is_hinted=None):
   return float_revision, new_version_string
 
 
+def _save_changed_tables(ttfont, filepath, changed_tables):
+  """Save ttfont to filepath, compiling only the changed tables.  Tables
+  that were loaded only to check them are copied from the source font."""
+  for tag in list(ttfont.tables):
+    if tag not in changed_tables and tag != 'GlyphOrder':
+      del ttfont.tables[tag]
+  for tag in changed_tables:
+    if tag in ttfont:
+      ttfont[tag]  # load it so that it is compiled
+  ttfont.save(filepath)
+
+
 def _swat_font(noto_font, dst_root, dry_run):
+  """Bump the version of a non-cjk, non-ttc font and fix its name records,
+  writing it under dst_root unless dry_run is true.  Returns None if the
+  version could not be bumped, else a list of the (label, new, old) name
+  changes and a list of the autofix keys of the fixes applied."""
   filepath = noto_font.filepath
-  basename = path.basename(filepath)
-  if noto_font.is_cjk:
-    print '# Skipping cjk font %s' % basename
-    return
-  if noto_font.fmt == 'ttc':
-    print '# Deferring ttc font %s' % basename
-    _ttc_fonts[noto_font] = ttc_utils.ttcfile_filenames(filepath)
-    return
 
   ttfont = ttLib.TTFont(filepath, fontNumber=0)
 
@@ -213,6 +353,9 @@ def _swat_font(noto_font, dst_root, dry_run):
 
   print '%s: %s' % ('Would write' if dry_run else 'Writing', dst_file)
 
+  changes = []
+  autofixes = []
+
   new_trademark = "%s is a trademark of Google Inc." % noto_font.family
 
   # description field should be set.
@@ -287,20 +430,7 @@ def _swat_font(noto_font, dst_root, dry_run):
       oldText = '\'%s\'' % old if old else 'None'
       newText = newText or ('\'%s\'' % new)
       print '%s:\n  old: %s\n  new: %s' % (label, oldText, newText or new)
-
-      label_change = _changes.get(label)
-      if not label_change:
-        label_change = {}
-        _changes[label] = label_change
-      new_val_change = label_change.get(new)
-      if not new_val_change:
-        new_val_change = {}
-        label_change[new] = new_val_change
-      old_val_fonts = new_val_change.get(old)
-      if not old_val_fonts:
-        old_val_fonts = []
-        new_val_change[old] = old_val_fonts
-      old_val_fonts.append(noto_font.filepath)
+      changes.append((label, new, old))
 
   update(_COPYRIGHT_ID, new_copyright)
   update(_VERSION_ID, new_version_string)
@@ -314,38 +444,43 @@ def _swat_font(noto_font, dst_root, dry_run):
   update(_LICENSE_URL_ID, _SIL_LICENSE_URL)
 
   if autofix_for_release.fix_fstype(ttfont):
-    _autofix['fstype'].append(noto_font.filepath)
+    autofixes.append('fstype')
   if autofix_for_release.fix_vendor_id(ttfont):
-    _autofix['vendor_id'].append(noto_font.filepath)
+    autofixes.append('vendor_id')
   if autofix_for_release.fix_attachlist(ttfont):
-    _autofix['attachlist'].append(noto_font.filepath)
+    autofixes.append('attachlist')
   if noto_font.is_hinted:
     tables_to_drop = _HINTED_TABLES_TO_DROP
   else:
     tables_to_drop = _UNHINTED_TABLES_TO_DROP
     if autofix_for_release.drop_hints(ttfont):
-      _autofix['drop_hints'].append(noto_font.filepath)
+      autofixes.append('drop_hints')
   if autofix_for_release.drop_tables(ttfont, tables_to_drop):
-    _autofix['drop_tables'].append(noto_font.filepath)
+    autofixes.append('drop_tables')
   if noto_font.family == 'Noto':
     if autofix_for_release.fix_linegap(ttfont):
-      _autofix['linegap'].append(noto_font.filepath)
+      autofixes.append('linegap')
   if autofix_for_release.fix_os2_unicoderange(ttfont):
-    _autofix['os2_unicoderange'].append(noto_font.filepath)
+    autofixes.append('os2_unicoderange')
 
   if dry_run:
-    return
+    return changes, autofixes
+
+  ttfont['head'].fontRevision = new_revision
 
-  ttfont['head'].fontRevision = float_revision
+  changed_tables = set(['name', 'head'])
+  for fix_key in autofixes:
+    changed_tables.update(_AUTOFIX_TABLES[fix_key])
 
   dst_dir = path.dirname(dst_file)
   if not path.isdir(dst_dir):
     os.makedirs(dst_dir)
-  ttfont.save(dst_file)
+  _save_changed_tables(ttfont, dst_file, changed_tables)
   print 'Wrote file.'
+  return changes, autofixes
 
 
-def _construct_ttc_fonts(fonts, dst_root, dry_run):
+def _construct_ttc_fonts(fonts, dst_root, dry_run, done, journal):
   # _ttc_fonts contains a map from a font path to a list of likely names
   # of the component fonts.  The component names are based off the
   # postscript name in the name table of the component, so 1) might not
@@ -363,6 +498,8 @@ def _construct_ttc_fonts(fonts, dst_root, dry_run):
       basename_to_fonts[basename].append(font)
 
   for ttcfont, components in sorted(_ttc_fonts.iteritems()):
+    if ttcfont.filepath in done:
+      continue
     rel_filepath = _noto_relative_path(ttcfont.filepath)
     print '-----\nBuilding %s' % rel_filepath
 
@@ -406,6 +543,8 @@ def _construct_ttc_fonts(fonts, dst_root, dry_run):
                  for font in component_list]
     ttc_utils.build_ttc(dst_ttc, src_files)
     print 'Built %s' % dst_ttc
+    if journal:
+      _write_journal(journal, ttcfont.filepath, None)
 
 
 def main():
@@ -417,9 +556,17 @@ def main():
                       metavar='dst', default='/tmp/swat')
   parser.add_argument('--details', help='show change details',
                       action='store_true')
+  parser.add_argument('-j', '--processes',
+                      help='number of processes used to swat fonts, '
+                      'default 1, 0 for one per cpu', type=int, metavar='n',
+                      default=1)
+  parser.add_argument('--resume', help='skip fonts the journal in dst '
+                      'records as done by an earlier run',
+                      action='store_true')
   args = parser.parse_args()
 
-  _swat_fonts(args.dst_root, args.dry_run)
+  _swat_fonts(args.dst_root, args.dry_run, args.processes or None,
+              args.resume)
 
   print '------\nchange summary\n'
   for name_key in sorted(_changes):
@@ -16,8 +16,11 @@
 
 import codecs
 import contextlib
+import cPickle
 import glob
+import hashlib
 import logging
+import multiprocessing
 import os
 import os.path as path
 import re
@@ -27,6 +30,7 @@ import sys
 import time
 import zipfile
 
+from nototools import codepoint_set
 from nototools import notoconfig
 
 @contextlib.contextmanager
@@ -397,6 +401,10 @@ def parse_int_ranges(
   '-' generates the range of intervening characters as before, while '/' does
   not.  Returns a set or a list depending on return_set.
 
+  Uncompressed ranges returned as a set are parsed by
+  CodepointSet.from_range_string, so they are not expanded into a list and
+  checked for duplicates value by value.
+
   For example, with compressed ranges the following:
     1ee42/7/9/b/d-f 1ee51-2/4/7/9/b/d/f
 
@@ -488,6 +496,11 @@ def parse_int_ranges(
   if not allow_compressed and '/' != sep and range_string.find('/') != -1:
     raise ValueError('\'/\' only allowed in compressed range format')
 
+  if not allow_compressed and return_set:
+    return set(codepoint_set.CodepointSet.from_range_string(
+        range_string, is_hex=is_hex, sep=sep,
+        allow_overlaps=allow_duplicates))
+
   # collect ordered list of values
   for r in range_string.split(sep):
     _add_range(r)
@@ -514,33 +527,9 @@ def write_int_ranges(int_values, in_hex=True, sep=' '):
   parsed by parse_int_ranges to return the original values (not
   order_preserving)."""
 
-  if not int_values:
-    return ''
-
-  num_list = []
-
-  if type(int_values) is not list:
-    int_values = [v for v in int_values]
-  int_values.sort()
-  start = prev = int_values[0]
-  single_fmt = '%04x' if in_hex else '%d'
-  pair_fmt = single_fmt + '-' + single_fmt
-
-  def emit():
-    if prev == start:
-      num_list.append(single_fmt % prev)
-    else:
-      num_list.append(pair_fmt % (start, prev))
-
-  for v in int_values[1:]:
-    if v == prev + 1:
-      prev += 1
-      continue
-    else:
-      emit()
-    start = prev = v
-  emit()
-  return sep.join(num_list)
+  if not isinstance(int_values, codepoint_set.CodepointSet):
+    int_values = codepoint_set.CodepointSet(int_values)
+  return int_values.to_range_string(in_hex, sep)
 
 
 def setup_logging(loglevel, quiet_ttx=True):
@@ -594,6 +583,65 @@ def read_lines(infile, ignore_comments=True, strip=True, skip_empty=True):
   return lines
 
 
+def file_hash(filepath, blocksize=1 << 16):
+  """Return the sha1 hex digest of the contents of filepath."""
+  h = hashlib.sha1()
+  with open(filepath, 'rb') as f:
+    while True:
+      block = f.read(blocksize)
+      if not block:
+        break
+      h.update(block)
+  return h.hexdigest()
+
+
+def read_cache(cachepath, version):
+  """Return the dict pickled in cachepath by write_cache.  If the file does not
+  exist, cannot be read, or was written with a different version, return an
+  empty dict.  Callers bump the version when the format of the cached values
+  changes."""
+  if not cachepath or not path.isfile(cachepath):
+    return {}
+  try:
+    with open(cachepath, 'rb') as f:
+      cache_version, data = cPickle.load(f)
+  except Exception as e:
+    logging.warning('could not read cache %s: %s', cachepath, e)
+    return {}
+  if cache_version != version:
+    logging.info('ignoring cache %s, version %s is not %s',
+                 cachepath, cache_version, version)
+    return {}
+  return data
+
+
+def write_cache(cachepath, version, data):
+  """Pickle the dict data with its version to cachepath.  The data is first
+  written to a temporary file and then renamed so that an interrupted run
+  does not leave a truncated cache."""
+  ensure_dir_exists(path.dirname(path.abspath(cachepath)))
+  tmppath = cachepath + '.tmp'
+  with open(tmppath, 'wb') as f:
+    cPickle.dump((version, data), f, cPickle.HIGHEST_PROTOCOL)
+  os.rename(tmppath, cachepath)
+
+
+def parallel_map(fn, items, processes=None):
+  """Return the list [fn(item) for item in items], computed using a pool of
+  processes.  fn and the items must be picklable, so fn must be a module-level
+  function.  If processes is 1 or there are fewer than two items, run in this
+  process.  If processes is None, use one process per cpu."""
+  items = list(items)
+  if processes == 1 or len(items) < 2:
+    return [fn(item) for item in items]
+  pool = multiprocessing.Pool(processes)
+  try:
+    return pool.map(fn, items)
+  finally:
+    pool.close()
+    pool.join()
+
+
 def _read_filename_list(filenames):
   with open(filenames, 'r') as f:
     return [resolve_path(n.strip()) for n in f if n]
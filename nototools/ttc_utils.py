@@ -18,6 +18,7 @@
 
 import argparse
 import collections
+from io import BytesIO
 import os
 from os import path
 import struct
@@ -25,17 +26,12 @@ import subprocess
 
 from fontTools.ttLib.tables._n_a_m_e import table__n_a_m_e as NameTable
 
+from nototools import sfnt_directory
 from nototools import tool_utils
 
 _ttcHeader = '>4sLL'
 _ttcHeaderSize = struct.calcsize(_ttcHeader)
 
-_sfntHeader = '>LHHHH'
-_sfntHeaderSize = struct.calcsize(_sfntHeader)
-
-_sfntHeaderEntry = '>4sLLL'
-_sfntHeaderEntrySize = struct.calcsize(_sfntHeaderEntry)
-
 FontEntry = collections.namedtuple('FontEntry', 'fmt,tables')
 TableEntry = collections.namedtuple('TableEntry', 'tag,offset,length')
 
@@ -70,40 +66,19 @@ class TTCFile(object):
 
     self.fonts = []
     self.tables = []
+    # map from TableEntry to its index in tables
+    table_indices = {}
+    stream = BytesIO(data)
     for i in range(font_count):
-      pos = _ttcHeaderSize + i * 4
-      offset = struct.unpack('>L', data[pos:pos + 4])[0]
-      self._build_font_entry(data, offset)
-
-  def _build_font_entry(self, data, offset):
-    limit = offset + _sfntHeaderSize
-    version, num_tables = struct.unpack(_sfntHeader, data[offset:limit])[:2]
-    if version == 0x10000:
-      version_str = '1.0'
-      font_fmt = 'ttf'
-    elif version == 0x4f54544f:
-      version_str = 'OTTO'
-      font_fmt = 'otf'
-    else:
-      raise ValueError('unrecognized sfnt version %x' % version)
-
-    font_table_indices = []
-    for j in range(num_tables):
-      entry_pos = limit + j * _sfntHeaderEntrySize
-      font_table_indices.append(self._build_table_entry(data, entry_pos))
-
-    self.fonts.append(FontEntry(font_fmt, font_table_indices))
-
-  def _build_table_entry(self, data, offset):
-    limit = offset + _sfntHeaderEntrySize
-    tag, checksum, offset, length = struct.unpack(
-        _sfntHeaderEntry, data[offset:limit])
-    entry = TableEntry(tag, offset, length)
-    for i, e in enumerate(self.tables):
-      if e == entry:
-        return i
-    self.tables.append(entry)
-    return len(self.tables) - 1
+      directory = sfnt_directory.SfntDirectory(stream, i)
+      font_table_indices = []
+      for tag, offset, length, _ in directory.entries():
+        entry = TableEntry(tag, offset, length)
+        if entry not in table_indices:
+          table_indices[entry] = len(self.tables)
+          self.tables.append(entry)
+        font_table_indices.append(table_indices[entry])
+      self.fonts.append(FontEntry(directory.fmt, font_table_indices))
 
 
 def ttcfile_dump(ttcfile):
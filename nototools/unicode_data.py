@@ -27,6 +27,7 @@ __author__ = (
     "roozbeh@google.com (Roozbeh Pournader) and "
     "cibu@google.com (Cibu Johny)")
 
+import array
 import codecs
 import collections
 import os
@@ -54,6 +55,8 @@ _decomposition_data = {}
 _bidi_mirroring_characters = set()
 _script_data = {}
 _script_extensions_data = {}
+_script_index = None  # built on demand, see _load_script_index
+_script_index_codes = None
 _block_data = {}
 _block_range = {}
 _block_names = []
@@ -216,6 +219,47 @@ def script(char):
     return "Zzzz"  # Unknown
 
 
+def _load_script_index():
+  """Build an array mapping each code point to the index of its script in
+  _script_index_codes.  Index 0 is 'Zzzz'."""
+  global _script_index, _script_index_codes
+  if _script_index is not None:
+    return
+  load_data()
+  codes = ['Zzzz'] + sorted(set(_script_data.values()) - set(['Zzzz']))
+  code_to_index = {code: i for i, code in enumerate(codes)}
+  index = array.array('B', [0]) * 0x110000
+  for cp, code in _script_data.iteritems():
+    index[cp] = code_to_index[code]
+  _script_index_codes = codes
+  _script_index = index
+
+
+def script_histogram(text, exclusions=None):
+  """Returns a map from script code to a list of the count of characters in
+  text with that script and the set of those characters.  This is equivalent
+  to calling script() on each character of text, but is much faster on long
+  strings since the script is only looked up once per distinct character.
+  Characters whose code points are in exclusions are not counted."""
+  _load_script_index()
+  index = _script_index
+  codes = _script_index_codes
+  result = {}
+  for char in set(text):
+    cp = ord(char)
+    if exclusions and cp in exclusions:
+      continue
+    code = codes[index[cp]]
+    count = text.count(char)
+    if code in result:
+      data = result[code]
+      data[0] += count
+      data[1].add(char)
+    else:
+      result[code] = [count, set([char])]
+  return result
+
+
 def script_extensions(char):
   """Returns the script extensions property of a character.
 
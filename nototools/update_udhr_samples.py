@@ -436,9 +436,11 @@ def get_code_to_attrib(src_dir):
   return code_to_attrib
 
 
-def get_bcp_to_code_attrib_sample(src_dir, ohchr_dir):
+def get_bcp_to_code_attrib_sample(
+    src_dir, ohchr_dir, cache_path=None, processes=None):
   """Return a mapping from bcp47 to code (for debugging), attribution, and
-  sample.  The process is:
+  sample.  See get_code_to_sample for cache_path and processes.
+  The process is:
   1) parse the index.xml file to determine a mapping from bcp47 to code.
      the bcp47 code has at least lang and script, and perhaps region/variant.
      Multiple codes might share the same bcp47 code.
@@ -457,7 +459,8 @@ def get_bcp_to_code_attrib_sample(src_dir, ohchr_dir):
 
   bcp_to_codes, code_to_ohchr = parse_index(src_dir)
   bcp_to_code = fix_index(bcp_to_codes)
-  bcp_to_sample = get_bcp_to_sample(src_dir, bcp_to_code)
+  bcp_to_sample = get_bcp_to_sample(
+      src_dir, bcp_to_code, cache_path, processes)
   check_bcp_to_sample(bcp_to_sample)
 
   code_to_attrib = get_code_to_attrib(ohchr_dir)
@@ -485,23 +488,32 @@ def print_bcp_to_code_attrib_sample(bcp_to_code_attrib_sample):
     print '%s: %s, %s\n  "%s"' % (bcp, code, attrib, sample)
 
 
+UDHR_NS = '{http://www.unhchr.ch/udhr}'
+# file kjh.xml is damaged, arrgh. Cyrillic small 'ie' looks just like 'e', and
+# the 'number' attribute is written with the Cyrillic e!
+ARTICLE_NUMBER_ATTRS = ('number', u'numb\u0435r')
+
 def extract_para(src_path):
   """Extract the text of article 1 from the sample, or None if we can't find
-  it."""
-  tree = ET.parse(src_path)
-  root = tree.getroot()
-  ns = {'udhr': 'http://www.unhchr.ch/udhr'}
-  article = root.find('udhr:article[@number="1"]', ns)
-  if article is None:
-    # file kjh.xml is damaged, arrgh. Cyrillic small 'ie' looks just like 'e', and
-    # the 'number' attribute is written with the Cyrillic e!
-    article = root.find(u'udhr:article[@numb\u0435r="1"]', ns)
-  if article is not None:
-    text = '\n'.join([para.text for para in article.findall('udhr:para', ns)])
-    return text.strip() + '\n'
+  it.  This streams the file and stops parsing once article 1 has been read,
+  since that is all we use."""
+  for _, elem in ET.iterparse(src_path):
+    if elem.tag != UDHR_NS + 'article':
+      continue
+    if any(elem.get(attr) == '1' for attr in ARTICLE_NUMBER_ATTRS):
+      text = '\n'.join([para.text for para in elem.findall(UDHR_NS + 'para')])
+      return text.strip() + '\n'
+    # we're done with this article, don't keep it around
+    elem.clear()
   return None
 
 
+def _hash_and_extract_para(src_path):
+  """Return a tuple of the file hash of src_path and its article 1 text, for
+  use in a process pool."""
+  return tool_utils.file_hash(src_path), extract_para(src_path)
+
+
 def fix_sample(sample, bcp):
   """Fix samples that have known fixable issues."""
   new_sample = None
@@ -520,24 +532,55 @@ def fix_sample(sample, bcp):
   return new_sample
 
 
-def get_sample_for_code(udhr_dir, code):
-  """Get a sample named for code."""
-  src_file = 'udhr_%s.xml' % code
-  src_path = os.path.join(udhr_dir, src_file)
-  sample = extract_para(src_path)
-  if not sample:
-    print 'unable to get sample from %s' % src_file
-    return None
-  return sample
-
-
-def get_bcp_to_sample(src_dir, bcp_to_code):
-  """Return a map from bcp to sample, for codes that have a sample."""
+# Bump this if the extraction of article 1 changes.
+ARTICLE_CACHE_VERSION = 1
+
+def get_code_to_sample(udhr_dir, codes, cache_path=None, processes=None):
+  """Return a map from code to article 1 text (or None) for the udhr files
+  named by codes.  Files are processed in parallel using processes (default
+  one per cpu).  If cache_path is provided, it names a cache of article text
+  keyed by file hash, only files whose hash is not in the cache are parsed,
+  and the cache is updated afterwards."""
+  hash_to_sample = tool_utils.read_cache(cache_path, ARTICLE_CACHE_VERSION)
+
+  code_to_path = {
+      code: os.path.join(udhr_dir, 'udhr_%s.xml' % code) for code in codes}
+  code_to_hash = {}
+  if hash_to_sample:
+    code_to_hash = {
+        code: tool_utils.file_hash(src_path)
+        for code, src_path in code_to_path.iteritems()}
+  todo = sorted(code for code in codes
+                if code_to_hash.get(code) not in hash_to_sample)
+  results = tool_utils.parallel_map(
+      _hash_and_extract_para, [code_to_path[code] for code in todo], processes)
+  for code, (file_hash, sample) in zip(todo, results):
+    code_to_hash[code] = file_hash
+    hash_to_sample[file_hash] = sample
+  if cache_path:
+    print 'extracted %d samples, %d from cache' % (
+        len(todo), len(code_to_path) - len(todo))
+
+  if cache_path and todo:
+    # drop entries for files that no longer exist
+    live_hashes = set(code_to_hash.values())
+    tool_utils.write_cache(cache_path, ARTICLE_CACHE_VERSION, {
+        k: v for k, v in hash_to_sample.iteritems() if k in live_hashes})
+
+  return {code: hash_to_sample[code_to_hash[code]] for code in codes}
+
+
+def get_bcp_to_sample(src_dir, bcp_to_code, cache_path=None, processes=None):
+  """Return a map from bcp to sample, for codes that have a sample.  See
+  get_code_to_sample for cache_path and processes."""
+  code_to_sample = get_code_to_sample(
+      src_dir, set(bcp_to_code.values()), cache_path, processes)
   bcp_to_sample = {}
   for bcp in sorted(bcp_to_code):
     code = bcp_to_code[bcp]
-    sample = get_sample_for_code(src_dir, code)
+    sample = code_to_sample[code]
     if not sample:
+      print 'unable to get sample from udhr_%s.xml' % code
       print 'bcp %s: no sample found (code %s)' % (bcp, code)
     else:
       bcp_to_sample[bcp] = sample
@@ -688,42 +731,27 @@ def update_samples(
   print 'Updated by tool - sample files %sfrom %s as of %s.' % (dst, src, date)
 
 
+# ignore these chars, we assume they are ok in any script
+SCRIPT_EXCLUSIONS = frozenset([0x00, 0x0A, 0x0D, 0x20, 0xA0, 0xFEFF])
+
 def get_scripts(text):
   """Return the set of scripts in this text.  Excludes
   some common chars."""
-  # ignore these chars, we assume they are ok in any script
-  exclusions = {0x00, 0x0A, 0x0D, 0x20, 0xA0, 0xFEFF}
-  zyyy_chars = set()
-  scripts = set()
   ustr = unicode(text, 'utf8')
-  for cp in ustr:
-    if ord(cp) in exclusions:
-      continue
-    script = unicode_data.script(cp)
-    if script == 'Zyyy': # common/undetermined
-      zyyy_chars.add(cp if cp < '\u00fe' else ord(cp))
-    elif not script == 'Zinh': # inherited
-      scripts.add(script)
+  histogram = unicode_data.script_histogram(ustr, SCRIPT_EXCLUSIONS)
+  zyyy_chars = set()
+  if 'Zyyy' in histogram:  # common/undetermined
+    zyyy_chars = set(
+        cp if cp < '\u00fe' else ord(cp) for cp in histogram['Zyyy'][1])
+  scripts = set(histogram) - set(['Zyyy', 'Zinh'])  # Zinh is inherited
   return scripts, zyyy_chars
 
 
 def get_script_histogram(utext):
   """Return a map from script to character count + chars, excluding some common
   whitespace, and inherited characters.  utext is a unicode string."""
-  exclusions = {0x00, 0x0A, 0x0D, 0x20, 0xA0, 0xFEFF}
-  result = {}
-  for cp in utext:
-    if ord(cp) in exclusions:
-      continue
-    script = unicode_data.script(cp)
-    if script == 'Zinh':
-      continue
-    if script not in result:
-      result[script] = [1, set([cp])]
-    else:
-      r = result[script]
-      r[0] += 1
-      r[1].add(cp)
+  result = unicode_data.script_histogram(utext, SCRIPT_EXCLUSIONS)
+  result.pop('Zinh', None)
   return result
 
 
@@ -863,6 +891,7 @@ def update_repo(repo_samples, new_samples):
 
 def main():
   fetch = '/tmp/udhr/zip'
+  cache = '/tmp/udhr/article_cache.pkl'
   udhr = '[tools]/third_party/udhr'
   samples = '[tools]/sample_texts'
 
@@ -907,6 +936,12 @@ def main():
   parser.add_argument('-ts', '--test_script', help='test script of samples in sample dir',
                       action='store_true')
   parser.add_argument('-n', '--no_stage', help='do not stage changes in repo', action='store_true')
+  parser.add_argument('--cache_file', help='cache of extracted article text, keyed '
+                      'by file hash\n(default %s), \'-\' for no cache' % cache,
+                      metavar='file', default=cache)
+  parser.add_argument('-p', '--processes', help='number of processes to use when '
+                      'extracting samples\n(default one per cpu)', metavar='n',
+                      type=int)
 
   args = parser.parse_args()
 
@@ -945,7 +980,8 @@ def main():
     if args.update_sample or args.mapping:
       ohchr_dir = tool_utils.resolve_path('[tools]/third_party/ohchr')
       bcp_to_code_attrib_sample = get_bcp_to_code_attrib_sample(
-          args.udhr_dir, ohchr_dir)
+          args.udhr_dir, ohchr_dir, tool_utils.resolve_path(args.cache_file),
+          args.processes)
 
     if args.update_sample:
       in_repo = args.sample_dir == tool_utils.resolve_path(samples)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for codepoint_set.py."""
+
+import random
+import unittest
+
+from nototools import coverage
+from nototools import tool_utils
+from nototools.codepoint_set import CodepointBitmap
+from nototools.codepoint_set import CodepointSet
+
+
+class CodepointSetTest(unittest.TestCase):
+    """Tests for CodepointSet."""
+
+    def _random_set(self, rng):
+        values = set()
+        for _ in range(rng.randint(0, 20)):
+            start = rng.randint(0, 300)
+            values.update(range(start, start + rng.randint(0, 20)))
+        return values
+
+    def test_construct(self):
+        """Tests construction from values and from ranges."""
+        cps = CodepointSet([5, 1, 2, 3, 7, 6, 10])
+        self.assertEqual([(1, 3), (5, 7), (10, 10)], list(cps.ranges()))
+        self.assertEqual(7, len(cps))
+        self.assertEqual([1, 2, 3, 5, 6, 7, 10], list(cps))
+        self.assertEqual(
+            cps, CodepointSet.from_ranges([(5, 6), (10, 10), (1, 3), (6, 7)]))
+        self.assertFalse(CodepointSet())
+        self.assertRaises(ValueError, CodepointSet.from_ranges, [(3, 1)])
+
+    def test_contains(self):
+        """Tests membership."""
+        cps = CodepointSet.from_ranges([(0x41, 0x5a), (0x10000, 0x10ffff)])
+        self.assertIn(0x41, cps)
+        self.assertIn(0x5a, cps)
+        self.assertIn(0x10ffff, cps)
+        self.assertNotIn(0x40, cps)
+        self.assertNotIn(0x5b, cps)
+        self.assertNotIn(0xffff, cps)
+
+    def test_set_operations(self):
+        """Tests set operations against the builtin set."""
+        rng = random.Random(1)
+        for _ in range(200):
+            a = self._random_set(rng)
+            b = self._random_set(rng)
+            ca = CodepointSet(a)
+            cb = CodepointSet(b)
+            self.assertEqual(CodepointSet(a | b), ca | cb)
+            self.assertEqual(CodepointSet(a & b), ca & cb)
+            self.assertEqual(CodepointSet(a - b), ca - cb)
+            self.assertEqual(CodepointSet(a ^ b), ca ^ cb)
+            self.assertEqual(CodepointSet(a - b), ca - b)
+            self.assertEqual(CodepointSet(a - b), a - cb)
+            self.assertEqual(a.issubset(b), ca.issubset(cb))
+            self.assertEqual(a.isdisjoint(b), ca.isdisjoint(cb))
+            self.assertEqual(a | b, ca | cb)
+
+    def test_range_strings(self):
+        """Tests that range strings interoperate with tool_utils."""
+        rng = random.Random(2)
+        for _ in range(50):
+            values = self._random_set(rng)
+            cps = CodepointSet(values)
+            range_str = tool_utils.write_int_ranges(values)
+            self.assertEqual(range_str, cps.to_range_string())
+            self.assertEqual(range_str, tool_utils.write_int_ranges(cps))
+            self.assertEqual(cps, CodepointSet.from_range_string(range_str))
+            if values:
+                self.assertEqual(values, tool_utils.parse_int_ranges(range_str))
+        self.assertEqual(
+            CodepointSet([0x20, 0x41, 0x42, 0x43]),
+            CodepointSet.from_range_string('20 # space\n41-43 # A-C\n'))
+        self.assertEqual(
+            set(range(0x8fd0, 0x15e1a)),
+            tool_utils.parse_int_ranges('8fd0-15e19'))
+        self.assertEqual(0x20000, len(tool_utils.parse_int_ranges('0-1ffff')))
+        self.assertRaises(
+            ValueError, tool_utils.parse_int_ranges, '41-43 42')
+        self.assertEqual(
+            set([0x41, 0x42, 0x43]),
+            tool_utils.parse_int_ranges('41-43 42', allow_duplicates=True))
+        self.assertRaises(ValueError, tool_utils.parse_int_ranges, '41/43')
+
+    def test_hash(self):
+        """Tests that sets that compare equal hash the same."""
+        values = set([1, 2, 3, 10])
+        cps = CodepointSet(values)
+        self.assertEqual(values, cps)
+        self.assertEqual(hash(frozenset(values)), hash(cps))
+        self.assertIn(cps, set([frozenset(values)]))
+        self.assertIn(frozenset(values), set([cps]))
+
+    def test_bitmap(self):
+        """Tests CodepointBitmap counts and set operations against sets."""
+        rng = random.Random(3)
+        for _ in range(100):
+            a = self._random_set(rng)
+            b = self._random_set(rng)
+            ba = CodepointBitmap(a)
+            bb = CodepointBitmap(CodepointSet(b))
+            self.assertEqual(len(a), len(ba))
+            self.assertEqual(bool(a), bool(ba))
+            self.assertEqual(CodepointBitmap(a | b), ba | bb)
+            self.assertEqual(CodepointBitmap(a & b), ba & bb)
+            self.assertEqual(CodepointBitmap(a - b), ba - bb)
+            ranges = []
+            for _ in range(10):
+                start = rng.randint(0, 330)
+                ranges.append((start, start + rng.randint(0, 40)))
+            counts = [len([v for v in a if start <= v < limit])
+                      for start, limit in ranges]
+            self.assertEqual(
+                counts, [ba.count(start, limit) for start, limit in ranges])
+            self.assertEqual(counts, ba.count_ranges(ranges))
+            for v in range(-1, 330):
+                self.assertEqual(v in a, v in ba)
+        full = CodepointBitmap.from_ranges([(0, 0x10ffff)])
+        self.assertEqual(0x110000, len(full))
+        self.assertEqual([0x110000, 3], full.count_ranges(
+            [(0, 0x110000), (0x10fffd, 0x110000)]))
+        self.assertRaises(ValueError, CodepointBitmap, [0x110000])
+
+    def test_convert_set_to_ranges(self):
+        """Tests coverage.convert_set_to_ranges."""
+        self.assertEqual(
+            [(1, 3), (9, 9)], coverage.convert_set_to_ranges({3, 1, 2, 9}))
+
+
+if __name__ == '__main__':
+    unittest.main()
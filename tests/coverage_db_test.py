@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for coverage_db.py."""
+
+import os
+from os import path
+import shutil
+import tempfile
+import unittest
+
+from nototools import codepoint_set
+from nototools import coverage
+from nototools import coverage_db
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
+
+def _family(family_id, ranges):
+    return coverage_db.FamilyCoverage(
+        family_id, family_id.title(), family_id + '.ttf', (0, 0),
+        codepoint_set.CodepointSet.from_range_string(ranges))
+
+
+class CoverageDbTest(unittest.TestCase):
+    """Tests for queries on a CoverageDb."""
+
+    def setUp(self):
+        self.db = coverage_db.CoverageDb([
+            _family('sans-lgc', '0020-007e 00a0-00ff'),
+            _family('sans-deva', '0020-0040 0900-097f'),
+            _family('sans-beng', '0020-0040 0980-09ff 0964-0965'),
+            coverage_db.FamilyCoverage('sans-cjk', 'Sans CJK', 'cjk.ttc',
+                                       (0, 0), None),
+        ])
+
+    def test_families_for_cp(self):
+        self.assertEqual(
+            {'sans-lgc', 'sans-deva', 'sans-beng'},
+            self.db.families_for_cp(0x20))
+        self.assertEqual({'sans-lgc'}, self.db.families_for_cp(0x41))
+        self.assertEqual(
+            {'sans-deva', 'sans-beng'}, self.db.families_for_cp(0x964))
+        self.assertEqual(frozenset(), self.db.families_for_cp(0x1f))
+        self.assertEqual(frozenset(), self.db.families_for_cp(0x100))
+        self.assertEqual(frozenset(), self.db.families_for_cp(0x10ffff))
+
+    def test_families_for_all_and_any(self):
+        self.assertEqual(
+            {'sans-deva'}, self.db.families_for_all([0x20, 0x915, 0x964]))
+        self.assertEqual(frozenset(), self.db.families_for_all([0x41, 0x915]))
+        self.assertEqual({
+            'sans-lgc': codepoint_set.CodepointSet([0x41]),
+            'sans-deva': codepoint_set.CodepointSet([0x915]),
+        }, self.db.families_for_any([0x41, 0x915, 0x3042]))
+
+    def test_json_round_trip(self):
+        db = coverage_db.CoverageDb.from_json(self.db.to_json())
+        self.assertEqual(self.db.family_ids(), db.family_ids())
+        for family_id in db.family_ids():
+            self.assertEqual(self.db.family(family_id), db.family(family_id))
+        for cp in range(0x1f, 0xa10):
+            self.assertEqual(
+                self.db.families_for_cp(cp), db.families_for_cp(cp))
+
+
+class UpdateTest(unittest.TestCase):
+    """Tests for building and updating a CoverageDb from font files."""
+
+    def setUp(self):
+        self.font_dir = path.join(tempfile.mkdtemp(), 'hinted')
+        os.mkdir(self.font_dir)
+        for src, dst in [('font1.ttf', 'NotoSans-Regular.ttf'),
+                         ('font2.ttf', 'NotoSansLepcha-Regular.ttf')]:
+            shutil.copy(path.join(DATA_DIR, src), path.join(self.font_dir, dst))
+
+    def tearDown(self):
+        shutil.rmtree(path.dirname(self.font_dir))
+
+    def test_update(self):
+        db = coverage_db.build_db([self.font_dir])
+        self.assertEqual(['sans-lepc', 'sans-lgc'], db.family_ids())
+        lepcha = path.join(self.font_dir, 'NotoSansLepcha-Regular.ttf')
+        self.assertEqual('Noto Sans Lepcha', db.family('sans-lepc').name)
+        self.assertEqual(
+            coverage.character_set(lepcha), db.family('sans-lepc').charset)
+        self.assertEqual({'sans-lepc'}, db.families_for_cp(0x1c00))
+
+        db_file = path.join(path.dirname(self.font_dir), 'db.json')
+        coverage_db.write_db(db, db_file)
+        db = coverage_db.read_db(db_file)
+        self.assertEqual(([], [], []), db.update()[1:])
+
+        stat = os.stat(lepcha)
+        os.utime(lepcha, (stat.st_atime, stat.st_mtime + 10))
+        os.remove(path.join(self.font_dir, 'NotoSans-Regular.ttf'))
+        db, added, changed, removed = db.update()
+        self.assertEqual(([], ['sans-lepc'], ['sans-lgc']),
+                         (added, changed, removed))
+        self.assertEqual(['sans-lepc'], db.family_ids())
+        self.assertEqual({'sans-lepc'}, db.families_for_cp(0x20))
+
+
+if __name__ == '__main__':
+    unittest.main()
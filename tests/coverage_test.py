@@ -23,9 +23,14 @@ from os import path
 import tempfile
 import unittest
 
+from fontTools import ttLib
+from fontTools.ttLib import TTCollection
+
 from nototools import coverage
 from hb_input_test import make_font
 
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
 
 class CharacterSetTest(unittest.TestCase):
     """Test class for coverage.character_set."""
@@ -41,5 +46,34 @@ class CharacterSetTest(unittest.TestCase):
         self.assertFalse(0x10B00 in charset)
 
 
+class CmapRangesTest(unittest.TestCase):
+    """Test class for reading cmaps from the font files."""
+    def setUp(self):
+        self.font_files = [path.join(DATA_DIR, name)
+                           for name in ['font1.ttf', 'font2.ttf']]
+
+    def test_matches_fonttools(self):
+        """Test the cmap read from the file matches the TTFont one."""
+        for font_file in self.font_files:
+            font = ttLib.TTFont(font_file)
+            self.assertEqual(coverage.character_set(font),
+                             coverage.character_set(font_file))
+            self.assertEqual(coverage.character_set(font),
+                             coverage.cmap_ranges(font_file))
+
+    def test_collection_and_batch(self):
+        """Test the first font of a collection is read, and the batch API."""
+        collection = TTCollection()
+        collection.fonts = [ttLib.TTFont(f) for f in reversed(self.font_files)]
+        ttc_file = tempfile.NamedTemporaryFile(suffix='.ttc')
+        collection.save(ttc_file.name)
+        ranges = coverage.cmap_ranges_for_files(
+            self.font_files + [ttc_file.name])
+        self.assertEqual(set(self.font_files + [ttc_file.name]), set(ranges))
+        self.assertEqual(ranges[self.font_files[1]], ranges[ttc_file.name])
+        self.assertEqual(coverage.character_set(self.font_files[0]),
+                         ranges[self.font_files[0]])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for glyph_reachability.py."""
+
+from os import path
+import unittest
+
+from fontTools import subset
+from fontTools import ttLib
+from fontTools.feaLib import builder
+
+from nototools import glyph_reachability
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
+_FEATURES = """
+languagesystem DFLT dflt;
+
+lookup to_alt {
+    sub E by glyph02193;
+} to_alt;
+
+lookup to_unreached {
+    sub E by glyph02194;
+} to_unreached;
+
+lookup split {
+    sub D by glyph02195 glyph02196;
+} split;
+
+lookup after_split {
+    sub C by glyph02197;
+} after_split;
+
+feature liga {
+    sub B C by glyph02191;
+    sub B X by glyph02192;
+} liga;
+
+feature calt {
+    sub E' lookup to_alt glyph02191;
+    sub E' lookup to_unreached X;
+    sub A D' lookup split C' lookup after_split;
+} calt;
+"""
+
+
+def _subsetter_glyphs(font, unicodes):
+    subsetter = subset.Subsetter()
+    subsetter.populate(unicodes=unicodes)
+    subsetter._closure_glyphs(font)
+    return subsetter.glyphs_retained
+
+
+class ReachableGlyphsTest(unittest.TestCase):
+    """Tests for reachable_glyphs."""
+
+    def test_matches_subsetter(self):
+        for font_name in ['font1.ttf', 'font2.ttf']:
+            font = ttLib.TTFont(path.join(DATA_DIR, font_name))
+            cmap = font.getBestCmap()
+            for unicodes in [cmap.keys(), sorted(cmap)[::7]]:
+                self.assertEqual(
+                    _subsetter_glyphs(font, unicodes),
+                    glyph_reachability.reachable_glyphs(font, unicodes))
+
+    def test_gsub(self):
+        font = ttLib.TTFont(path.join(DATA_DIR, 'font1.ttf'))
+        builder.addOpenTypeFeaturesFromString(
+            font, _FEATURES, tables=['GSUB'])
+        unicodes = [ord(c) for c in 'ABCDE']
+        reachable = glyph_reachability.reachable_glyphs(font, unicodes)
+        self.assertEqual(_subsetter_glyphs(font, unicodes), reachable)
+        # the ligature, the glyph substituted in its context, the output of
+        # split, and the glyph after split, which applies after a lookup that
+        # changes the number of glyphs so applies to every glyph
+        for glyph in ['glyph02191', 'glyph02193', 'glyph02195', 'glyph02196',
+                      'glyph02197']:
+            self.assertIn(glyph, reachable)
+        # needs X, which is not reachable
+        for glyph in ['glyph02192', 'glyph02194']:
+            self.assertNotIn(glyph, reachable)
+
+    def test_unreachable_glyphs(self):
+        font = ttLib.TTFont(path.join(DATA_DIR, 'font1.ttf'))
+        self.assertEqual(
+            set(font.getGlyphOrder()) - _subsetter_glyphs(
+                font, font.getBestCmap().keys()),
+            glyph_reachability.unreachable_glyphs(font))
+
+
+if __name__ == '__main__':
+    unittest.main()
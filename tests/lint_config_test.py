@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for lint_config.py."""
+
+import unittest
+
+from nototools import lint_config
+
+
+_SPEC = """
+disable head/os2/unicoderange
+script is not LGC
+disable cmap/variants
+script *
+filename like Bengali
+enable script_required except cp 951-952
+filename like Devanagari
+disable bounds/font/ymax
+condition
+vendor Adobe
+disable hints
+"""
+
+
+def _font_info(filename, script='Beng', vendor='Google', hinted=False):
+    return lint_config.FontInfo(
+        filename=filename, name='Noto Sans', style='Sans', script=script,
+        variant=None, weight='Regular', monospace=False, hinted=hinted,
+        vendor=vendor, version='1.00')
+
+
+class TestSpecTest(unittest.TestCase):
+    """Tests for resolving tags in TestSpec."""
+
+    def test_partial_tags(self):
+        spec = lint_config.TestSpec()
+        self.assertEqual(
+            'cmap/script_required', spec._get_single_tag('script_required'))
+        self.assertEqual(
+            'bounds/glyph/ui_ymax', spec._get_single_tag('glyph/ui_ymax'))
+        self.assertEqual(
+            'head/os2/panose/family', spec._get_single_tag('panose/family'))
+        # 'ymax' matches several tags, 'ymax_x' and 'max' match none
+        for tag in ['ymax', 'ymax_x', 'max']:
+            self.assertRaises(ValueError, spec._get_single_tag, tag)
+
+    def test_tag_sets(self):
+        spec = lint_config.TestSpec()
+        self.assertEqual(
+            {'head/hhea', 'head/hhea/ascent', 'head/hhea/descent',
+             'head/hhea/linegap'},
+            spec._get_tag_set('head/hhea'))
+        self.assertEqual(
+            {'head', 'head/os2', 'head/os2/panose'},
+            spec._get_ancestor_tag_set('proportion'))
+        self.assertEqual(set(), spec._get_ancestor_tag_set('*'))
+
+
+class LintSpecTest(unittest.TestCase):
+    """Tests for LintSpec.get_tests."""
+
+    def setUp(self):
+        self.lint_spec = lint_config.parse_spec(_SPEC)
+
+    def _expected_tags(self, font_info):
+        """Resolve without the cache."""
+        result = set(lint_config.TestSpec.tag_set)
+        options = {}
+        for condition, spec in self.lint_spec.specs:
+            if condition.accepts(font_info):
+                spec.apply_spec(result, options)
+        return result, sorted(options)
+
+    def test_get_tests(self):
+        infos = [
+            _font_info('NotoSansBengali-Regular.ttf'),
+            _font_info('NotoSansBengali-Regular.ttf', hinted=True),
+            _font_info('NotoSansDevanagari-Bold.ttf', script='Deva'),
+            _font_info('NotoSans-Regular.ttf', script='LGC', vendor='Adobe'),
+            _font_info('NotoSansBengali-Regular.ttf'),
+        ]
+        for info in infos:
+            tests = self.lint_spec.get_tests(info)
+            self.assertEqual(
+                self._expected_tags(info),
+                (set(tests.tag_set), sorted(tests.tag_filters)))
+
+        # hinted is not tested by any condition
+        self.assertEqual(3, len(self.lint_spec._resolutions))
+        tests = self.lint_spec.get_tests(infos[0])
+        self.assertFalse(tests.check('cmap/variants'))
+        self.assertTrue(tests.checkvalue('cmap/script_required', 0x950))
+        self.assertFalse(tests.checkvalue('cmap/script_required', 0x951))
+
+    def test_new_log_per_font(self):
+        info = _font_info('NotoSansBengali-Regular.ttf')
+        tests = self.lint_spec.get_tests(info)
+        tests.check('name')
+        self.assertEqual({'name'}, tests.runlog())
+        self.assertFalse(self.lint_spec.get_tests(info).runlog())
+
+    def test_add_spec_resets(self):
+        info = _font_info('NotoSansBengali-Regular.ttf')
+        self.assertTrue(self.lint_spec.get_tests(info).check('advances'))
+        lint_config.parse_spec('disable advances', self.lint_spec)
+        self.assertFalse(self.lint_spec.get_tests(info).check('advances'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for lint_profile.py."""
+
+import StringIO
+import unittest
+
+from nototools import lint_config
+from nototools import lint_profile
+
+
+class _FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LintProfileTest(unittest.TestCase):
+    """Tests for LintProfile."""
+
+    def test_profile(self):
+        timer = _FakeTimer()
+        profile = lint_profile.LintProfile(timer)
+        spec = lint_config.parse_spec('disable paths/extrema')
+        info = lint_config.FontInfo(
+            filename='NotoSans-Regular.ttf', name='Noto Sans', style='Sans',
+            script='LGC', variant=None, weight='Regular', monospace=False,
+            hinted=True, vendor='Google', version='1.00')
+
+        profile.start_font('a.ttf')
+        tests = profile.profile_tests(spec.get_tests(info))
+        timer.now = 1.0
+        profile.start('paths', count=False)
+        self.assertTrue(tests.check('paths'))
+        timer.now = 2.0
+        self.assertFalse(tests.check('paths/extrema'))
+        timer.now = 3.0
+        for gid in range(3):
+            self.assertTrue(tests.checkvalue('paths/intersection', gid))
+            timer.now += 2.0
+        profile.stop()
+        timer.now = 20.0
+        profile.end_font()
+        self.assertEqual(['paths/extrema'], list(tests.skiplog()))
+
+        profile.start_font('b.ttf')
+        profile.start('paths', count=False)
+        timer.now = 21.0
+        profile.end_font()
+
+        self.assertEqual(
+            {'paths': [3.0, 1], 'paths/intersection': [6.0, 3]},
+            profile.tag_totals())
+        self.assertEqual(20.0, profile.fonts['a.ttf'][0])
+
+        out = StringIO.StringIO()
+        profile.write_report(out, top_n=1)
+        self.assertEqual([
+            'Profiled 2 fonts in 21.000 seconds',
+            '    seconds    calls  name',
+            'Slowest tests:',
+            '      6.000        3  paths/intersection',
+            'Slowest test groups:',
+            '      9.000        4  paths',
+            'Slowest fonts:',
+            '     20.000           a.ttf',
+            ], out.getvalue().splitlines())
+
+
+if __name__ == '__main__':
+    unittest.main()
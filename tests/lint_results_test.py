@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for lint_results.py."""
+
+import json
+import StringIO
+import unittest
+
+from nototools import lint_results
+
+
+def _identity(filename, hint_dir='hinted', weight='Regular', slope=None):
+    return lint_results.FontIdentity(
+        path='fonts/%s/%s' % (hint_dir, filename), hint_dir=hint_dir,
+        filename=filename, family='Noto', script='Beng',
+        script_name='Bengali', style='Sans', variant=None, weight=weight,
+        slope=slope, manufacturer='Monotype', revision='1.02')
+
+
+class _CountingStringIO(StringIO.StringIO):
+    def __init__(self):
+        StringIO.StringIO.__init__(self)
+        self.num_writes = 0
+
+    def write(self, s):
+        self.num_writes += 1
+        StringIO.StringIO.write(self, s)
+
+
+class ResultSinkTest(unittest.TestCase):
+    """Tests for the result sinks."""
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, lint_results.ResultSink)
+
+    def test_csv(self):
+        out = StringIO.StringIO()
+        sink = lint_results.CsvResultSink(out)
+        sink.write_header()
+        results = sink.font_results(
+            _identity('NotoSansBengali-Bold.ttf', weight='Bold'))
+        results.add('Error', 'name/copyright', 'Copyright', u'bad \xa9')
+        results.add('Warning', 'cmap/unexpected', 'Chars', 'extra')
+        results.close(1, 1)
+        self.assertEqual([
+            lint_results.CsvResultSink.HEADER,
+            'Error,Bengali,Sans,,Bold,Monotype,Copyright,hinted,'
+            'NotoSansBengali-Bold.ttf,1.02,"bad \xc2\xa9"',
+            'Warning,Bengali,Sans,,Bold,Monotype,Chars,hinted,'
+            'NotoSansBengali-Bold.ttf,1.02,"extra"',
+            ], out.getvalue().splitlines())
+
+    def test_jsonl(self):
+        out = _CountingStringIO()
+        sink = lint_results.JsonLinesResultSink(out)
+        bold = _identity('NotoSans-Bold.ttf', weight='Bold')
+        first = sink.font_results(bold)
+        second = sink.font_results(_identity('NotoSans-Regular.ttf'))
+        second.add('Warning', 'advances/digits', 'Advances', 'digit 1')
+        first.add('Error', 'name/copyright', 'Copyright', 'bad')
+        second.close(0, 1)
+        first.close(1, 0)
+        # linting the same font again refers to the first font record
+        again = sink.font_results(bold)
+        again.close(0, 0)
+
+        self.assertEqual(3, out.num_writes)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            ['font', 'finding', 'summary', 'font', 'finding', 'summary',
+             'summary'],
+            [r['record'] for r in records])
+        self.assertEqual('NotoSans-Regular.ttf', records[0]['filename'])
+        self.assertEqual(0, records[0]['id'])
+        self.assertEqual(
+            {'record': 'finding', 'font': 1, 'type': 'Error',
+             'test': 'name/copyright', 'category': 'Copyright',
+             'message': 'bad'}, records[4])
+        self.assertEqual(
+            {'record': 'summary', 'font': 1, 'errors': 0, 'warnings': 0},
+            records[6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for noto_cmap_reqs.py."""
+
+import datetime
+from os import path
+import random
+import unittest
+
+from nototools import cmap_data
+from nototools import noto_cmap_reqs
+from nototools import unicode_data
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
+
+class CmapOpsTest(unittest.TestCase):
+    """Tests for CmapOps."""
+
+    def _check_index(self, cmap_ops):
+        script_to_chars = cmap_ops.create_script_to_chars()
+        self.assertEqual(
+            noto_cmap_reqs._invert_script_to_chars(script_to_chars),
+            cmap_ops.create_char_to_scripts())
+        for cp, scripts in cmap_ops.create_char_to_scripts().iteritems():
+            self.assertEqual(sorted(scripts), cmap_ops.char_scripts(cp))
+
+    def test_index(self):
+        """Tests that the char to scripts index tracks edits."""
+        cmap_ops = noto_cmap_reqs.CmapOps(
+            {'Latn': range(0x41, 0x5b), 'Grek': range(0x391, 0x3a2)})
+        self._check_index(cmap_ops)
+        scripts = ['Latn', 'Grek', 'Cyrl']
+        cmap_ops.create_script('Cyrl')
+        rng = random.Random(1)
+        for _ in range(500):
+            cp = rng.randint(0x30, 0x450)
+            script = rng.choice(scripts)
+            if rng.randint(0, 1):
+                cmap_ops.add(cp, script)
+            else:
+                cmap_ops.remove(cp, script)
+        self._check_index(cmap_ops)
+        cmap_ops.move_all_to_from(cmap_ops.script_chars('Cyrl'), 'Latn', 'Cyrl')
+        cmap_ops.delete_script('Cyrl')
+        self._check_index(cmap_ops)
+        self.assertEqual([], cmap_ops.char_scripts(0x10ffff))
+
+    def test_range_ops(self):
+        """Tests adding and removing ranges of chars."""
+        cmap_ops = noto_cmap_reqs.CmapOps(
+            {'Zsym': []}, undefined_exceptions={0x2fff})
+        cmap_ops.add_range(0x2fe0, 0x3002, 'Zsym')
+        # 2fe0-2fef are unassigned
+        self.assertEqual(
+            [0x2ff0 + i for i in range(12)] + [0x2fff, 0x3000, 0x3001, 0x3002],
+            cmap_ops.script_chars('Zsym'))
+        cmap_ops.remove_range(0x2ff5, 0x2ffe, 'Zsym')
+        self.assertEqual(
+            [0x2ff0 + i for i in range(5)] + [0x2fff, 0x3000, 0x3001, 0x3002],
+            cmap_ops.script_chars('Zsym'))
+        cmap_ops.remove_range(0x2ffe, 0x3000, 'Zsym')
+        self.assertEqual(
+            [0x2ff0 + i for i in range(5)] + [0x3001, 0x3002],
+            cmap_ops.script_chars('Zsym'))
+        cmap_ops.add_block('Geometric Shapes', 'Zsym')
+        self.assertEqual(
+            len(unicode_data.block_chars('Geometric Shapes')) + 7,
+            len(cmap_ops.script_chars('Zsym')))
+        self._check_index(cmap_ops)
+
+    def test_phase_times(self):
+        """Tests that phases are timed in order."""
+        cmap_ops = noto_cmap_reqs.CmapOps({'Latn': []})
+        cmap_ops.timing_section('setup')
+        cmap_ops.phase('one')
+        cmap_ops.phase('two')
+        cmap_ops.finish()
+        self.assertEqual(
+            ['setup', 'one', 'two'],
+            [name for name, _ in cmap_ops.phase_times()])
+
+
+class _SetCmapOps(noto_cmap_reqs.CmapOps):
+    """CmapOps that does bulk edits a char at a time and finds the scripts of
+    a char by inverting the script map, as CmapOps did before it kept an
+    index."""
+
+    def add_range(self, start, end, script):
+        self.add_all([
+            cp for cp in range(start, end + 1)
+            if unicode_data.is_defined(cp)], script)
+
+    def add_block(self, block, script):
+        start, end = unicode_data.block_range(block)
+        self.add_range(start, end, script)
+
+    def remove_range(self, start, end, script):
+        for cp in self.script_chars(script):
+            if start <= cp <= end:
+                self._script_cp_ok_remove(cp, script)
+
+    def create_char_to_scripts(self):
+        return noto_cmap_reqs._invert_script_to_chars(
+            self.create_script_to_chars())
+
+    def char_scripts(self, cp):
+        return sorted(
+            script for script, cps in self._script_to_chars.iteritems()
+            if cp in cps)
+
+
+class BuildTest(unittest.TestCase):
+    """Tests for the cmap build passes."""
+
+    def test_build_unchanged(self):
+        """Tests that the passes through _reassign_merged_scripts generate
+        the same cmap data as before.
+
+        The later passes depend on block assignments that do not yet cover
+        all the blocks in our Unicode data, so this stops short of the full
+        phase 3 build.  If a change to these passes or to the Unicode data is
+        intended, regenerate data/noto_cmap_phase3_merged_scripts.xml."""
+        passes = noto_cmap_reqs._BUILD_PASSES
+        passes = passes[:passes.index(
+            noto_cmap_reqs._reassign_merged_scripts) + 1]
+        cmap_ops = noto_cmap_reqs._run_passes(0, passes)
+        metadata = cmap_data.create_metadata(
+            'noto_cmap_reqs', date=datetime.date(2018, 1, 1))
+        cmapdata = noto_cmap_reqs._get_cmap_data(
+            cmap_ops.create_script_to_chars(), metadata)
+        expected = cmap_data.read_cmap_data_file(
+            path.join(DATA_DIR, 'noto_cmap_phase3_merged_scripts.xml'))
+        actual = cmap_data.read_cmap_data(cmap_data.write_cmap_data(cmapdata))
+        self.assertEqual(expected, actual)
+
+    def test_passes_match_reference(self):
+        """Tests that every pass gives the same result with CmapOps as with
+        a plain set-based reference.
+
+        _reassign_common_by_block leaves chars in Zyyy for blocks it has no
+        assignment for, so deleting Zyyy is allowed to proceed here to let
+        the later passes run."""
+        script_to_chars = unicode_data.create_script_to_chars()
+        all_ops = []
+        for cls in [noto_cmap_reqs.CmapOps, _SetCmapOps]:
+            cmap_ops = cls(script_to_chars, undefined_exceptions={0x20bf})
+            cmap_ops._verify_script_empty = lambda script: None
+            all_ops.append(cmap_ops)
+        cmap_ops, reference_ops = all_ops
+        for build_pass in noto_cmap_reqs._BUILD_PASSES:
+            build_pass(cmap_ops)
+            build_pass(reference_ops)
+            self.assertEqual(
+                reference_ops.create_script_to_chars(),
+                cmap_ops.create_script_to_chars(),
+                'differs after %s' % build_pass.__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for noto_names.py."""
+
+from os import path
+import shutil
+import tempfile
+import unittest
+
+from nototools import noto_fonts
+from nototools import noto_names
+from nototools import tool_utils
+
+
+def _fonts(names):
+    return [noto_fonts.get_noto_font('/fonts/%s/%s' % (hinting, name))
+            for name in names for hinting in ['hinted', 'unhinted']]
+
+
+_SANS = _fonts([
+    'NotoSans-Regular.ttf', 'NotoSans-Bold.ttf', 'NotoSans-Italic.ttf',
+    'NotoSans-SemiCondensedLightItalic.ttf', 'NotoSans-Regular.otf'])
+
+_DEVA = _fonts(['NotoSansDevanagari-Regular.ttf',
+                'NotoSansDevanagari-Bold.ttf'])
+
+
+class FamilyNameTableDataTest(unittest.TestCase):
+    """Tests for family_name_table_data."""
+
+    def setUp(self):
+        self.family_to_name_info = noto_names.create_family_to_name_info(
+            _SANS + _DEVA, 3, False)
+
+    def test_family_name_table_data(self):
+        info = self.family_to_name_info['sans-lgc']
+        font_to_data = noto_names.family_name_table_data(
+            'sans-lgc', _SANS, info, 3)
+        self.assertEqual(set(_SANS), set(font_to_data))
+        regular = font_to_data[_SANS[0]]
+        self.assertEqual('Noto Sans', regular.original_family)
+        self.assertEqual('Regular', regular.original_subfamily)
+        self.assertEqual('NotoSans-Regular', regular.postscript_name)
+        light = font_to_data[_SANS[6]]
+        self.assertEqual('Noto Sans', light.preferred_family)
+        self.assertEqual('SemiCondensed Light Italic', light.preferred_subfamily)
+        # only the version and description differ between hinted and unhinted
+        self.assertNotEqual(regular, font_to_data[_SANS[1]])
+        self.assertEqual(regular._replace(version_re=None,
+                                          description_re=None),
+                         font_to_data[_SANS[1]]._replace(version_re=None,
+                                                         description_re=None))
+        # fonts differing only in format have the same data
+        self.assertEqual(regular, font_to_data[_SANS[8]])
+
+    def test_name_table_data(self):
+        for font in _SANS + _DEVA:
+            family_id = noto_fonts.noto_font_to_wws_family_id(font)
+            self.assertEqual(
+                noto_names.family_name_table_data(
+                    family_id, [font], self.family_to_name_info[family_id],
+                    3)[font],
+                noto_names.name_table_data(
+                    font, self.family_to_name_info, 3))
+        self.assertIsNone(noto_names.name_table_data(_SANS[0], {}, 3))
+
+    def test_write_name_data_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            # phase 2, so the name data is not already memoized
+            family_to_name_info = noto_names.create_family_to_name_info(
+                _DEVA, 2, False)
+            info_file = path.join(tmpdir, 'family_name_info.xml')
+            noto_names.write_family_name_info_file(
+                family_to_name_info, info_file)
+            for font in _DEVA:
+                noto_names.name_table_data(font, family_to_name_info, 2)
+            noto_names.write_name_data_cache(2, info_file)
+            cache = tool_utils.read_cache(
+                path.join(tmpdir, 'family_name_info_name_data.pkl'),
+                noto_names.NAME_DATA_CACHE_VERSION)
+            info = family_to_name_info['sans-deva']
+            face_to_data = cache[('sans-deva', tuple(info))]
+            for font in _DEVA:
+                self.assertEqual(
+                    noto_names.name_table_data(font, family_to_name_info, 2),
+                    face_to_data[tuple(font[1:])])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
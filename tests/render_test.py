@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for render.py."""
+
+from os import path
+import unittest
+
+from fontTools import ttLib
+from fontTools.pens.boundsPen import BoundsPen
+
+from nototools import render
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
+
+class GlyphBoundsTest(unittest.TestCase):
+    """Tests for GlyphBounds."""
+
+    def setUp(self):
+        self.font = ttLib.TTFont(path.join(DATA_DIR, 'font1.ttf'))
+
+    def test_bounds(self):
+        """Tests that the bounds agree with BoundsPen."""
+        glyph_set = self.font.getGlyphSet()
+        glyph_bounds = render.GlyphBounds(self.font, ignore_single_points=False)
+        for glyph_name in self.font.getGlyphOrder():
+            pen = BoundsPen(glyph_set)
+            glyph_set[glyph_name].draw(pen)
+            bounds = glyph_bounds.bounds(glyph_name)
+            if pen.bounds is None:
+                self.assertIsNone(bounds)
+            else:
+                for expected, actual in zip(pen.bounds, bounds):
+                    self.assertAlmostEqual(expected, actual, places=6)
+
+    def _add_single_point_glyph(self, lsb_offset=0):
+        glyf_table = self.font['glyf']
+        glyph_name = 'bounds_test'
+        glyph = ttLib.getTableModule('glyf').Glyph()
+        glyph.numberOfContours = 2
+        glyph.coordinates = ttLib.getTableModule('glyf').GlyphCoordinates(
+            [(0, 0), (100, 0), (50, 300), (50, 2000)])
+        glyph.flags = [1, 0, 1, 1]
+        glyph.endPtsOfContours = [2, 3]
+        glyph.program = ttLib.tables.ttProgram.Program()
+        glyph.program.fromBytecode(b'')
+        glyf_table[glyph_name] = glyph
+        glyph.recalcBounds(glyf_table)
+        self.font['hmtx'][glyph_name] = (100, glyph.xMin + lsb_offset)
+        return glyph_name
+
+    def test_cleaned_extents(self):
+        """Tests that the extents agree with get_glyph_cleaned_extents."""
+        glyph_set = self.font.getGlyphSet()
+        glyph_bounds = render.GlyphBounds(self.font)
+        for glyph_name in self.font.getGlyphOrder():
+            expected = render.get_glyph_cleaned_extents(
+                glyph_set[glyph_name], glyph_set)
+            actual = glyph_bounds.vertical_extents(glyph_name)
+            for e, a in zip(expected, actual):
+                if e is None:
+                    self.assertIsNone(a)
+                else:
+                    self.assertAlmostEqual(e, a, places=6)
+
+    def test_single_points(self):
+        """Tests that single-point glyf contours count, as they do in
+        get_glyph_cleaned_extents, whether or not the bounds come from a
+        BoundsPen."""
+        for lsb_offset in [0, 10]:
+            glyph_name = self._add_single_point_glyph(lsb_offset)
+            glyph_set = self.font.getGlyphSet()
+            self.assertEqual(
+                (0, 2000),
+                render.get_glyph_cleaned_extents(
+                    glyph_set[glyph_name], glyph_set))
+            self.assertEqual(
+                (0, 2000),
+                render.GlyphBounds(self.font).vertical_extents(glyph_name))
+            self.assertEqual(
+                (0, 2000),
+                render.GlyphBounds(self.font, False).vertical_extents(
+                    glyph_name))
+        self.assertEqual(
+            (None, None),
+            render.GlyphBounds(self.font).vertical_extents('space'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sfnt_directory.py."""
+
+import os
+from os import path
+import shutil
+import tempfile
+import unittest
+
+from fontTools import ttLib
+from fontTools.ttLib import sfnt
+
+from nototools import merge_noto
+from nototools import sfnt_directory
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+FONTS = [path.join(DATA_DIR, name) for name in ['font1.ttf', 'font2.ttf']]
+
+
+class SfntDirectoryTest(unittest.TestCase):
+    """Tests for SfntDirectory and the functions reading it from files."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ttc = path.join(self.tmpdir, 'fonts.ttc')
+        collection = ttLib.TTCollection()
+        collection.fonts = [ttLib.TTFont(f) for f in FONTS]
+        collection.save(self.ttc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _check_directory(self, filepath, font_number, directory):
+        with open(filepath, 'rb') as f:
+            reader = sfnt.SFNTReader(f, fontNumber=font_number)
+            self.assertEqual(sorted(reader.keys()), sorted(directory.tags()))
+            self.assertEqual(len(reader.keys()), len(directory))
+            for tag in reader.keys():
+                entry = reader.tables[tag]
+                self.assertIn(tag, directory)
+                self.assertEqual(
+                    (entry.offset, entry.length, entry.checkSum),
+                    directory.entry(tag))
+        self.assertNotIn('CFF ', directory)
+        self.assertEqual('ttf', directory.fmt)
+
+    def test_read_directory(self):
+        for filepath in FONTS:
+            directory = sfnt_directory.read_directory(filepath)
+            self.assertEqual(1, directory.num_fonts)
+            self._check_directory(filepath, 0, directory)
+            self.assertRaises(ValueError, directory.table_data, 'cmap')
+        for font_number in range(2):
+            directory = sfnt_directory.read_directory(self.ttc, font_number)
+            self.assertEqual(2, directory.num_fonts)
+            self._check_directory(self.ttc, font_number, directory)
+
+    def test_table_data(self):
+        for font_number, filepath in enumerate(FONTS):
+            font = ttLib.TTFont(filepath)
+            with open(self.ttc, 'rb') as f:
+                directory = sfnt_directory.SfntDirectory(f, font_number)
+                for tag in ['cmap', 'GSUB', 'name']:
+                    self.assertEqual(
+                        font.reader[tag], directory.table_data(tag))
+                self.assertIsNone(directory.table_data('CFF '))
+
+    def test_errors(self):
+        empty = path.join(self.tmpdir, 'empty.ttf')
+        open(empty, 'wb').close()
+        truncated = path.join(self.tmpdir, 'truncated.ttc')
+        with open(self.ttc, 'rb') as f:
+            data = f.read(24)
+        with open(truncated, 'wb') as f:
+            f.write(data)
+        for filepath, font_number in [
+                (empty, 0), (truncated, 1), (self.ttc, 2), (FONTS[0], 1),
+                (path.join(DATA_DIR, os.pardir, 'sfnt_directory_test.py'), 0)]:
+            self.assertRaises(
+                ValueError, sfnt_directory.read_directory, filepath,
+                font_number)
+
+    def test_woff_fallback(self):
+        """Tests that merge_noto reads fonts that are not sfnts with
+        fontTools."""
+        woff = path.join(self.tmpdir, 'font1.woff')
+        font = ttLib.TTFont(FONTS[0])
+        font.flavor = 'woff'
+        font.save(woff)
+        self.assertRaises(ValueError, sfnt_directory.read_directory, woff)
+        self.assertTrue(merge_noto.has_gsub_table(FONTS[0]))
+        self.assertTrue(merge_noto.has_gsub_table(woff))
+        del font['GSUB']
+        font.save(woff)
+        self.assertFalse(merge_noto.has_gsub_table(woff))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Copyright 2018 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for summary.py."""
+
+from os import path
+import shutil
+import tempfile
+import unittest
+
+from nototools import summary
+
+DATA_DIR = path.join(path.dirname(path.abspath(__file__)), 'data')
+
+
+class SummaryTest(unittest.TestCase):
+    """Tests for summary."""
+
+    def test_summarize_file(self):
+        """Tests that the table directory reader agrees with fontTools."""
+        for name in ('font1.ttf', 'font2.ttf'):
+            fontpath = path.join(DATA_DIR, name)
+            self.assertEqual(
+                summary.summarize_file_with_ttlib(DATA_DIR, fontpath),
+                summary.summarize_file(DATA_DIR, fontpath))
+
+    def test_summarize_cache(self):
+        """Tests that cached summaries match uncached ones."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cache_path = path.join(tmpdir, 'cache.pkl')
+            expected = summary.summarize(DATA_DIR, processes=1)
+            self.assertEqual(2, len(expected))
+            for _ in range(2):
+                self.assertEqual(expected, summary.summarize(
+                    DATA_DIR, cache_path=cache_path, processes=1))
+            self.assertEqual(
+                expected[:1],
+                summary.summarize(DATA_DIR, name='font1', processes=1))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -47,6 +47,14 @@ class UnicodeDataTest(unittest.TestCase):
         self.assertEqual('Latn', unicode_data.script(0xA794))
         self.assertEqual('Zzzz', unicode_data.script(0xE006))
 
+    def test_script_histogram(self):
+        """Tests the script_histogram() method."""
+        self.assertEqual(
+            {'Latn': [3, {u'a', u'b'}], 'Grek': [1, {u'\u03b1'}],
+             'Zinh': [1, {u'\u0301'}], 'Zzzz': [1, {u'\ue000'}]},
+            unicode_data.script_histogram(
+                u'aba \u03b1\u0301\ue000', {0x20}))
+
     def test_block(self):
         """Tests the block() method."""
         self.assertEqual('Emoticons', unicode_data.block(0x1F600))
@@ -14,8 +14,15 @@
 #
 # Contributor: Raph Levien
 
+import argparse
+import multiprocessing
 import os
+import shutil
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import time
 sys.path.append(
     os.path.join(os.path.dirname(__file__), os.pardir, 'spiro', 'curves'))
 
@@ -119,7 +126,8 @@ class State:
 
 penalty = 0.05
 
-def measure_bz(curve, s0, s1, bz):
+# measure_bz using the general integrators in tocubic
+def measure_bz_rk4(curve, s0, s1, bz):
 	bz_arclen = tocubic.bz_arclength_rk4(bz)
 	if bz_arclen == 0: return 1e9
 	arclen_scale = (s1 - s0) / bz_arclen
@@ -127,9 +135,79 @@ def measure_bz(curve, s0, s1, bz):
 		return curve.th(s0 + arclen_scale * s, s == 0)
 	return tocubic.measure_bz_rk4(bz, bz_arclen, th_fn)
 
-def measure_line(curve, st, pt0, pt1):
+RK4_N = 10
+RK4_DT = 1. / RK4_N
+# parameters of each rk4 step: start, midpoint, end
+RK4_TS = []
+t = 0
+for i in range(RK4_N):
+	RK4_TS.append((t, t + RK4_DT * .5, t + RK4_DT))
+	t += RK4_DT
+del t, i
+TWOPI = 2 * math.pi
+
+# Score a line or quadratic against the curve from s0 to s1, as
+# measure_bz_rk4 does.  Both integrations sample the derivative of the
+# bezier at the same parameters, so its length and angle are computed once
+# per parameter and shared, and the steps are done inline.  The arithmetic
+# is in the same order, so the score is the same.
+def measure_bz(curve, s0, s1, bz):
+	if len(bz) == 2:
+		dx = bz[1][0] - bz[0][0]
+		dy = bz[1][1] - bz[0][1]
+		sample = (math.hypot(dx, dy), math.atan2(dy, dx))
+		samples = [(sample, sample, sample)] * RK4_N
+	else:
+		(x0, y0), (x1, y1), (x2, y2) = bz
+		ax, ay = 2 * (x1 - x0), 2 * (y1 - y0)
+		bx, by = 2 * (x2 - x1), 2 * (y2 - y1)
+		cache = {}
+		samples = []
+		for step in RK4_TS:
+			step_samples = []
+			for t in step:
+				sample = cache.get(t)
+				if sample is None:
+					mt = 1 - t
+					# same order as tocubic.pt_wsum
+					dx = 0 + ax * mt + bx * t
+					dy = 0 + ay * mt + by * t
+					sample = cache[t] = (math.hypot(dx, dy), math.atan2(dy, dx))
+				step_samples.append(sample)
+			samples.append(step_samples)
+
+	h = RK4_DT
+	hh = RK4_DT * .5
+	h6 = RK4_DT * (1./6)
+	bz_arclen = 0
+	for (ds0, _), (dsm, _), (ds1, _) in samples:
+		bz_arclen += h6 * (ds0 + ds1 + 2 * (dsm + dsm))
+	if bz_arclen == 0: return 1e9
+	arclen_scale = (s1 - s0) / bz_arclen
+
+	th = curve.th
+	floor = math.floor
+	s = 0
+	score = 0
+	for (ds0, th0), (dsm, thm), (ds1, th1) in samples:
+		u = (th0 - th(s0 + arclen_scale * s, s == 0)) / TWOPI
+		k1 = ds0 * (TWOPI * (u - floor(u + 0.5))) ** 2
+		st = s + hh * ds0
+		u = (thm - th(s0 + arclen_scale * st, st == 0)) / TWOPI
+		k2 = dsm * (TWOPI * (u - floor(u + 0.5))) ** 2
+		st = s + hh * dsm
+		u = (thm - th(s0 + arclen_scale * st, st == 0)) / TWOPI
+		k3 = dsm * (TWOPI * (u - floor(u + 0.5))) ** 2
+		st = s + h * dsm
+		u = (th1 - th(s0 + arclen_scale * st, st == 0)) / TWOPI
+		k4 = ds1 * (TWOPI * (u - floor(u + 0.5))) ** 2
+		s += h6 * (ds0 + ds1 + 2 * (dsm + dsm))
+		score += h6 * (k1 + k4 + 2 * (k3 + k2))
+	return score
+
+def measure_line(curve, st, pt0, pt1, measure=measure_bz):
 	bz = (pt0.xy, pt1.xy)
-	return st.combine(measure_bz(curve, pt0.s, pt1.s, bz), bz)
+	return st.combine(measure(curve, pt0.s, pt1.s, bz), bz)
 
 def intersect(xy0, th0, xy1, th1):
 	x0, y0 = xy0
@@ -147,14 +225,14 @@ def intersect(xy0, th0, xy1, th1):
 	y = (a * dy1 - b * dy0) * det
 	return (x, y)
 
-def measure_quad(curve, st, pt0, pt1):
+def measure_quad(curve, st, pt0, pt1, measure=measure_bz):
 	xy = intersect(pt0.xy, pt0.th, pt1.xy, pt1.th)
 	if xy is None: return None
 	x, y = xy
 	x = round(x)
 	y = round(y)
 	bz = (pt0.xy, (x, y), pt1.xy)
-	return st.combine(measure_bz(curve, pt0.s, pt1.s, bz), bz)
+	return st.combine(measure(curve, pt0.s, pt1.s, bz), bz)
 
 class Thcache:
 	mult = 1
@@ -175,8 +253,9 @@ class Thcache:
 		v1 = self.vals[bucket + 1]
 		return v0 + (s - bucket) * (v1 - v0)
 
-# produce an optimized sequence of quadratics from s0 to s1 of the curve
-def optimize_run(curve, s0, s1):
+# produce an optimized sequence of quadratics from s0 to s1 of the curve,
+# scoring segments with measure
+def optimize_run(curve, s0, s1, measure=measure_bz):
 	print s0, s1
 	n = int(round(1 * (s1 - s0)))
 	pts = []
@@ -184,9 +263,9 @@ def optimize_run(curve, s0, s1):
 		pts.append(Pt(curve, s0 + (s1 - s0) * i / n))
 	cache = Thcache(curve, s0, s1)
 	states = [MiniState(0, [])]
-	newst = measure_line(cache, states[0], pts[0], pts[n])
+	newst = measure_line(cache, states[0], pts[0], pts[n], measure)
 	bestst = newst
-	newst = measure_quad(cache, states[0], pts[0], pts[n])
+	newst = measure_quad(cache, states[0], pts[0], pts[n], measure)
 	if newst and newst.score < bestst.score:
 		bestst = newst
 	if bestst.score <= 3 * penalty:
@@ -194,9 +273,9 @@ def optimize_run(curve, s0, s1):
 	# Quick scan for two-quad sections
 	# Note, could do line+quad and quad+line too, but less likely to win
 	for i in range(1, n):
-		st1 = measure_quad(cache, states[0], pts[0], pts[i])
+		st1 = measure_quad(cache, states[0], pts[0], pts[i], measure)
 		if st1:
-			st2 = measure_quad(cache, st1, pts[i], pts[n])
+			st2 = measure_quad(cache, st1, pts[i], pts[n], measure)
 			if st2 and st2.score < bestst.score:
 				bestst = st2
 	if bestst.score <= 4 * penalty:
@@ -205,10 +284,10 @@ def optimize_run(curve, s0, s1):
 		best = 1e9
 		badcount = 0
 		for j in range(i - 1, -1, -1):
-			newst = measure_line(cache, states[j], pts[j], pts[i])
+			newst = measure_line(cache, states[j], pts[j], pts[i], measure)
 			if newst and newst.score < best:
 				best, bestst = newst.score, newst
-			newst = measure_quad(cache, states[j], pts[j], pts[i])
+			newst = measure_quad(cache, states[j], pts[j], pts[i], measure)
 			if newst and newst.score < best:
 				best, bestst = newst.score, newst
 			if newst is None or newst.score - states[j].score > 10 * penalty:
@@ -328,16 +407,29 @@ def seg_fn(segstr):
 	fn += '.bez'
 	return fn
 
+# split a contour into segments, each either a single line kept as is or
+# the string of a segment to optimize
+def contour_segments(sp):
+	bks = segment_sp(sp)
+	result = []
+	for i in range(len(bks)):
+		bk0, bk1 = bks[i], bks[(i + 1) % len(bks)]
+		if bk1 != (bk0 + 1) % len(sp) or len(sp[bk0]) != 2:
+			result.append(seg_to_string(sp, bk0, bk1))
+		else:
+			result.append(sp[bk0])
+	return result
+
+def glyph_segstrs(glyph):
+	for sp in glyph_to_bzs(glyph):
+		for seg in contour_segments(sp):
+			if isinstance(seg, str):
+				yield seg
+
 def gen_segs(glyph):
-	bzs = glyph_to_bzs(glyph)
-	for sp in bzs:
-		bks = segment_sp(sp)
-		for i in range(len(bks)):
-			bk0, bk1 = bks[i], bks[(i + 1) % len(bks)]
-			if bk1 != (bk0 + 1) % len(sp) or len(sp[bk0]) != 2:
-				segstr = seg_to_string(sp, bk0, bk1)
-				fn = seg_fn(segstr)
-				file(fn, 'w').write(segstr)
+	for segstr in glyph_segstrs(glyph):
+		fn = seg_fn(segstr)
+		file(fn, 'w').write(segstr)
 
 def generate(fn):
 	f = ttLib.TTFont(fn)
@@ -348,8 +440,11 @@ def generate(fn):
 		gen_segs(g)
 
 def read_bzs(fn):
+	return parse_bzs(file(fn))
+
+def parse_bzs(lines):
 	result = []
-	for l in file(fn):
+	for l in lines:
 		z = [float(z) for z in l.split()]
 		bz = ((z[0], z[1]), (z[2], z[3]), (z[4], z[5]))
 		if bz[1] == lerppt(0.5, bz[0], bz[2]):
@@ -380,38 +475,184 @@ def bzs_to_glyph(bzs, glyph):
 	glyph.flags = flags
 	glyph.endPtsOfContours = endPtsOfContours
 
-def repack_glyph(glyph):
+def read_opt_file(segstr):
+	return read_bzs(seg_fn(segstr) + 'opt')
+
+# read_opt returns the optimized beziers for a segment string
+def repack_glyph(glyph, read_opt=read_opt_file, plot=True):
 	bzs = glyph_to_bzs(glyph)
 	newbzs = []
 	for sp in bzs:
-		bks = segment_sp(sp)
 		newsp = []
-		for i in range(len(bks)):
-			bk0, bk1 = bks[i], bks[(i + 1) % len(bks)]
-			if bk1 != (bk0 + 1) % len(sp) or len(sp[bk0]) != 2:
-				segstr = seg_to_string(sp, bk0, bk1)
-				fn = seg_fn(segstr) + 'opt'
-				newsp.extend(read_bzs(fn))
+		for seg in contour_segments(sp):
+			if isinstance(seg, str):
+				newsp.extend(read_opt(seg))
 			else:
-				newsp.append(sp[bk0])
+				newsp.append(seg)
 		newbzs.append(newsp)
 	bzs_to_glyph(newbzs, glyph)
-	plot_tt(newbzs, bzs, style = 'redblack')
+	if plot:
+		plot_tt(newbzs, bzs, style = 'redblack')
 
-def repack(fn, newfn):
+def repack(fn, newfn, read_opt=read_opt_file, plot=True):
 	f = ttLib.TTFont(fn)
 	glyf = f['glyf']
 	for name in glyf.keys():
 		g = glyf[name]
 		if not g.isComposite():
-			repack_glyph(g)
+			repack_glyph(g, read_opt, plot)
 	if newfn:
 		f.save(newfn)
 
+# The crunch pipeline does gen, make, and pack for a set of fonts in one run.
+# Segments are identified by the md5 of their string, so a segment shared by
+# several glyphs or fonts is optimized once, and optimized segments are kept
+# in a SQLite file so later runs only optimize segments they have not seen.
+
+def seg_key(segstr):
+	return md5.new(segstr).hexdigest()
+
+class SegmentCache:
+	def __init__(self, fn):
+		self.db = sqlite3.connect(fn)
+		self.db.execute('CREATE TABLE IF NOT EXISTS segments '
+				'(key TEXT PRIMARY KEY, opt TEXT NOT NULL)')
+		self.db.commit()
+
+	def get_many(self, keys):
+		keys = list(keys)
+		result = {}
+		for i in range(0, len(keys), 500):
+			chunk = keys[i:i + 500]
+			result.update(self.db.execute(
+				'SELECT key, opt FROM segments WHERE key IN (%s)' %
+				','.join('?' * len(chunk)), chunk))
+		return result
+
+	def put_many(self, items):
+		self.db.executemany(
+			'INSERT OR REPLACE INTO segments (key, opt) VALUES (?, ?)', items)
+		self.db.commit()
+
+	def close(self):
+		self.db.close()
+
+QUADOPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quadopt')
+
+# run quadopt on a segment, returning the key and the optimized segment string
+def optimize_seg(args):
+	key, segstr, quadopt = args
+	tmpdir = tempfile.mkdtemp(prefix='fontcrunch_')
+	try:
+		infn = os.path.join(tmpdir, 'seg.bez')
+		outfn = infn + 'opt'
+		file(infn, 'w').write(segstr)
+		subprocess.check_call([quadopt, infn, outfn])
+		return key, file(outfn).read()
+	finally:
+		shutil.rmtree(tmpdir)
+
+def crunch(fonts, outdir, cache_fn, quadopt=QUADOPT, processes=None):
+	segstrs = {}
+	total = 0
+	for fn in fonts:
+		glyf = ttLib.TTFont(fn)['glyf']
+		for name in glyf.keys():
+			g = glyf[name]
+			if not g.isComposite():
+				for segstr in glyph_segstrs(g):
+					segstrs[seg_key(segstr)] = segstr
+					total += 1
+
+	cache = SegmentCache(cache_fn)
+	try:
+		opts = cache.get_many(segstrs)
+		work = [(key, segstr, quadopt) for key, segstr in segstrs.iteritems()
+				if key not in opts]
+		print >> sys.stderr, '%d segments, %d unique, %d cached, %d to optimize' % (
+			total, len(segstrs), len(opts), len(work))
+		if work:
+			pool = multiprocessing.Pool(processes)
+			try:
+				done = []
+				results = pool.imap_unordered(optimize_seg, work, 16)
+				for i, (key, opt) in enumerate(results):
+					opts[key] = opt
+					done.append((key, opt))
+					if len(done) == 1000:
+						# save as we go, so an interrupted run keeps its work
+						cache.put_many(done)
+						done = []
+						print >> sys.stderr, 'optimized %d of %d' % (i + 1, len(work))
+				cache.put_many(done)
+			finally:
+				pool.close()
+				pool.join()
+	finally:
+		cache.close()
+
+	def read_opt(segstr):
+		return parse_bzs(opts[seg_key(segstr)].splitlines())
+
+	if not os.path.isdir(outdir):
+		os.makedirs(outdir)
+	for fn in fonts:
+		newfn = os.path.join(outdir, os.path.basename(fn))
+		print >> sys.stderr, 'writing', newfn
+		repack(fn, newfn, read_opt, plot=False)
+
+def crunch_main(argv):
+	parser = argparse.ArgumentParser(prog='fontcrunch.py crunch')
+	parser.add_argument('fonts', metavar='font', nargs='+',
+			    help='fonts to optimize')
+	parser.add_argument('-o', '--outdir', required=True,
+			    help='directory to write the optimized fonts to')
+	parser.add_argument('-c', '--cache', default='fontcrunch_segments.db',
+			    help='SQLite file of optimized segments (default %(default)s)')
+	parser.add_argument('--quadopt', default=QUADOPT,
+			    help='quadopt binary (default %(default)s)')
+	parser.add_argument('-j', '--processes', type=int,
+			    help='number of optimizer processes (default one per cpu)')
+	args = parser.parse_args(argv)
+	crunch(args.fonts, args.outdir, args.cache, args.quadopt, args.processes)
+
+# Time optimize_run on each run of each contour of the glyphs, with
+# measure_bz_rk4 and with measure_bz, and check they give the same result.
+def bench(fn, names):
+	glyf = ttLib.TTFont(fn)['glyf']
+	totals = [0, 0]
+	nruns = 0
+	for name in names:
+		bzs = raise_to_cubic(glyph_to_bzs(glyf[name]))
+		for sp in fromcubic.bzs_to_pcorn(bzs):
+			curve = pcorn.Curve(sp)
+			breaks = getbreaks(curve)
+			for i in range(len(breaks) - 1):
+				times = []
+				results = []
+				for measure in (measure_bz_rk4, measure_bz):
+					start = time.time()
+					results.append(optimize_run(curve, breaks[i], breaks[i + 1], measure))
+					times.append(time.time() - start)
+				if results[0] != results[1]:
+					raise ValueError('results differ for %s' % name)
+				print >> sys.stderr, '%s run %d, length %.0f: %.3fs before, %.3fs after' % (
+					name, nruns, breaks[i + 1] - breaks[i], times[0], times[1])
+				totals[0] += times[0]
+				totals[1] += times[1]
+				nruns += 1
+	print >> sys.stderr, '%d runs: %.3fs before, %.3fs after' % (
+		nruns, totals[0], totals[1])
+
 def main(argv):
 	if argv[1] == 'gen':
 		generate(sys.argv[2])
 	elif argv[1] == 'pack':
 		repack(sys.argv[2], sys.argv[3] if len(argv) >= 3 else None)
+	elif argv[1] == 'crunch':
+		crunch_main(argv[2:])
+	elif argv[1] == 'bench':
+		bench(argv[2], argv[3:])
 
-main(sys.argv)
+if __name__ == '__main__':
+	main(sys.argv)
@@ -1,5 +1,6 @@
 # Utilities for piecewise cornu representation of curves
 
+import bisect
 from math import *
 
 import clothoid
@@ -121,23 +122,16 @@ class Curve:
         u = s / self.arclen
         s = self.arclen * (u - floor(u))
         if s == 0 and not deltas: s = self.arclen
-        i = 0
-        while i < len(self.segs) - 1:
-            # binary search would make a lot of sense here
-            snext = self.sstarts[i + 1] 
-            if s < snext or (not deltas and s == snext):
-                break
-            i += 1
+        # the first segment ending after s, or at s if not deltas
+        if deltas:
+            i = bisect.bisect_right(self.sstarts, s, 1) - 1
+        else:
+            i = bisect.bisect_left(self.sstarts, s, 1) - 1
         return self.segs[i].th(s - self.sstarts[i])
     def xy(self, s):
         u = s / self.arclen
         s = self.arclen * (u - floor(u))
-        i = 0
-        while i < len(self.segs) - 1:
-            # binary search would make a lot of sense here
-            if s <= self.sstarts[i + 1]:
-                break
-            i += 1
+        i = bisect.bisect_left(self.sstarts, s, 1) - 1
         return self.segs[i].xy(s - self.sstarts[i])
     def find_extrema(self):
         result = []
@@ -26,6 +26,8 @@ def bz_eval(bz, t):
         return pt_wsum(bz, [mt * mt, 2 * mt * t, t * t])
     elif degree == 1:
         return pt_wsum(bz, [mt, t])
+    elif degree == 0:
+        return bz[0]
 
 def bz_deriv(bz):
     degree = len(bz) - 1